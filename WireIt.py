@@ -25,6 +25,7 @@
 import pcbnew
 from pcbnew import *
 
+import atexit
 import sys
 import os
 import os.path
@@ -34,11 +35,24 @@ import wx
 import wx.aui
 import wx.lib.filebrowsebutton as FBB
 
-WIDGET_SPACING = 5
+try:
+    from . import WireIt_ops as ops
+    from . import WireIt_lib as lib
+    from . import WireIt_erc as erc
+    from . import WireIt_dump as dump
+    from . import WireIt_perf as perf
+except (ImportError, ValueError):
+    # WireIt.py was installed as a top-level plugin module, not as a package.
+    import WireIt_ops as ops
+    import WireIt_lib as lib
+    import WireIt_erc as erc
+    import WireIt_dump as dump
+    import WireIt_perf as perf
+
+# Times the phases of the WireIt operations when PROFILE_OPERATIONS is set.
+profiler = perf.profiler
 
-# Support KiCad 7 while maintaining compatibility with previous versions.
-if hasattr(pcbnew, "PCB_VIA"):
-    VIA = pcbnew.PCB_VIA
+WIDGET_SPACING = 5
 
 if hasattr(wx, "GetLibraryVersionInfo"):
     WX_VERSION = wx.GetLibraryVersionInfo()  # type: wx.VersionInfo
@@ -58,6 +72,13 @@ def get_btn_bitmap(bitmap):
         return png
 
 
+def get_art_bitmap(art_id):
+    if WX_VERSION >= (3, 1, 6):
+        return wx.ArtProvider.GetBitmapBundle(art_id, wx.ART_TOOLBAR)
+    else:
+        return wx.ArtProvider.GetBitmap(art_id, wx.ART_TOOLBAR)
+
+
 def debug_dialog(msg, exception=None):
     if exception:
         msg = "\n".join((msg, str(exception), traceback.format_exc()))
@@ -165,130 +186,27 @@ class LabelledComboBox(wx.BoxSizer):
         self.AddSpacer(WIDGET_SPACING)
 
 
-class Part(object):
-    """Object for storing part symbol data."""
-
-    pass
-
-
-class Pin(object):
-    """Object for storing pin data."""
-
-    pass
-
-
-def get_netlist():
-    """Create a dict with part ref & pad num as the key and attached net as the value."""
-    netlist = {}
-    for pad in GetBoard().GetPads():
-        parent = pad.GetParent()
-        if type(parent) == BOARD_ITEM_CONTAINER:  # KiCAD 8
-            footprint = Cast_to_FOOTPRINT(pad.GetParent())
-        else:  # KiCAD 7 and earlier
-            footprint = parent
-        pad_key = footprint.GetReference(), pad.GetPadName()
-        netlist[pad_key] = pad.GetNetname(), pad.GetNetCode()
-    return netlist
-
-
-def get_net_names():
-    """Create a list of all the net names in the PCB."""
-    return list(set([net[0] for net in get_netlist().values()]))
-
-
-def get_stuff_on_nets(*nets):
-    """Get all the pads, tracks, zones attached to a net."""
-    brd = GetBoard()
-    all_stuff = list(brd.GetPads())
-    all_stuff.extend(brd.GetTracks())
-    all_stuff.extend(brd.Zones())
-    stuff = []
-    for net in nets:
-        if isinstance(net, int):
-            stuff.extend([thing for thing in all_stuff if thing.GetNetCode() == net])
-        elif isinstance(net, NETINFO_ITEM):
-            stuff.extend([thing for thing in all_stuff if thing.GetNet() == net])
-        else:
-            stuff.extend([thing for thing in all_stuff if thing.GetNetname() == net])
-    return stuff
-
-
 def get_parts_from_netlist(netlist_file):
     """Get part information from a netlist file."""
+    return lib.get_parts_from_netlist(netlist_file, GetBoard().GetFileName())
 
-    # Get the local and global files that contain the symbol tables.
-    # Place the global file first so its entries will be overridden by any
-    # matching entries in the local file.
-    sym_lib_tbl_files = []  # Store the symbol table file paths here.
-    brd_file = GetBoard().GetFileName()
-    brd_dir = os.path.abspath(os.path.dirname(brd_file))
-    brd_name = os.path.splitext(os.path.basename(brd_file))[0]
-    if sys.platform == "win32":
-        default_home = os.path.expanduser(r"~\AppData\Roaming\kicad")
-    else:
-        default_home = os.path.expanduser(r"~/.config/kicad")
-    dirs = [os.environ.get("KICAD_CONFIG_HOME", default_home), brd_dir]
-    for dir in dirs:
-        sym_lib_tbl_file = os.path.join(dir, "sym-lib-table")
-        if os.path.isfile(sym_lib_tbl_file):
-            sym_lib_tbl_files.append(sym_lib_tbl_file)
-
-    # Regular expression for getting the symbol library name and file location
-    # from the symbol table file.
-    sym_tbl_re = "\(\s*lib\s+\(\s*name\s+([^)]+)\s*\).*\(\s*uri\s+([^)]+)\s*\)"
-
-    # Process the global and local symbol library tables to create a dict
-    # of the symbol library names and their file locations.
-    sym_lib_files = {}
-    for tbl_file in sym_lib_tbl_files:
-        with open(tbl_file, "r") as fp:
-            for line in fp:
-                srch_result = re.search(sym_tbl_re, line)
-                if srch_result:
-                    lib_name, lib_uri = srch_result.group(1, 2)
-                    sym_lib_files[lib_name.lower()] = os.path.expandvars(lib_uri)
-
-    # Add any cache or rescue libraries in the PCB directory.
-    for lib_type in ["-cache", "-rescue"]:
-        lib_name = brd_name + lib_type
-        file_name = os.path.join(brd_dir, lib_name + ".lib")
-        if os.path.isfile(file_name):
-            sym_lib_files[lib_name.lower()] = file_name
-
-    # Regular expressions for getting the part reference and symbol library
-    # from the netlist file.
-    comp_ref_re = "\(\s*comp\s+\(\s*ref\s+([_A-Za-z][_A-Za-z0-9]*)\s*\)"
-    comp_lib_re = (
-        "\(\s*libsource\s+\(\s*lib\s+([^)]+)\s*\)\s+\(\s*part\s+([^)]+)\s*\)\s*\)"
-    )
 
-    # Scan through the netlist searching for the part references and libraries.
-    parts = {}
-    with open(netlist_file, "r") as fp:
-        for line in fp:
+# Set this to True to save parsed legacy symbol libraries in a .wireit_cache
+# directory of the project so they don't have to be parsed again after a restart.
+CACHE_LIBS_ON_DISK = False
 
-            # Search for part reference.
-            srch_result = re.search(comp_ref_re, line)
-            if srch_result:
-                ref = srch_result.group(1)
-                parts[ref] = None
-                continue  # Reference found, so continue with next line.
+# Set this to False to keep WireIt from starting worker processes to read many symbol libraries.
+# Processes are only used outside of PCBNEW (see WireIt_lib.can_use_processes()).
+READ_LIBS_IN_PROCESSES = True
 
-            # Search for symbol library associated with the part reference.
-            srch_result = re.search(comp_lib_re, line)
-            if srch_result:
-                part = Part()
-                part.lib = srch_result.group(1).lower()
-                part.part = srch_result.group(2)
-                parts[ref] = part
-                continue  # Library found, so continue with next line.
+# Parsed symbol libraries so each library file is only read once.
+lib_cache = lib.LibraryCache()
 
-    # For each symbol, store the path to the file associated with that symbol's library.
-    for part in parts.values():
-        if part:
-            part.lib_file = sym_lib_files.get(part.lib, None)
 
-    return parts
+def set_lib_cache_dir():
+    """Tell the library cache where to save parsed libraries for this project."""
+    if CACHE_LIBS_ON_DISK:
+        lib_cache.cache_dir = os.path.join(get_project_directory(), lib.LIB_CACHE_DIR)
 
 
 def fillin_part_info_from_lib(ref, parts):
@@ -303,32 +221,13 @@ def fillin_part_info_from_lib(ref, parts):
     part.pins = {}  # Store part's pin information here.
     part.units = set()  # Store list of part's units here.
 
-    # Find the part in the library and get the info for each pin.
-    with open(part.lib_file, "r") as fp:
-        part_found = False
-        for line in fp:
-            if part_found:
-                if line.startswith("ENDDEF"):
-                    # Found the end of the desired part def, so we're done.
-                    break
-
-                if line.startswith("X "):
-                    # Read pin information records once the desired part def is found.
-                    pin_info = line.split()
-                    pin = Pin()
-                    pin.num = pin_info[2]
-                    pin.name = pin_info[1]
-                    pin.func = pin_info[11]
-                    pin.unit = pin_info[9]
-                    part.pins[pin.num] = pin
-                    part.units.add(pin.unit)
-
-                continue
-
-            # Look for the start of the desired part's definition.
-            part_found = re.search(r"^DEF\s+" + part.part + r"\s+", line) or re.search(
-                r"^ALIAS\s+([^\s]+\s+)*" + part.part + r"\s+", line
-            )
+    # Find the part in the (cached) library and get the info for each pin.
+    set_lib_cache_dir()
+    for pin_info in lib_cache.pins(part.lib_file, part.part) or ():
+        pin = lib.Pin()
+        pin.num, pin.name, pin.func, pin.unit = pin_info
+        part.pins[pin.num] = pin
+        part.units.add(pin.unit)
 
 
 def get_project_directory():
@@ -346,69 +245,152 @@ def guess_netlist_file():
     return ""
 
 
-class PinContention:
-    """Class for checking contention between pins on the same net."""
-
-    def __init__(self):
-        # Initialize the pin contention matrix.
-        OK, WARNING, ERROR = 0, 1, 2
-        pin_funcs = ["I", "O", "B", "T", "W", "w", "P", "U", "C", "E", "N"]
-        (
-            INPUT,
-            OUTPUT,
-            BIDIR,
-            TRISTATE,
-            PWRIN,
-            PWROUT,
-            PASSIVE,
-            UNSPEC,
-            OPENCOLL,
-            OPENEMIT,
-            NOCONNECT,
-        ) = pin_funcs
-        erc_matrix = {f: {ff: OK for ff in pin_funcs} for f in pin_funcs}
-        erc_matrix[OUTPUT][OUTPUT] = ERROR
-        erc_matrix[TRISTATE][OUTPUT] = WARNING
-        erc_matrix[UNSPEC][INPUT] = WARNING
-        erc_matrix[UNSPEC][OUTPUT] = WARNING
-        erc_matrix[UNSPEC][BIDIR] = WARNING
-        erc_matrix[UNSPEC][TRISTATE] = WARNING
-        erc_matrix[UNSPEC][PASSIVE] = WARNING
-        erc_matrix[UNSPEC][UNSPEC] = WARNING
-        erc_matrix[PWRIN][TRISTATE] = WARNING
-        erc_matrix[PWRIN][UNSPEC] = WARNING
-        erc_matrix[PWROUT][OUTPUT] = ERROR
-        erc_matrix[PWROUT][BIDIR] = WARNING
-        erc_matrix[PWROUT][TRISTATE] = ERROR
-        erc_matrix[PWROUT][UNSPEC] = WARNING
-        erc_matrix[PWROUT][PWROUT] = ERROR
-        erc_matrix[OPENCOLL][OUTPUT] = ERROR
-        erc_matrix[OPENCOLL][TRISTATE] = ERROR
-        erc_matrix[OPENCOLL][UNSPEC] = WARNING
-        erc_matrix[OPENCOLL][PWROUT] = ERROR
-        erc_matrix[OPENEMIT][OUTPUT] = ERROR
-        erc_matrix[OPENEMIT][BIDIR] = WARNING
-        erc_matrix[OPENEMIT][TRISTATE] = WARNING
-        erc_matrix[OPENEMIT][UNSPEC] = WARNING
-        erc_matrix[OPENEMIT][PWROUT] = ERROR
-        erc_matrix[NOCONNECT][INPUT] = ERROR
-        erc_matrix[NOCONNECT][OUTPUT] = ERROR
-        erc_matrix[NOCONNECT][BIDIR] = ERROR
-        erc_matrix[NOCONNECT][TRISTATE] = ERROR
-        erc_matrix[NOCONNECT][PASSIVE] = ERROR
-        erc_matrix[NOCONNECT][UNSPEC] = ERROR
-        erc_matrix[NOCONNECT][PWRIN] = ERROR
-        erc_matrix[NOCONNECT][PWROUT] = ERROR
-        erc_matrix[NOCONNECT][OPENCOLL] = ERROR
-        erc_matrix[NOCONNECT][OPENEMIT] = ERROR
-        erc_matrix[NOCONNECT][NOCONNECT] = ERROR
-
-        for s in pin_funcs:
-            for d in pin_funcs:
-                if erc_matrix[s][d] != erc_matrix[d][s]:
-                    err_level = max(erc_matrix[s][d], erc_matrix[d][s])
-                    erc_matrix[s][d] = err_level
-                    erc_matrix[d][s] = err_level
+# Pin contention checker used after wiring changes and for board audits.
+pin_contention = erc.PinContention()
+
+
+# Pin functions resolved from the netlist, kept until the netlist file changes.
+pin_funcs_source = None  # (netlist file name, modification time) the pin functions came from.
+
+# Loads the netlist and libraries in worker threads so PCBNEW isn't blocked.
+background_loader = lib.BackgroundLoader(lib_cache, processes=READ_LIBS_IN_PROCESSES)
+atexit.register(background_loader.shutdown)
+
+
+def install_pin_funcs(source, pin_funcs):
+    """Hand the pin functions loaded from a netlist to the net summaries (in the GUI thread)."""
+
+    global pin_funcs_source
+
+    if source != pin_funcs_source:
+        ops.pin_func_counts.set_pin_funcs(pin_funcs)
+        pin_funcs_source = source
+
+
+def start_loading_pin_funcs():
+    """Start loading the pin functions of the board's parts in the background."""
+
+    netlist_file = guess_netlist_file()
+    if not netlist_file:
+        return
+    set_lib_cache_dir()
+    background_loader.start(
+        netlist_file,
+        GetBoard().GetFileName(),
+        deliver=lambda source, pin_funcs: wx.CallAfter(
+            install_pin_funcs, source, pin_funcs
+        ),
+    )
+
+
+def load_pin_funcs(brd, wait=True):
+    """Resolve the pin function of each (part ref, pad) once and hand them to the net summaries.
+
+    If the pin functions are being loaded in the background, this waits for them.
+    If wait is False, it doesn't: the pin functions are loaded in the background
+    and the ones from an earlier netlist are used until they're ready.
+    Returns False if there are no pin functions to check with.
+    """
+
+    netlist_file = guess_netlist_file()
+    if not netlist_file:
+        return False  # Pin functions can't be found without the netlist.
+
+    source = (netlist_file, os.path.getmtime(netlist_file))
+    if source == pin_funcs_source:
+        return True  # The pin functions are already loaded.
+
+    if not wait:
+        start_loading_pin_funcs()
+        return pin_funcs_source is not None
+
+    pin_funcs = background_loader.result(source)
+    if pin_funcs is None:
+        # Not being loaded in the background, so load them now.
+        set_lib_cache_dir()
+        pin_funcs = lib.load_pin_funcs(
+            netlist_file, brd.GetFileName(), lib_cache, processes=READ_LIBS_IN_PROCESSES
+        )
+    install_pin_funcs(source, pin_funcs)
+    return True
+
+
+def find_pin_contention(brd, net_codes=None):
+    """Return the ERC problems found on the given nets (or all the nets) as a dict of net name => (level, func, func)."""
+
+    if not load_pin_funcs(brd):
+        return {}
+
+    no_connect = 0  # PCBNEW ID for the no-connect net.
+    net_names = ops.net_registry.net_names(brd)  # Check the board once, not for every net.
+    net_counts = {}
+    for net_code, counts in ops.get_pin_func_counts(brd, net_codes).items():
+        if net_code == no_connect:
+            continue  # Unconnected pads can't conflict with each other.
+        net_counts[net_names.get(net_code, "")] = counts
+    return pin_contention.check_net_counts(net_counts)
+
+
+def predict_pin_contention(brd, items, net_name):
+    """Return the ERC problems wiring the items to the named net would add, before wiring them.
+
+    Conflicts already on the nets being joined aren't reported. Nothing is reported
+    (rather than making the user wait) while the pin functions are still loading.
+    """
+
+    if not load_pin_funcs(brd, wait=False):
+        return {}
+
+    counts, merged_counts = ops.predict_wire_pin_func_counts(brd, items, net_name)
+    conflict = pin_contention.new_conflict(merged_counts, counts)
+    if conflict[0] == erc.OK:
+        return {}
+    if not net_name:
+        # Extending a net keeps its name.
+        net_codes = set(thing.GetNetCode() for thing in items) - {0}  # Skip no-connect.
+        net_name = ops.get_net_name(brd, net_codes.pop())
+    return {net_name: conflict}
+
+
+def warn_pin_contention(brd, net_codes, title="Pin Contention"):
+    """Show any pin contention found on the given nets after they were changed."""
+
+    try:
+        problems = find_pin_contention(brd, net_codes)
+    except Exception as e:
+        debug_dialog("Trying to check the nets for pin contention but something went wrong!", e)
+        return
+    if problems:
+        dlg = wx.MessageDialog(
+            None, erc.describe_problems(problems), title, wx.OK | wx.ICON_WARNING
+        )
+        dlg.ShowModal()
+        dlg.Destroy()
+
+
+class NetNameListCtrl(wx.ListCtrl):
+    """Virtual list that only shows the net names matching the text typed so far."""
+
+    def __init__(self, parent, net_name_index):
+        wx.ListCtrl.__init__(
+            self,
+            parent=parent,
+            size=wx.Size(-1, 200),
+            style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL | wx.LC_NO_HEADER,
+        )
+        self.InsertColumn(0, "Net Name", width=300)
+        self.net_name_index = net_name_index
+        self.matches = []
+        self.show_matches("")
+
+    def show_matches(self, text):
+        """Show the best matches for the text, however many net names there are."""
+        self.matches = self.net_name_index.search(text)
+        self.SetItemCount(len(self.matches))
+        self.Refresh()
+
+    def OnGetItemText(self, item, column):
+        return self.matches[item]
 
 
 class NetNameDialog(wx.Dialog):
@@ -417,15 +399,26 @@ class NetNameDialog(wx.Dialog):
     def __init__(self, *args, **kwargs):
         wx.Dialog.__init__(self, None, title=kwargs.get("title"))
 
+        # The choices can be a NetNameIndex or just a list of net names.
+        net_name_index = kwargs.get("net_name_choices")
+        if not isinstance(net_name_index, ops.NetNameIndex):
+            net_name_index = ops.NetNameIndex()
+            net_name_index.load(kwargs.get("net_name_choices") or [])
+
         panel = wx.Panel(self)
 
-        self.name_field = LabelledComboBox(
-            panel, "Net Name:", kwargs.get("net_name_choices"), kwargs.get("tool_tip")
+        self.name_field = LabelledTextCtrl(
+            panel, "Net Name:", "", kwargs.get("tool_tip")
         )
-        self.name_field.cbx.Bind(
-            wx.EVT_TEXT_ENTER, self.set_net_name, self.name_field.cbx
+        self.name_field.ctrl.Bind(wx.EVT_TEXT, self.filter_net_names)
+        self.name_field.ctrl.Bind(
+            wx.EVT_TEXT_ENTER, self.set_net_name, self.name_field.ctrl
         )
 
+        self.name_list = NetNameListCtrl(panel, net_name_index)
+        self.name_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.pick_net_name)
+        self.name_list.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.set_net_name)
+
         self.ok_btn = wx.Button(panel, label="OK")
         self.cancel_btn = wx.Button(panel, label="Cancel")
         self.ok_btn.Bind(wx.EVT_BUTTON, self.set_net_name, self.ok_btn)
@@ -441,6 +434,7 @@ class NetNameDialog(wx.Dialog):
         # Create a vertical sizer to hold everything in the panel.
         sizer = wx.BoxSizer(wx.VERTICAL)
         sizer.Add(self.name_field, 0, wx.ALL | wx.EXPAND, WIDGET_SPACING)
+        sizer.Add(self.name_list, 1, wx.ALL | wx.EXPAND, WIDGET_SPACING)
         sizer.Add(btn_sizer, 0, wx.ALL | wx.ALIGN_CENTER, WIDGET_SPACING)
 
         # Size the panel.
@@ -452,10 +446,18 @@ class NetNameDialog(wx.Dialog):
         self.Fit()
 
         # Show the dialog box.
+        self.net_name = None  # Stays None if the dialog is closed without a name.
         self.ShowModal()
 
+    def filter_net_names(self, evt):
+        self.name_list.show_matches(self.name_field.ctrl.GetValue())
+
+    def pick_net_name(self, evt):
+        # Copy the selected name to the text field without filtering the list again.
+        self.name_field.ctrl.ChangeValue(self.name_list.matches[evt.GetIndex()])
+
     def set_net_name(self, evt):
-        self.net_name = self.name_field.cbx.GetValue()
+        self.net_name = self.name_field.ctrl.GetValue()
         self.Close()
 
     def cancel(self, evt):
@@ -463,188 +465,334 @@ class NetNameDialog(wx.Dialog):
         self.Close()
 
 
+@perf.profiled("Wire It")
 def wire_it_callback(evt):
     """Create a wire between selected pads and/or vias."""
 
     brd = GetBoard()
-    cnct = brd.GetConnectivity()
-    
-    # Get all the net names on the board.
-    all_net_names = get_net_names()
-    
-    # Get selected pads.
-    pads = [p for p in brd.GetPads() if p.IsSelected()]
-
-    # Get selected tracks and vias.
-    tracks = [t for t in brd.GetTracks() if t.IsSelected()]
-
-    # Get selected zones.
-    zones = [z for z in brd.Zones() if z.IsSelected()]
-    
-    # Get nets for selected pads.
-    net_codes = [p.GetNetCode() for p in pads]
-
-    # Add nets for selected tracks and vias.    
-    net_codes.extend([t.GetNetCode() for t in tracks])
-
-    # Add nets for selected zones.
-    net_codes.extend([z.GetNetCode() for z in zones])
-    
-    # Remove duplicate nets.
-    net_codes = list(set(net_codes))
-    
-    # Get net names for selected pads, tracks, zones.
-    net_names = [brd.FindNet(net_code).GetNetname() for net_code in net_codes]
 
-    no_connect = 0  # PCBNEW ID for the no-connect net.
+    # Get the selected pads, tracks, zones and the nets they're attached to.
+    with profiler.phase("scan selection"):
+        selection = ops.Selection(brd)
+    net_codes = selection.net_codes
 
-    num_nets = len(net_codes)  # Number of nets attached to selected pads.
-    
-    # Get selected vias.
-    vias = [t for t in tracks if (type(t) is VIA)]
-    pads.extend(vias)
+    mode = ops.wire_mode(net_codes)
+    net_name = None
 
-    if num_nets == 1 and no_connect in net_codes:
+    if mode == ops.WIRE_ATTACH:
         # In this case, all the selected pads are currently unattached to nets
         # so an existing net has to be selected or a new net has to be created
         # that they can be attached to.
         net_namer = NetNameDialog(
             title="Attach Pads to New or Existing Net",
             tool_tip="Type or select name for the net to connect these pads.",
-            net_name_choices=all_net_names,
+            net_name_choices=ops.get_net_name_index(brd),
         )
-        if not net_namer.net_name:
-            # The user aborted the operation by hitting Cancel.
-            return
-        if net_namer.net_name in all_net_names:
-            # User entered the name of an existing net.
-            net = brd.FindNet(net_namer.net_name)
-        else:
-            # User entered a new net name, so create it.
-            net = NETINFO_ITEM(brd, net_namer.net_name)
-            brd.Add(net)
-        # Attach all the selected pads to the net.
-        for pad in pads:
-            cnct.Add(pad)
-            pad.SetNet(net)
-        net_namer.Destroy()
 
-    elif num_nets == 1 and no_connect not in net_codes:
+    elif mode == ops.WIRE_RENAME:
         # In this case, all the selected pads are attached to the same net
         # so the net will be renamed.
         net_namer = NetNameDialog(
             title="Rename Net Attached to Pads",
             tool_tip="Type or select a new name for the existing net connecting these pads.",
-            net_name_choices=all_net_names,
+            net_name_choices=ops.get_net_name_index(brd),
         )
-        if not net_namer.net_name:
-            # The user aborted the operation by hitting Cancel.
-            return
-        if net_namer.net_name in all_net_names:
-            # User entered the name of an existing net.
-            net = brd.FindNet(net_namer.net_name)
-        else:
-            # User entered a new net name, so create it.
-            net = NETINFO_ITEM(brd, net_namer.net_name)
-            brd.Add(net)
-        # Move *ALL* the pads, tracks, zones on the net to the net given by the user.
-        for thing in get_stuff_on_nets(net_codes[0]):
-            thing.SetNet(net)
-        net_namer.Destroy()
 
-    elif num_nets == 2 and no_connect in net_codes:
+    elif mode == ops.WIRE_EXTEND:
         # In this case, some of the pads are unconnected and the others
         # are all attached to the same net, so attach the unconnected pads
         # to the net the others are attached to.
-        net_codes.remove(no_connect)  # Remove the no-connect net from the list.
-        net = brd.FindNet(net_codes[0])  # This is the net to attach pads to.
-        # Connect all the unconnected pads to the net.
-        for pad in pads:
-            if pad.GetNetCode() == no_connect:
-                cnct.Add(pad)
-                pad.SetNet(net)
+        net_namer = None
 
     else:
         # In this case, the selected pads are connected to two or more nets
         # so all the pads on these nets will be merged onto the same net.
+        # Only the names of the nets being merged are offered as choices.
+        net_names = [ops.get_net_name(brd, net_code) for net_code in net_codes]
         net_namer = NetNameDialog(
             title="Merge Nets Attached to Pads",
             tool_tip="Type or select name for the net created by merging the nets in this list.",
             net_name_choices=net_names,
         )
-        if not net_namer.net_name:
+
+    if net_namer:
+        net_name = net_namer.net_name
+        net_namer.Destroy()
+        if not net_name:
             # The user aborted the operation by hitting Cancel.
             return
-        if net_namer.net_name in all_net_names:
-            # User entered the name of an existing net.
-            net = brd.FindNet(net_namer.net_name)
-        else:
-            # User entered a new net name, so create it.
-            net = NETINFO_ITEM(brd, net_namer.net_name)
-            brd.Add(net)
-            net_names.append(net_namer.net_name)  # Add it to the list of net names.
-        # Move *ALL* the pads, tracks, zones attached to the original nets to the selected net.
-        for thing in get_stuff_on_nets(*net_names):
-            thing.SetNet(net)
-        net_namer.Destroy()
 
-    # Update the board to show the new connections.
-    brd.BuildListOfNets()
-    cnct.RecalculateRatsnest()
-    Refresh()
+    # Warn before making connections that short pins that shouldn't be connected.
+    try:
+        with profiler.phase("predict pin contention"):
+            problems = predict_pin_contention(brd, selection.items, net_name)
+    except Exception as e:
+        debug_dialog("Trying to check the nets for pin contention but something went wrong!", e)
+        problems = {}
+    if problems:
+        dlg = wx.MessageDialog(
+            None,
+            erc.describe_problems(problems) + "\n\nWire them anyway?",
+            "Pin Contention",
+            wx.YES_NO | wx.NO_DEFAULT | wx.ICON_WARNING,
+        )
+        answer = dlg.ShowModal()
+        dlg.Destroy()
+        if answer != wx.ID_YES:
+            return
+
+    # Change the nets and update the board to show the new connections.
+    with profiler.phase("wire"):
+        ops.wire(brd, selection.items, net_name, refresh=True)
 
 
+@perf.profiled("Cut It")
 def cut_it_callback(evt):
     """Remove wires from selected pads and vias."""
 
-    # Get the selected pads.
+    # Get the selected pads and vias.
     brd = GetBoard()
-    cnct = brd.GetConnectivity()
-    pads = [p for p in brd.GetPads() if p.IsSelected()]
+    with profiler.phase("scan selection"):
+        pads = ops.Selection(brd).connectables
 
-	# Get selected vias.
-    vias = [
-        t for t in brd.GetTracks() if t.IsSelected() and (type(t) is VIA)
-    ]
+    # Disconnect the pads and update the board to show the removed connections.
+    with profiler.phase("cut"):
+        ops.cut(brd, pads, refresh=True)
 
-    pads.extend(vias)
 
-    # Disconnect the pads by moving them to the no-connect net.
-    no_connect = 0  # PCBNEW ID for the no-connect net.
-    for pad in pads:
-        cnct.Remove(pad)
-        pad.SetNetCode(no_connect)
+# Parts from the netlist used to check pin swaps, kept until the netlist file changes.
+swap_parts_source = None  # (netlist file name, modification time) the parts came from.
+swap_parts = {}
+
+
+def get_pin_info(refs):
+    """Return a dict of (part ref, pad) => (pin name, pin function, unit) for the pins of the parts.
+
+    The dict is empty if there's no netlist to find the parts' libraries.
+    """
+
+    global swap_parts_source, swap_parts
+
+    netlist_file = guess_netlist_file()
+    if not netlist_file:
+        return {}
+    source = (netlist_file, os.path.getmtime(netlist_file))
+    if source != swap_parts_source:
+        swap_parts = get_parts_from_netlist(netlist_file)
+        swap_parts_source = source
+    set_lib_cache_dir()
+    return lib.get_pin_info(swap_parts, lib_cache, refs)
+
+
+def get_swap_file():
+    """Ask for a CSV file listing the pairs of pads to swap and return its name, or None."""
+    dlg = wx.FileDialog(
+        None,
+        "Select a file of pad pairs to swap (ref,pad,ref,pad on each line)",
+        get_project_directory(),
+        "",
+        "CSV File|*.csv|All Files|*.*",
+        wx.FD_OPEN | wx.FD_FILE_MUST_EXIST,
+    )
+    swap_file = dlg.GetPath() if dlg.ShowModal() == wx.ID_OK else None
+    dlg.Destroy()
+    return swap_file
+
+
+# Most problems listed when asking whether to go ahead with a bulk swap.
+MAX_SWAP_PROBLEMS = 20
+
+
+def swap_many(brd, pairs):
+    """Check a series of pad swaps against the part libraries, then apply them with one board update."""
+
+    moves = ops.swap_moves(pairs)
+    if not moves:
+        return
+    with profiler.phase("check swaps"):
+        pin_info = get_pin_info(set(key[0] for move in moves for key in move))
+        if pin_info:
+            problems = ops.check_swaps(moves, pin_info)
+        else:
+            problems = ["The netlist for this board is needed to check the swaps."]
+    if problems:
+        msg = "\n".join(problems[:MAX_SWAP_PROBLEMS])
+        if len(problems) > MAX_SWAP_PROBLEMS:
+            msg += "\n... and {} more.".format(len(problems) - MAX_SWAP_PROBLEMS)
+        dlg = wx.MessageDialog(
+            None,
+            msg + "\n\nSwap them anyway?",
+            "Swap It",
+            wx.YES_NO | wx.NO_DEFAULT | wx.ICON_WARNING,
+        )
+        answer = dlg.ShowModal()
+        dlg.Destroy()
+        if answer != wx.ID_YES:
+            return
+
+    pads = ops.get_pads_by_key(brd, [key for move in moves for key in move])
+    with profiler.phase("swap"):
+        ops.permute(brd, [(pads[key], pads[src]) for key, src in moves], refresh=True)
+    profiler.count("pads swapped", len(moves))
 
-    # Update the board to show the removed connections.
-    brd.BuildListOfNets()
-    cnct.RecalculateRatsnest()
-    Refresh()
+    # Warn if the swapped connections short pins that shouldn't be connected.
+    with profiler.phase("check pin contention"):
+        warn_pin_contention(brd, set(pad.GetNetCode() for pad in pads.values()))
 
 
+@perf.profiled("Swap It")
 def swap_it_callback(evt):
-    """Swap wires between two selected pads."""
+    """Swap wires between two selected pads, rotate them among more pads, or swap the pads listed in a file."""
+
+    brd = GetBoard()
+
+    # Shift-clicking the button swaps the pairs of pads listed in a file instead.
+    if wx.GetKeyState(wx.WXK_SHIFT):
+        try:
+            swap_file = get_swap_file()
+            if swap_file:
+                swap_many(brd, ops.read_swap_file(swap_file))
+        except ValueError as e:
+            debug_dialog(str(e))
+        except Exception as e:
+            debug_dialog("Trying to swap the pads listed in the file but something went wrong!", e)
+        return
+
+    # Get the selected pads.
+    with profiler.phase("scan selection"):
+        pads = ops.Selection(brd).pads
+
+    # Report error if there aren't enough pads to swap.
+    if len(pads) < 2:
+        debug_dialog("To swap pads, you must select two or more pads!")
+        return
+
+    if len(pads) > 2:
+        try:
+            keys = [(ops.pad_ref(pad), pad.GetPadName()) for pad in pads]
+            try:
+                # Swap two units of a part with all their pads selected.
+                pairs = ops.unit_swap_pairs(keys, get_pin_info(set(ref for ref, _ in keys)))
+            except ValueError:
+                # Otherwise, pass the nets around the selected pads.
+                pairs = ops.rotation_pairs(keys)
+            swap_many(brd, pairs)
+        except Exception as e:
+            debug_dialog("Trying to swap the pads but something went wrong!", e)
+        return
+
+    # Swap nets assigned to the two pads and update the board to show the swapped connections.
+    with profiler.phase("swap"):
+        ops.swap(brd, pads[0], pads[1], refresh=True)
+
+    # Warn if the swapped connections short pins that shouldn't be connected.
+    with profiler.phase("check pin contention"):
+        warn_pin_contention(brd, set(pad.GetNetCode() for pad in pads))
+
+
+@perf.profiled("Optimize It")
+def optimize_it_callback(evt):
+    """Swap the nets of the selected pads to shorten their airwires and untangle them."""
 
     # Get the selected pads.
     brd = GetBoard()
-    pads = [p for p in brd.GetPads() if p.IsSelected()]
+    with profiler.phase("scan selection"):
+        pads = ops.Selection(brd).pads
+    if len(pads) < 2:
+        debug_dialog(
+            "Select the pads of a part whose nets can be swapped to shorten the airwires."
+        )
+        return
+
+    try:
+        # Only pads of the same unit with the same function are swapped with each other.
+        with profiler.phase("group pads"):
+            refs = set(ops.pad_ref(pad) for pad in pads)
+            pin_info = get_pin_info(refs)
+            groups = ops.swappable_groups(pads, pin_info)
+        with profiler.phase("plan swaps"):
+            moves, before, after = ops.plan_pin_swaps(brd, groups)
+        profiler.count("pads optimized", sum(len(group) for group in groups))
+    except Exception as e:
+        debug_dialog("Trying to optimize the pad swaps but something went wrong!", e)
+        return
 
-    # Report error if trying to swap more or less than two pads.
-    if len(pads) != 2:
-        debug_dialog("To swap pads, you must select two pads and only two pads!")
+    if not moves:
+        debug_dialog("Swapping the selected pads won't shorten or untangle their airwires.")
         return
 
-    # Swap nets assigned to the two pads.
-    pad0_net = pads[0].GetNet()
-    pads[0].SetNet(pads[1].GetNet())
-    pads[1].SetNet(pad0_net)
+    # Without library information, any of a part's selected pads can get the net of any other.
+    unknown = sorted(
+        set(ops.pad_ref(pad) for pad in pads if (ops.pad_ref(pad), pad.GetPadName()) not in pin_info)
+    )
+    if unknown:
+        dlg = wx.MessageDialog(
+            None,
+            "There's no netlist or library information for the pins of {}, so their "
+            "pin functions and units can't be checked. Power, ground and signal nets "
+            "may be swapped with each other.\n\nOptimize them anyway?".format(", ".join(unknown)),
+            "Optimize It",
+            wx.YES_NO | wx.NO_DEFAULT | wx.ICON_WARNING,
+        )
+        answer = dlg.ShowModal()
+        dlg.Destroy()
+        if answer != wx.ID_YES:
+            return
+
+    dlg = wx.MessageDialog(
+        None,
+        "Swapping the nets of {} pads changes the airwires from {:.1f} mm with {} crossings "
+        "to {:.1f} mm with {} crossings.\n\nSwap them?".format(
+            len(moves), ToMM(before[0]), before[1], ToMM(after[0]), after[1]
+        ),
+        "Optimize It",
+        wx.YES_NO | wx.NO_DEFAULT | wx.ICON_QUESTION,
+    )
+    answer = dlg.ShowModal()
+    dlg.Destroy()
+    if answer != wx.ID_YES:
+        return
+
+    with profiler.phase("swap"):
+        ops.permute(brd, moves, refresh=True)
+    profiler.count("pads swapped", len(moves))
+
+    # Warn if the swapped connections short pins that shouldn't be connected.
+    with profiler.phase("check pin contention"):
+        warn_pin_contention(brd, set(pad.GetNetCode() for pad, _ in moves))
+
+
+@perf.profiled("Undo It")
+def undo_it_callback(evt):
+    """Undo the latest WireIt operation."""
+    try:
+        if not ops.undo(GetBoard(), refresh=True):
+            debug_dialog("There's no WireIt operation to undo.")
+    except ValueError as e:
+        debug_dialog(str(e))
+    except Exception as e:
+        debug_dialog("Trying to undo the last operation but something went wrong!", e)
+
+
+@perf.profiled("Redo It")
+def redo_it_callback(evt):
+    """Redo the latest WireIt operation that was undone."""
+    try:
+        if not ops.redo(GetBoard(), refresh=True):
+            debug_dialog("There's no undone WireIt operation to redo.")
+    except ValueError as e:
+        debug_dialog(str(e))
+    except Exception as e:
+        debug_dialog("Trying to redo the last operation but something went wrong!", e)
 
-    # Update the board to show the swapped connections.
-    brd.BuildListOfNets()
-    brd.GetConnectivity().RecalculateRatsnest()
-    Refresh()
 
+# Set this to True to append each change to the nets to a log file next to the board file.
+KEEP_CHANGE_LOG = False
 
-original_netlist = {}
+# Set this to True to dump the changes since the baseline netlist saved in a file
+# next to the board file (kept across restarts of PCBNEW) instead of only the
+# changes made since PCBNEW started.
+KEEP_BASELINE = False
 
 
 class DumpDialog(wx.Dialog):
@@ -669,22 +817,44 @@ class DumpDialog(wx.Dialog):
 
             panel = wx.Panel(self)
 
+            # Buttons for selecting what the board's wiring is compared with.
+            self.compare_selector = wx.RadioBox(
+                panel,
+                label="Compare With",
+                choices=["Baseline", "Netlist File"],
+                style=wx.RA_SPECIFY_COLS,
+            )
+            self.compare_selector.SetToolTip(
+                wx.ToolTip(
+                    "Compare with the wiring saved as the baseline, or with the nets in the schematic's netlist file."
+                )
+            )
+
             # File browser widget for getting netlist file for this layout.
-            # netlist_file_wildcard = 'Netlist File|*.net|All Files|*.*'
-            # self.netlist_file_picker = DnDFilePickerCtrl(
-            #     parent=panel,
-            #     labelText='Netlist File:',
-            #     buttonText='Browse',
-            #     toolTip='Drag-and-drop the netlist file associated with this layout or browse for file or enter file name.',
-            #     dialogTitle='Select netlist file associated with this layout',
-            #     startDirectory=get_project_directory(),
-            #     initialValue=guess_netlist_file(),
-            #     fileMask=netlist_file_wildcard,
-            #     fileMode=wx.FD_OPEN)
-            # self.Bind(wx.EVT_FILEPICKER_CHANGED, self.netlist_file_handler, self.netlist_file_picker)
+            self.netlist_name = self.netlist_name or guess_netlist_file()
+            netlist_file_wildcard = "Netlist File|*.net|All Files|*.*"
+            self.netlist_file_picker = DnDFilePickerCtrl(
+                parent=panel,
+                labelText="Netlist File:",
+                buttonText="Browse",
+                toolTip="Drag-and-drop the netlist file associated with this layout or browse for file or enter file name.",
+                dialogTitle="Select netlist file associated with this layout",
+                startDirectory=get_project_directory(),
+                initialValue=self.netlist_name,
+                fileMask=netlist_file_wildcard,
+                fileMode=wx.FD_OPEN,
+            )
+            self.Bind(
+                wx.EVT_FILEPICKER_CHANGED,
+                self.netlist_file_handler,
+                self.netlist_file_picker,
+            )
 
             # File browser widget for selecting the file to receive the netlist changes.
-            dump_file_wildcard = "Dump File|*.txt|All Files|*.*"
+            dump_file_wildcard = "|".join(
+                "{} File|*{}".format(fmt, ext) for fmt, ext in dump.DUMP_FORMATS.items()
+            )
+            dump_file_wildcard += "|All Files|*.*"
             self.dump_file_picker = DnDFilePickerCtrl(
                 parent=panel,
                 labelText="Netlist Changes File:",
@@ -700,6 +870,30 @@ class DumpDialog(wx.Dialog):
                 wx.EVT_FILEPICKER_CHANGED, self.dump_file_handler, self.dump_file_picker
             )
 
+            # Buttons for selecting the format of the file of netlist changes.
+            self.format_selector = wx.RadioBox(
+                panel,
+                label="Format",
+                choices=list(dump.DUMP_FORMATS.keys()),
+                style=wx.RA_SPECIFY_COLS,
+            )
+            self.format_selector.SetToolTip(
+                wx.ToolTip(
+                    "Text for reading, or JSON Lines, CSV or S-expression for back-annotation tools."
+                )
+            )
+            self.format_selector.Bind(wx.EVT_RADIOBOX, self.format_handler)
+
+            # Checkbox for starting over after the changes have been back-annotated.
+            self.new_baseline_chkbx = wx.CheckBox(
+                panel, label="Make the current wiring the new baseline after dumping"
+            )
+            self.new_baseline_chkbx.SetToolTip(
+                wx.ToolTip(
+                    "Later dumps will only list the changes made after this one."
+                )
+            )
+
             self.dump_btn = wx.Button(panel, label="Dump")
             self.cancel_btn = wx.Button(panel, label="Cancel")
             self.dump_btn.Bind(wx.EVT_BUTTON, self.do_dump, self.dump_btn)
@@ -714,8 +908,11 @@ class DumpDialog(wx.Dialog):
 
             # Create a vertical sizer to hold everything in the panel.
             sizer = wx.BoxSizer(wx.VERTICAL)
-            # sizer.Add(self.netlist_file_picker, 0, wx.ALL | wx.EXPAND, WIDGET_SPACING)
+            sizer.Add(self.compare_selector, 0, wx.ALL | wx.EXPAND, WIDGET_SPACING)
+            sizer.Add(self.netlist_file_picker, 0, wx.ALL | wx.EXPAND, WIDGET_SPACING)
             sizer.Add(self.dump_file_picker, 0, wx.ALL | wx.EXPAND, WIDGET_SPACING)
+            sizer.Add(self.format_selector, 0, wx.ALL | wx.EXPAND, WIDGET_SPACING)
+            sizer.Add(self.new_baseline_chkbx, 0, wx.ALL | wx.EXPAND, WIDGET_SPACING)
             sizer.Add(btn_sizer, 0, wx.ALL | wx.ALIGN_CENTER, WIDGET_SPACING)
 
             # Size the panel.
@@ -731,24 +928,44 @@ class DumpDialog(wx.Dialog):
             debug_dialog("Something went wrong!", e)
 
     def netlist_file_handler(self, evt):
-        pass
+        self.netlist_name = self.netlist_file_picker.GetPath()
+        # Picking a netlist file means the wiring should be compared with it.
+        self.compare_selector.SetStringSelection("Netlist File")
 
     def dump_file_handler(self, evt):
         self.dump_name = self.dump_file_picker.GetPath()
+        # Select the format that goes with the file extension.
+        self.format_selector.SetStringSelection(dump.dump_format(self.dump_name))
         self.dump_btn.SetFocus()
 
+    def format_handler(self, evt):
+        # Change the extension of the dump file to match the selected format.
+        if self.dump_name:
+            base, ext = os.path.splitext(self.dump_name)
+            if ext.lower() in dump.DUMP_FORMATS.values():
+                fmt = self.format_selector.GetStringSelection()
+                self.dump_name = base + dump.DUMP_FORMATS[fmt]
+                self.dump_file_picker.SetPath(self.dump_name)
+
+    @perf.profiled("Dump It")
     def do_dump(self, evt):
         try:
-            current_netlist = get_netlist()
-            with open(self.dump_name, r"w") as fp:
-                for (ref, num), (new_net, new_code) in sorted(current_netlist.items()):
-                    old_net, old_code = original_netlist[(ref, num)]
-                    if (new_net, new_code) != (old_net, old_code):
-                        fp.write(
-                            'Part {ref}: Pad {num} moved from (net {old_code} "{old_net}") to (net {new_code} "{new_net}").\n'.format(
-                                **locals()
-                            )
-                        )
+            with profiler.phase("find changes"):
+                if self.compare_selector.GetStringSelection() == "Netlist File":
+                    changes = ops.get_netlist_file_changes(self.netlist_name)
+                else:
+                    changes = ops.get_netlist_changes()
+            profiler.count("changes", len(changes))
+            with profiler.phase("write changes"):
+                dump.write_changes(
+                    changes,
+                    self.dump_name,
+                    self.format_selector.GetStringSelection(),
+                    GetBoard().GetFileName(),
+                )
+            if self.new_baseline_chkbx.GetValue():
+                with profiler.phase("save new baseline"):
+                    ops.reset_netlist_changes()
         except Exception as e:
             debug_dialog("Something went wrong!", e)
         self.Destroy()
@@ -757,11 +974,59 @@ class DumpDialog(wx.Dialog):
         self.Destroy()
 
 
+def check_it_callback(evt):
+    """Check every net on the board for pin contention."""
+
+    brd = GetBoard()
+    if not guess_netlist_file():
+        debug_dialog("The netlist for this board is needed to find the pin functions!")
+        return
+    try:
+        problems = find_pin_contention(brd)
+    except Exception as e:
+        debug_dialog("Trying to check the nets for pin contention but something went wrong!", e)
+        return
+    if problems:
+        msg = erc.describe_problems(problems)
+    else:
+        msg = "No pin contention was found."
+    dlg = wx.MessageDialog(None, msg, "Check It", wx.OK)
+    dlg.ShowModal()
+    dlg.Destroy()
+
+
 def dump_it_callback(evt):
     """Compare pad wiring to original netlist and write changes to a file."""
     DumpDialog()
 
 
+# Set this to True to time the phases of each WireIt operation. The results are shown
+# by the Stats button and appended to a <board>.wireit-perf log file.
+PROFILE_OPERATIONS = False
+
+# Set this to True to also count the calls WireIt makes into PCBNEW while profiling.
+# This slows the operations down, so the timings are less accurate.
+COUNT_SWIG_CALLS = False
+
+
+def start_profiling():
+    """Start profiling the WireIt operations if PROFILE_OPERATIONS is set."""
+    if not PROFILE_OPERATIONS:
+        return
+    board_file = GetBoard().GetFileName()
+    log_file = None
+    if board_file:  # A new board that hasn't been saved has no place for the log.
+        log_file = os.path.splitext(os.path.abspath(board_file))[0] + ".wireit-perf"
+    profiler.enable(log_file=log_file, count_swig_calls=COUNT_SWIG_CALLS)
+
+
+def stats_it_callback(evt):
+    """Show the timings of the last few WireIt operations."""
+    dlg = wx.MessageDialog(None, profiler.summary(), "WireIt Stats", wx.OK)
+    dlg.ShowModal()
+    dlg.Destroy()
+
+
 class WireIt(ActionPlugin):
     """Plugin class for tools to change wiring between pads"""
 
@@ -820,6 +1085,41 @@ class WireIt(ActionPlugin):
                 )
                 top_toolbar.Bind(wx.EVT_TOOL, swap_it_callback, id=swap_it_button)
 
+                # Add button for swapping pads to shorten and untangle their airwires.
+                optimize_it_button = wx.NewId()
+                optimize_it_button_bm = get_art_bitmap(wx.ART_FIND_AND_REPLACE)
+                top_toolbar.AddTool(
+                    optimize_it_button,
+                    "Optimize It",
+                    optimize_it_button_bm,
+                    "Swap the nets of the selected pads to shorten their airwires",
+                    wx.ITEM_NORMAL,
+                )
+                top_toolbar.Bind(wx.EVT_TOOL, optimize_it_callback, id=optimize_it_button)
+
+                # Add buttons for undoing and redoing WireIt operations.
+                undo_it_button = wx.NewId()
+                undo_it_button_bm = get_art_bitmap(wx.ART_UNDO)
+                top_toolbar.AddTool(
+                    undo_it_button,
+                    "Undo It",
+                    undo_it_button_bm,
+                    "Undo the last WireIt operation",
+                    wx.ITEM_NORMAL,
+                )
+                top_toolbar.Bind(wx.EVT_TOOL, undo_it_callback, id=undo_it_button)
+
+                redo_it_button = wx.NewId()
+                redo_it_button_bm = get_art_bitmap(wx.ART_REDO)
+                top_toolbar.AddTool(
+                    redo_it_button,
+                    "Redo It",
+                    redo_it_button_bm,
+                    "Redo the last WireIt operation that was undone",
+                    wx.ITEM_NORMAL,
+                )
+                top_toolbar.Bind(wx.EVT_TOOL, redo_it_callback, id=redo_it_button)
+
                 # Add button for dumping wiring changes to a file.
                 dump_it_button = wx.NewId()
                 dump_it_button_bm = get_btn_bitmap("dump_it.png")
@@ -832,13 +1132,44 @@ class WireIt(ActionPlugin):
                 )
                 top_toolbar.Bind(wx.EVT_TOOL, dump_it_callback, id=dump_it_button)
 
+                # Add button for checking the nets for pin contention.
+                check_it_button = wx.NewId()
+                check_it_button_bm = get_art_bitmap(wx.ART_WARNING)
+                top_toolbar.AddTool(
+                    check_it_button,
+                    "Check It",
+                    check_it_button_bm,
+                    "Check nets for pin contention",
+                    wx.ITEM_NORMAL,
+                )
+                top_toolbar.Bind(wx.EVT_TOOL, check_it_callback, id=check_it_button)
+
+                # Add button for showing the timings of the operations when profiling.
+                if PROFILE_OPERATIONS:
+                    stats_it_button = wx.NewId()
+                    stats_it_button_bm = get_art_bitmap(wx.ART_REPORT_VIEW)
+                    top_toolbar.AddTool(
+                        stats_it_button,
+                        "Stats",
+                        stats_it_button_bm,
+                        "Show how long the latest WireIt operations took",
+                        wx.ITEM_NORMAL,
+                    )
+                    top_toolbar.Bind(wx.EVT_TOOL, stats_it_callback, id=stats_it_button)
+
                 top_toolbar.Realize()
 
                 self.buttons = True  # Buttons now installed in toolbar.
 
-                # Also, store the current netlist to compare against later when dumping wiring changes.
-                global original_netlist
-                original_netlist = get_netlist()
+                # Also, start recording the wiring changes so they can be dumped later.
+                ops.journal.start(
+                    GetBoard(), keep_log=KEEP_CHANGE_LOG, keep_baseline=KEEP_BASELINE
+                )
+
+                # Read the pin functions for checking pin contention without blocking PCBNEW.
+                start_loading_pin_funcs()
+
+                start_profiling()
 
             except Exception as e:
                 debug_dialog(
@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""Writing and reading the files of netlist changes made by Dump It."""
+
+import sys
+import os
+import io
+import csv
+import json
+import hashlib
+from array import array
+from collections import OrderedDict
+
+try:
+    from . import WireIt_lib as lib
+except (ImportError, ValueError):
+    # WireIt_dump.py was installed as a top-level module, not as part of a package.
+    import WireIt_lib as lib
+
+# Dump formats: name shown to the user => file extension.
+DUMP_FORMATS = OrderedDict(
+    [
+        ("Text", ".txt"),
+        ("JSON Lines", ".jsonl"),
+        ("CSV", ".csv"),
+        ("S-Expression", ".sexp"),
+    ]
+)
+
+# Fields of each change: the old or new net is None for a pad that was added or removed.
+CHANGE_FIELDS = ["ref", "pad", "old_code", "old_net", "new_code", "new_net"]
+
+# Size of the output buffer so big dumps are written in a few large chunks.
+DUMP_BUFFER_SIZE = 1 << 16
+
+
+def dump_format(dump_file):
+    """Return the name of the dump format for a file, judged by its extension (Text if unknown)."""
+    ext = dump_file[dump_file.rfind(".") :].lower() if "." in dump_file else ""
+    for fmt, fmt_ext in DUMP_FORMATS.items():
+        if ext == fmt_ext:
+            return fmt
+    return "Text"
+
+
+def open_dump(dump_file, mode="r"):
+    """Open a dump file as buffered text (or binary for the csv module of Python 2)."""
+    if sys.version_info[0] < 3:
+        return open(dump_file, mode + "b", DUMP_BUFFER_SIZE)
+    return io.open(dump_file, mode, buffering=DUMP_BUFFER_SIZE, encoding="utf-8", newline="")
+
+
+def text_lines(changes):
+    """Yield a readable line for each change."""
+    added = 'Part {0}: Pad {1} was added on (net {4} "{5}").\n'
+    removed = 'Part {0}: Pad {1} was removed from (net {2} "{3}").\n'
+    moved = 'Part {0}: Pad {1} moved from (net {2} "{3}") to (net {4} "{5}").\n'
+    for change in changes:
+        if change[2] is None:
+            yield added.format(*change)
+        elif change[4] is None:
+            yield removed.format(*change)
+        else:
+            yield moved.format(*change)
+
+
+def jsonl_lines(changes):
+    """Yield a JSON object on a line for each change."""
+    encode = json.JSONEncoder().encode
+    for change in changes:
+        yield encode(dict(zip(CHANGE_FIELDS, change))) + "\n"
+
+
+def sexp_quote(s):
+    """Return a string quoted for an S-expression."""
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def sexp_lines(changes, board_file=""):
+    """Yield the lines of an S-expression with a (pad ...) list for each change."""
+    yield "(wireit_changes (version 1)\n"
+    yield "  (board {})\n".format(sexp_quote(board_file))
+    for ref, num, old_code, old_net, new_code, new_net in changes:
+        nets = ""
+        if old_code is not None:
+            nets += " (old (code {}) (net {}))".format(old_code, sexp_quote(old_net))
+        if new_code is not None:
+            nets += " (new (code {}) (net {}))".format(new_code, sexp_quote(new_net))
+        yield "  (pad (ref {}) (num {}){})\n".format(sexp_quote(ref), sexp_quote(num), nets)
+    yield ")\n"
+
+
+def write_changes(changes, dump_file, fmt=None, board_file=""):
+    """Stream the netlist changes to a file in one of the DUMP_FORMATS.
+
+    Args:
+        changes: Iterable of (ref, pad, old code, old net, new code, new net) tuples.
+        dump_file: Path of the file to write (any previous contents are overwritten).
+        fmt: Name of the format, or None to pick it from the file extension.
+        board_file: Path of the board, recorded in the S-expression format.
+    """
+    fmt = fmt or dump_format(dump_file)
+    with open_dump(dump_file, "w") as fp:
+        if fmt == "CSV":
+            writer = csv.writer(fp)
+            writer.writerow(CHANGE_FIELDS)
+            writer.writerows(
+                ["" if field is None else field for field in change] for change in changes
+            )
+        elif fmt == "JSON Lines":
+            fp.writelines(jsonl_lines(changes))
+        elif fmt == "S-Expression":
+            fp.writelines(sexp_lines(changes, board_file))
+        else:
+            fp.writelines(text_lines(changes))
+
+
+def read_changes(dump_file, fmt=None):
+    """Yield the (ref, pad, old code, old net, new code, new net) changes stored in a JSON Lines, CSV or S-expression dump."""
+
+    def code(value):
+        return None if value in (None, "") else int(value)
+
+    fmt = fmt or dump_format(dump_file)
+    with open_dump(dump_file) as fp:
+        if fmt == "CSV":
+            rows = csv.reader(fp)
+            next(rows)  # Skip the header.
+            for ref, num, old_code, old_net, new_code, new_net in rows:
+                old_code, new_code = code(old_code), code(new_code)
+                yield (
+                    ref,
+                    num,
+                    old_code,
+                    None if old_code is None else old_net,
+                    new_code,
+                    None if new_code is None else new_net,
+                )
+        elif fmt == "JSON Lines":
+            for line in fp:
+                if line.strip():
+                    change = json.loads(line)
+                    yield tuple(change[field] for field in CHANGE_FIELDS)
+        elif fmt == "S-Expression":
+            for _, form in lib.iter_sexp_forms(fp, ("wireit_changes", "pad")):
+                old, new = lib.sexp_item(form, "old"), lib.sexp_item(form, "new")
+                yield (
+                    lib.sexp_value(form, "ref"),
+                    lib.sexp_value(form, "num"),
+                    code(old and lib.sexp_value(old, "code")),
+                    old and lib.sexp_value(old, "net"),
+                    code(new and lib.sexp_value(new, "code")),
+                    new and lib.sexp_value(new, "net"),
+                )
+        else:
+            raise ValueError("Changes can't be read from a {} dump.".format(fmt))
+
+
+# First line of a baseline file.
+BASELINE_MAGIC = b"WIREIT-BASELINE\n"
+BASELINE_VERSION = 2
+
+
+def keys_digest(keys):
+    """Return a hash of a sequence of (part ref, pad name) keys."""
+    text = u"\0".join(ref + u"\1" + pad for ref, pad in keys)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def array_to_bytes(arr):
+    """Return the contents of an int array as little-endian bytes."""
+    if sys.byteorder == "big":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes() if hasattr(arr, "tobytes") else arr.tostring()
+
+
+def array_from_bytes(data):
+    """Return an int array from little-endian bytes."""
+    arr = array("i")
+    if hasattr(arr, "frombytes"):
+        arr.frombytes(data)
+    else:
+        arr.fromstring(data)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+class Baseline(object):
+    """The nets of a board's pads at some starting point, stored in a compact binary file.
+
+    The file has a magic line, a JSON header line, and then a table of strings
+    (UTF-8 strings separated by NULs) followed by four arrays of little-endian
+    32-bit integers: the string ids of each pad's part ref, pad name and net
+    name, and the pad's net code. The header holds the path of the board, a hash
+    of the set of (part ref, pad name) keys so a baseline saved for some other
+    board with the same path isn't used, and a hash of the sequence of keys so the
+    current pads can be checked against the baseline without looking up each one.
+    The arrays are only read when they're needed.
+    """
+
+    def __init__(self, baseline_file):
+        self.file = baseline_file
+        self.header = None
+        self.strings = None  # The string table, read when the baseline is loaded.
+
+    def save(self, board_file, keys, net_codes, net_name):
+        """Save the pads' nets as the baseline of a board.
+
+        Args:
+            board_file: Path of the board.
+            keys: Sequence of (part ref, pad name) for each pad.
+            net_codes: Array of the net code of each pad.
+            net_name: Function that returns the name of the net with a given code.
+        """
+        ids = {}  # String => id.
+        ref_ids = array("i", [ids.setdefault(ref, len(ids)) for ref, _ in keys])
+        pad_ids = array("i", [ids.setdefault(pad, len(ids)) for _, pad in keys])
+        code_ids = {code: ids.setdefault(net_name(code), len(ids)) for code in set(net_codes)}
+        net_ids = array("i", [code_ids[code] for code in net_codes])
+        strings = [None] * len(ids)
+        for string, i in ids.items():
+            strings[i] = string
+        string_table = u"\0".join(strings).encode("utf-8")
+
+        header = {
+            "version": BASELINE_VERSION,
+            "board": board_file,
+            "key_set_hash": keys_digest(sorted(keys)),
+            "keys_hash": keys_digest(keys),
+            "pads": len(keys),
+            "strings": len(strings),
+            "string_table_size": len(string_table),
+        }
+        tmp_file = self.file + ".tmp"
+        with open(tmp_file, "wb") as fp:
+            fp.write(BASELINE_MAGIC)
+            fp.write(json.dumps(header).encode("utf-8") + b"\n")
+            fp.write(string_table)
+            for arr in (ref_ids, pad_ids, net_ids, array("i", net_codes)):
+                fp.write(array_to_bytes(arr))
+        lib.replace_file(tmp_file, self.file)
+
+        self.header = header
+        self.strings = strings
+        self.ref_ids, self.pad_ids, self.net_ids = ref_ids, pad_ids, net_ids
+        self.net_codes = array("i", net_codes)
+
+    def read_header(self):
+        """Return the header of the baseline file, or None if there's no usable file."""
+        if self.header is None:
+            try:
+                with open(self.file, "rb") as fp:
+                    if fp.readline() != BASELINE_MAGIC:
+                        return None
+                    header = json.loads(fp.readline().decode("utf-8"))
+            except (IOError, OSError, ValueError):
+                return None
+            if header.get("version") == BASELINE_VERSION:
+                self.header = header
+        return self.header
+
+    def matches(self, board_file, keys):
+        """Return True if the baseline file was saved for a board with the same pads.
+
+        Args:
+            board_file: Path of the board.
+            keys: Sequence of (part ref, pad name) for each pad on the board.
+        """
+        header = self.read_header()
+        return (
+            header is not None
+            and header["board"] == board_file
+            and header["pads"] == len(keys)
+            and header["key_set_hash"] == keys_digest(sorted(keys))
+        )
+
+    def load(self):
+        """Read the string table and arrays of the baseline file if they haven't been read yet."""
+        if self.strings is not None:
+            return
+        header = self.read_header()
+        num_pads = header["pads"]
+        with open(self.file, "rb") as fp:
+            fp.readline()
+            fp.readline()
+            string_table = fp.read(header["string_table_size"]).decode("utf-8")
+            arrays = [array_from_bytes(fp.read(4 * num_pads)) for _ in range(4)]
+        strings = string_table.split(u"\0") if header["strings"] else []
+        if len(strings) != header["strings"] or any(len(a) != num_pads for a in arrays):
+            raise ValueError("Baseline file {} is damaged.".format(self.file))
+        self.strings = strings
+        self.ref_ids, self.pad_ids, self.net_ids, self.net_codes = arrays
+
+    def diff(self, keys, net_codes, net_name):
+        """Return the changes from the baseline to the current pads.
+
+        Args:
+            keys: Sequence of (part ref, pad name) for each pad.
+            net_codes: Array of the net code of each pad.
+            net_name: Function that returns the name of the net with a given code.
+
+        Returns:
+            List of (ref, pad, old code, old net, new code, new net) for the pads
+            whose net names differ. The old net is None for an added pad and the
+            new net is None for a removed pad. The old net code is the one the
+            net had when the baseline was saved.
+        """
+        self.load()
+        strings = self.strings
+        net_string_ids = dict((strings[i], i) for i in set(self.net_ids))
+        code_ids = {
+            code: net_string_ids.get(net_name(code), -1) for code in set(net_codes)
+        }
+        changes = []
+
+        if len(keys) == len(self.ref_ids) and keys_digest(keys) == self.header["keys_hash"]:
+            # The pads are the same and in the same order, so compare the net
+            # name ids of the pads as arrays.
+            ids = array("i", [code_ids[code] for code in net_codes])
+            if ids == self.net_ids:
+                return changes
+            for i, (old_id, new_id) in enumerate(zip(self.net_ids, ids)):
+                if old_id != new_id:
+                    changes.append(
+                        keys[i]
+                        + (
+                            self.net_codes[i],
+                            strings[old_id],
+                            net_codes[i],
+                            net_name(net_codes[i]),
+                        )
+                    )
+            return changes
+
+        # Pads were added or removed, so match them up by their keys.
+        old = dict(
+            ((strings[r], strings[p]), i)
+            for i, (r, p) in enumerate(zip(self.ref_ids, self.pad_ids))
+        )
+        for key, code in zip(keys, net_codes):
+            i = old.pop(key, None)
+            if i is None:
+                changes.append(key + (None, None, code, net_name(code)))
+            elif self.net_ids[i] != code_ids[code]:
+                changes.append(
+                    key
+                    + (self.net_codes[i], strings[self.net_ids[i]], code, net_name(code))
+                )
+        for key, i in old.items():
+            changes.append(key + (self.net_codes[i], strings[self.net_ids[i]], None, None))
+        return changes
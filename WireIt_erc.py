@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""Electrical rule checks for the pin functions attached to each net."""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Nets get checked one at a time in plain Python instead.
+
+# ERC levels, from least to most severe.
+OK, WARNING, ERROR = 0, 1, 2
+ERC_LEVEL_NAMES = {OK: "ok", WARNING: "warning", ERROR: "error"}
+
+# Pin functions (electrical types) in the order they're stored in the ERC table.
+PIN_FUNCS = ["I", "O", "B", "T", "W", "w", "P", "U", "C", "E", "N"]
+PIN_FUNC_INDEX = {func: i for i, func in enumerate(PIN_FUNCS)}
+PIN_FUNC_NAMES = {
+    "I": "input",
+    "O": "output",
+    "B": "bidirectional",
+    "T": "tristate",
+    "W": "power input",
+    "w": "power output",
+    "P": "passive",
+    "U": "unspecified",
+    "C": "open collector",
+    "E": "open emitter",
+    "N": "no-connect",
+}
+
+
+class PinContention:
+    """Class for checking contention between pins on the same net."""
+
+    def __init__(self):
+        # Initialize the pin contention matrix.
+        pin_funcs = PIN_FUNCS
+        (
+            INPUT,
+            OUTPUT,
+            BIDIR,
+            TRISTATE,
+            PWRIN,
+            PWROUT,
+            PASSIVE,
+            UNSPEC,
+            OPENCOLL,
+            OPENEMIT,
+            NOCONNECT,
+        ) = pin_funcs
+        erc_matrix = {f: {ff: OK for ff in pin_funcs} for f in pin_funcs}
+        erc_matrix[OUTPUT][OUTPUT] = ERROR
+        erc_matrix[TRISTATE][OUTPUT] = WARNING
+        erc_matrix[UNSPEC][INPUT] = WARNING
+        erc_matrix[UNSPEC][OUTPUT] = WARNING
+        erc_matrix[UNSPEC][BIDIR] = WARNING
+        erc_matrix[UNSPEC][TRISTATE] = WARNING
+        erc_matrix[UNSPEC][PASSIVE] = WARNING
+        erc_matrix[UNSPEC][UNSPEC] = WARNING
+        erc_matrix[PWRIN][TRISTATE] = WARNING
+        erc_matrix[PWRIN][UNSPEC] = WARNING
+        erc_matrix[PWROUT][OUTPUT] = ERROR
+        erc_matrix[PWROUT][BIDIR] = WARNING
+        erc_matrix[PWROUT][TRISTATE] = ERROR
+        erc_matrix[PWROUT][UNSPEC] = WARNING
+        erc_matrix[PWROUT][PWROUT] = ERROR
+        erc_matrix[OPENCOLL][OUTPUT] = ERROR
+        erc_matrix[OPENCOLL][TRISTATE] = ERROR
+        erc_matrix[OPENCOLL][UNSPEC] = WARNING
+        erc_matrix[OPENCOLL][PWROUT] = ERROR
+        erc_matrix[OPENEMIT][OUTPUT] = ERROR
+        erc_matrix[OPENEMIT][BIDIR] = WARNING
+        erc_matrix[OPENEMIT][TRISTATE] = WARNING
+        erc_matrix[OPENEMIT][UNSPEC] = WARNING
+        erc_matrix[OPENEMIT][PWROUT] = ERROR
+        erc_matrix[NOCONNECT][INPUT] = ERROR
+        erc_matrix[NOCONNECT][OUTPUT] = ERROR
+        erc_matrix[NOCONNECT][BIDIR] = ERROR
+        erc_matrix[NOCONNECT][TRISTATE] = ERROR
+        erc_matrix[NOCONNECT][PASSIVE] = ERROR
+        erc_matrix[NOCONNECT][UNSPEC] = ERROR
+        erc_matrix[NOCONNECT][PWRIN] = ERROR
+        erc_matrix[NOCONNECT][PWROUT] = ERROR
+        erc_matrix[NOCONNECT][OPENCOLL] = ERROR
+        erc_matrix[NOCONNECT][OPENEMIT] = ERROR
+        erc_matrix[NOCONNECT][NOCONNECT] = ERROR
+
+        for s in pin_funcs:
+            for d in pin_funcs:
+                if erc_matrix[s][d] != erc_matrix[d][s]:
+                    err_level = max(erc_matrix[s][d], erc_matrix[d][s])
+                    erc_matrix[s][d] = err_level
+                    erc_matrix[d][s] = err_level
+
+        self.erc_matrix = erc_matrix
+
+        # Store the matrix as a lookup table indexed by the pin function positions.
+        self.table = [[erc_matrix[s][d] for d in pin_funcs] for s in pin_funcs]
+
+        if np is not None:
+            # For each ERC level, a 0/1 matrix of the pairs of different pin functions
+            # that are at least that bad, and a 0/1 vector of the pin functions
+            # that are at least that bad when two of them share a net.
+            table = np.array(self.table, dtype=np.int8)
+            n = len(pin_funcs)
+            off_diag = ~np.eye(n, dtype=bool)
+            self.pair_masks = {
+                level: ((table >= level) & off_diag).astype(np.int32)
+                for level in (WARNING, ERROR)
+            }
+            self.self_masks = {
+                level: np.diag(table) >= level for level in (WARNING, ERROR)
+            }
+            # The table with each pair of pin functions only once, for finding the culprits.
+            self.upper_table = np.triu(table)
+
+    def count_funcs(self, funcs):
+        """Return a list with the number of pins of each function in a sequence of pin functions."""
+        counts = [0] * len(PIN_FUNCS)
+        for func in funcs:
+            try:
+                counts[PIN_FUNC_INDEX[func]] += 1
+            except KeyError:
+                pass  # Pins whose function isn't known can't be checked.
+        return counts
+
+    def worst_pair(self, counts):
+        """Return the ERC level and the pair of pin functions causing the worst conflict on a net."""
+        present = [i for i, count in enumerate(counts) if count]
+        worst = (OK, None, None)
+        for pos, i in enumerate(present):
+            row = self.table[i]
+            # A pin function only conflicts with itself if there are at least two of them.
+            start = pos if counts[i] > 1 else pos + 1
+            for j in present[start:]:
+                if row[j] > worst[0]:
+                    worst = (row[j], PIN_FUNCS[i], PIN_FUNCS[j])
+                    if worst[0] == ERROR:
+                        return worst
+        return worst
+
+    def conflicts(self, counts, min_level=WARNING):
+        """Return the set of (ERC level, pin function, pin function) of every conflicting pair on a net."""
+        present = [i for i, count in enumerate(counts) if count]
+        found = set()
+        for pos, i in enumerate(present):
+            row = self.table[i]
+            start = pos if counts[i] > 1 else pos + 1
+            for j in present[start:]:
+                if row[j] >= min_level:
+                    found.add((row[j], PIN_FUNCS[i], PIN_FUNCS[j]))
+        return found
+
+    def new_conflict(self, old_count_rows, new_counts, min_level=WARNING):
+        """Return the worst conflict a net made by joining other nets has that none of them had already.
+
+        Args:
+            old_count_rows: Pin function counts of each net being joined.
+            new_counts: Pin function counts of the joined net.
+            min_level: Ignore conflicts less severe than this.
+
+        Returns:
+            (ERC level, pin function, pin function), or (OK, None, None) if nothing new conflicts.
+        """
+        old = set()
+        for counts in old_count_rows:
+            old |= self.conflicts(counts, min_level)
+        new = self.conflicts(new_counts, min_level) - old
+        return max(new) if new else (OK, None, None)
+
+    def check_counts(self, count_rows, min_level=WARNING):
+        """Check rows of pin function counts (one row per net) for contention.
+
+        Returns:
+            List with the (ERC level, pin function, pin function) of the worst conflict
+            of each row, or (OK, None, None) for rows with no conflict at least min_level.
+        """
+        if np is None or not count_rows:
+            results = [self.worst_pair(counts) for counts in count_rows]
+            return [result if result[0] >= min_level else (OK, None, None) for result in results]
+
+        counts = np.asarray(count_rows)
+        present = (counts > 0).astype(np.int32)
+        multiple = counts > 1
+        levels = np.zeros(len(counts), dtype=np.int8)
+        for level in (WARNING, ERROR):
+            # A net has a conflict at this level if any pin function on it is paired
+            # in the mask with another one on the net, or if there's more than one
+            # of a pin function that conflicts with itself.
+            hits = np.dot(present, self.pair_masks[level]) * present
+            conflict = hits.any(axis=1) | (multiple & self.self_masks[level]).any(axis=1)
+            levels[conflict] = level
+
+        results = [(OK, None, None)] * len(counts)
+        rows = np.flatnonzero(levels >= min_level)
+        if len(rows):
+            # For the nets with conflicts, the ERC level of every pair of pin functions
+            # on the net. A pin function only pairs with itself if there are at least two.
+            on_net = present[rows].astype(bool)
+            pairs = on_net[:, :, None] & on_net[:, None, :]
+            diag = np.arange(len(PIN_FUNCS))
+            pairs[:, diag, diag] = multiple[rows]
+            pair_levels = np.where(pairs, self.upper_table, 0).reshape(len(rows), -1)
+            # The first pair at the net's worst level is the same one worst_pair() finds.
+            culprits = np.argmax(pair_levels == levels[rows][:, None], axis=1)
+            for row, culprit in zip(rows.tolist(), culprits.tolist()):
+                i, j = divmod(culprit, len(PIN_FUNCS))
+                results[row] = (int(levels[row]), PIN_FUNCS[i], PIN_FUNCS[j])
+        return results
+
+    def check_net_counts(self, net_counts, min_level=WARNING):
+        """Check the pin function counts on each net for contention.
+
+        Args:
+            net_counts: Dict of net => list with the number of pins of each function in PIN_FUNCS.
+            min_level: Only report nets with conflicts at least this severe.
+
+        Returns:
+            Dict of net => (ERC level, pin function, pin function) for the nets with conflicts.
+        """
+        nets = list(net_counts.keys())
+        results = self.check_counts([net_counts[net] for net in nets], min_level)
+        return {net: result for net, result in zip(nets, results) if result[0] >= min_level}
+
+    def check_nets(self, net_funcs, min_level=WARNING):
+        """Check the pin functions on each net for contention.
+
+        Args:
+            net_funcs: Dict of net => sequence of pin functions.
+            min_level: Only report nets with conflicts at least this severe.
+
+        Returns:
+            Dict of net => (ERC level, pin function, pin function) for the nets with conflicts.
+        """
+        return self.check_net_counts(
+            {net: self.count_funcs(funcs) for net, funcs in net_funcs.items()}, min_level
+        )
+
+
+def describe_problems(problems, max_lines=50):
+    """Return a readable report of the nets found by check_nets() or check_net_counts()."""
+    lines = []
+    for net in sorted(problems, key=lambda n: (-problems[n][0], str(n))):
+        level, func0, func1 = problems[net]
+        lines.append(
+            "{}: net {} connects {} and {} pins.".format(
+                ERC_LEVEL_NAMES[level].capitalize(),
+                net,
+                PIN_FUNC_NAMES[func0],
+                PIN_FUNC_NAMES[func1],
+            )
+        )
+    if len(lines) > max_lines:
+        lines = lines[:max_lines] + ["... and {} more.".format(len(lines) - max_lines)]
+    return "\n".join(lines)
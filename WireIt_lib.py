@@ -0,0 +1,929 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""Reading part and pin information from KiCad netlists and symbol libraries."""
+
+import sys
+import os
+import os.path
+import re
+import io
+import mmap
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # Python 2.
+
+try:
+    from concurrent.futures import Future, ProcessPoolExecutor
+    from concurrent.futures import wait, FIRST_COMPLETED
+except ImportError:
+    Future = None  # Python 2 without the futures backport loads in the foreground.
+    ProcessPoolExecutor = None
+
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+# Number of parsed symbol libraries kept in memory.
+LIB_CACHE_SIZE = 32
+
+# Name of the directory in the project where parsed symbol libraries are saved.
+LIB_CACHE_DIR = ".wireit_cache"
+
+# Use a pool of processes to read the libraries when a netlist uses at least this many.
+MIN_LIBS_FOR_PROCESSES = 8
+
+# Fields of the tuples that store the pins of a library symbol.
+PIN_NUM, PIN_NAME, PIN_FUNC, PIN_UNIT = range(4)
+
+
+def replace_file(tmp_file, file_name):
+    """Move a freshly written file over another so readers never see a partly written file."""
+    # os.rename() won't replace an existing file on Windows in Python 2.
+    getattr(os, "replace", os.rename)(tmp_file, file_name)
+
+
+class Part(object):
+    """Object for storing part symbol data."""
+
+    pass
+
+
+class Pin(object):
+    """Object for storing pin data."""
+
+    pass
+
+
+# Tokens returned for the parentheses of an S-expression. These are distinct
+# objects so they can't be confused with a quoted "(" or ")" string.
+OPEN_PAREN = object()
+CLOSE_PAREN = object()
+
+# Regular expression for S-expression tokens: parentheses, quoted strings, quoted
+# strings that are cut off at the end of the text, and atoms.
+_sexp_token_re = re.compile(
+    r'[()]|"(?:[^"\\]|\\.)*"|"(?:[^"\\]|\\.)*\Z|[^\s()"]+', re.DOTALL
+)
+
+# Regular expression for a complete quoted string.
+_sexp_string_re = re.compile(r'"(?:[^"\\]|\\.)*"\Z', re.DOTALL)
+
+# Regular expression for escaped characters within a quoted string.
+_sexp_escape_re = re.compile(r"\\(.)", re.DOTALL)
+
+
+def iter_sexp_tokens(fp, chunk_size=1 << 16):
+    """Yield the tokens of an S-expression file, reading only a chunk of it at a time.
+
+    Parentheses are returned as OPEN_PAREN and CLOSE_PAREN, and quoted strings
+    (without their quotes) and atoms are returned as strings. Quoted strings
+    can span lines.
+    """
+    carry = ""  # Text left over from the previous chunk.
+    while True:
+        chunk = fp.read(chunk_size)
+        if chunk:
+            # Only tokenize up to the last whitespace, since no token except a
+            # quoted string can extend past it (and those are handled below).
+            buf = carry + chunk
+            cut = max(buf.rfind("\n"), buf.rfind(" ")) + 1
+            if not cut:
+                carry = buf
+                continue
+            text, carry = buf[:cut], buf[cut:]
+        else:
+            text, carry = carry, ""
+
+        tokens = _sexp_token_re.findall(text)
+        if tokens and tokens[-1][0] == '"' and not _sexp_string_re.match(tokens[-1]):
+            # A quoted string continues past the end of the text, so finish it with the next chunk.
+            if not chunk:
+                raise ValueError("Unterminated string in S-expression: " + tokens[-1][:40])
+            carry = tokens.pop() + carry
+
+        for token in tokens:
+            first = token[0]
+            if first == "(":
+                yield OPEN_PAREN
+            elif first == ")":
+                yield CLOSE_PAREN
+            elif first != '"':
+                yield token
+            elif "\\" in token:
+                yield _sexp_escape_re.sub(r"\1", token[1:-1])
+            else:
+                yield token[1:-1]
+
+        if not chunk:
+            return
+
+
+def _read_sexp_list(tokens, head):
+    """Read the rest of a list whose opening parenthesis and head have been read."""
+    form = [head]
+    stack = [form]
+    for token in tokens:
+        if token is OPEN_PAREN:
+            sub_form = []
+            stack[-1].append(sub_form)
+            stack.append(sub_form)
+        elif token is CLOSE_PAREN:
+            stack.pop()
+            if not stack:
+                return form
+        else:
+            stack[-1].append(token)
+    raise ValueError("Unbalanced parentheses in S-expression.")
+
+
+def iter_sexp_forms(fp, *paths):
+    """Yield (path, form) for each list in an S-expression file found at one of the paths.
+
+    A path is a tuple of list heads such as ("export", "nets", "net"). Each
+    matching list is returned as a nested list of strings. Lists that aren't
+    on one of the paths are skipped without being stored, so only one matching
+    list is held in memory at a time.
+    """
+    wanted = set(paths)
+    enclosing = set(path[:i] for path in paths for i in range(1, len(path)))
+    heads = []  # Heads of the enclosing lists.
+    skip_depth = 0  # Nesting depth within a list being skipped.
+    tokens = iter_sexp_tokens(fp)
+    for token in tokens:
+        if skip_depth:
+            if token is OPEN_PAREN:
+                skip_depth += 1
+            elif token is CLOSE_PAREN:
+                skip_depth -= 1
+        elif token is OPEN_PAREN:
+            head = next(tokens)
+            if head is CLOSE_PAREN:
+                continue  # Empty list.
+            if head is OPEN_PAREN:
+                skip_depth = 2  # A list that starts with a list is never wanted.
+                continue
+            path = tuple(heads) + (head,)
+            if path in wanted:
+                yield path, _read_sexp_list(tokens, head)
+            elif path in enclosing:
+                heads.append(head)
+            else:
+                skip_depth = 1
+        elif token is CLOSE_PAREN:
+            if heads:
+                heads.pop()
+        # Atoms outside of the wanted lists are ignored.
+
+
+def sexp_value(form, key, default=None):
+    """Return the value of a (key value) item in a list read from an S-expression."""
+    for item in form[1:]:
+        if isinstance(item, list) and len(item) > 1 and item[0] == key:
+            return item[1]
+    return default
+
+
+def sexp_item(form, key):
+    """Return the first (key ...) item in a list read from an S-expression, or None."""
+    for item in form[1:]:
+        if isinstance(item, list) and item and item[0] == key:
+            return item
+    return None
+
+
+def iter_netlist(netlist_file):
+    """Yield the components and net nodes of a KiCad netlist file, one at a time.
+
+    Components are returned as ("comp", ref, lib, part) where lib and part are
+    None if the component has no libsource. Net nodes are returned as
+    ("node", net code, net name, ref, pin).
+    """
+    with open(netlist_file, "r") as fp:
+        comp_path = ("export", "components", "comp")
+        net_path = ("export", "nets", "net")
+        for path, form in iter_sexp_forms(fp, comp_path, net_path):
+            if path == comp_path:
+                libsource = sexp_item(form, "libsource")
+                if libsource:
+                    lib, part = sexp_value(libsource, "lib"), sexp_value(libsource, "part")
+                else:
+                    lib, part = None, None
+                yield "comp", sexp_value(form, "ref"), lib, part
+            else:
+                code, name = sexp_value(form, "code"), sexp_value(form, "name")
+                for node in form[1:]:
+                    if isinstance(node, list) and node and node[0] == "node":
+                        yield "node", code, name, sexp_value(node, "ref"), sexp_value(node, "pin")
+
+
+def get_netlist_nodes(netlist_file):
+    """Return a dict of (part ref, pin num) => (net code, net name) for the net nodes of a KiCad netlist file.
+
+    Only the nets section of the netlist is parsed; the components are skipped.
+    """
+    nodes = {}
+    with open(netlist_file, "r") as fp:
+        for _, form in iter_sexp_forms(fp, ("export", "nets", "net")):
+            code, name = sexp_value(form, "code"), sexp_value(form, "name")
+            net = (int(code) if code is not None else None, name)
+            for node in form[1:]:
+                if isinstance(node, list) and node and node[0] == "node":
+                    nodes[(sexp_value(node, "ref"), sexp_value(node, "pin"))] = net
+    return nodes
+
+
+def read_sym_lib_table(tbl_file):
+    """Return a dict of library file paths keyed by lower-cased library name from a sym-lib-table file."""
+    sym_lib_files = {}
+    with open(tbl_file, "r") as fp:
+        for _, form in iter_sexp_forms(fp, ("sym_lib_table", "lib")):
+            lib_name, lib_uri = sexp_value(form, "name"), sexp_value(form, "uri")
+            if lib_name and lib_uri:
+                sym_lib_files[lib_name.lower()] = os.path.expandvars(lib_uri)
+    return sym_lib_files
+
+
+def get_sym_lib_files(brd_file):
+    """Return a dict of symbol library file paths keyed by lower-cased library name for a board."""
+
+    # Get the local and global files that contain the symbol tables.
+    # Place the global file first so its entries will be overridden by any
+    # matching entries in the local file.
+    sym_lib_tbl_files = []  # Store the symbol table file paths here.
+    brd_dir = os.path.abspath(os.path.dirname(brd_file))
+    brd_name = os.path.splitext(os.path.basename(brd_file))[0]
+    if sys.platform == "win32":
+        default_home = os.path.expanduser(r"~\AppData\Roaming\kicad")
+    else:
+        default_home = os.path.expanduser(r"~/.config/kicad")
+    dirs = [os.environ.get("KICAD_CONFIG_HOME", default_home), brd_dir]
+    for dir in dirs:
+        sym_lib_tbl_file = os.path.join(dir, "sym-lib-table")
+        if os.path.isfile(sym_lib_tbl_file):
+            sym_lib_tbl_files.append(sym_lib_tbl_file)
+
+    # Process the global and local symbol library tables to create a dict
+    # of the symbol library names and their file locations.
+    sym_lib_files = {}
+    for tbl_file in sym_lib_tbl_files:
+        sym_lib_files.update(read_sym_lib_table(tbl_file))
+
+    # Add any cache or rescue libraries in the PCB directory.
+    for lib_type in ["-cache", "-rescue"]:
+        lib_name = brd_name + lib_type
+        for lib_ext in [".lib", ".kicad_sym"]:
+            file_name = os.path.join(brd_dir, lib_name + lib_ext)
+            if os.path.isfile(file_name):
+                sym_lib_files[lib_name.lower()] = file_name
+
+    return sym_lib_files
+
+
+def get_parts_from_netlist(netlist_file, brd_file, lib_found=None):
+    """Get part information from a netlist file for the board stored in brd_file.
+
+    If given, lib_found(lib_file) is called the first time each library file is
+    seen so it can be read while the rest of the netlist is parsed.
+    """
+
+    sym_lib_files = get_sym_lib_files(brd_file)
+    libs_found = set()
+
+    # Make one pass through the netlist to get the part references and libraries.
+    parts = {}
+    for record in iter_netlist(netlist_file):
+        if record[0] != "comp":
+            continue
+        _, ref, lib, part_name = record
+        if lib is None:
+            parts[ref] = None
+            continue
+        part = Part()
+        part.lib = lib.lower()
+        part.part = part_name
+        # Store the path to the file associated with the symbol's library.
+        part.lib_file = sym_lib_files.get(part.lib, None)
+        parts[ref] = part
+        if lib_found is not None and part.lib_file and part.lib_file not in libs_found:
+            libs_found.add(part.lib_file)
+            lib_found(part.lib_file)
+
+    return parts
+
+
+def parse_legacy_lib(lib_file):
+    """Return a dict of the pins for each symbol and alias in a legacy (.lib) symbol library.
+
+    The pins of a symbol are stored as a tuple of (num, name, func, unit) tuples
+    so the parsed library is compact and can be saved as JSON.
+    """
+    symbols = {}
+    with open(lib_file, "r") as fp:
+        names, pins = None, []
+        for line in fp:
+            if names is None:
+                if line.startswith("DEF "):
+                    # Start of a symbol definition.
+                    name = line.split()[1]
+                    names, pins = [name], []
+                    if name.startswith("~"):
+                        # Symbols whose value is hidden can also be found without the "~".
+                        names.append(name[1:])
+                continue
+
+            if line.startswith("X "):
+                # Pin record: X name num posx posy length orient sizenum sizename unit convert etype ...
+                pin_info = line.split()
+                pins.append((pin_info[2], pin_info[1], pin_info[11], pin_info[9]))
+            elif line.startswith("ALIAS "):
+                names.extend(line.split()[1:])
+            elif line.startswith("ENDDEF"):
+                # End of the symbol, so store its pins under its name and aliases.
+                # If a name is defined more than once, the first definition is kept.
+                pins = tuple(pins)
+                for name in names:
+                    symbols.setdefault(name, pins)
+                names = None
+    return symbols
+
+
+# Legacy pin function letters for the electrical types of pins in KiCad 6+ libraries.
+# Pins that are not internally connected ("free") are treated as passive.
+KICAD_SYM_PIN_FUNCS = {
+    "input": "I",
+    "output": "O",
+    "bidirectional": "B",
+    "tri_state": "T",
+    "passive": "P",
+    "free": "P",
+    "unspecified": "U",
+    "power_in": "W",
+    "power_out": "w",
+    "open_collector": "C",
+    "open_emitter": "E",
+    "no_connect": "N",
+}
+
+# Regular expression for the start of a top-level symbol in a .kicad_sym file.
+# KiCad writes these indented by two spaces (or one tab in KiCad 8) while the
+# unit symbols nested inside them are indented further.
+_kicad_sym_start_re = re.compile(
+    br'^(?:  |\t)\(symbol\s+"((?:[^"\\]|\\.)*)"', re.MULTILINE
+)
+
+
+def get_kicad_sym_pins(form):
+    """Return the (num, name, func, unit) tuples for the pins in a symbol read from a .kicad_sym file."""
+    pins = []
+    for item in form[2:]:
+        if not isinstance(item, list) or not item:
+            continue
+        if item[0] == "symbol":
+            # Unit symbols are named <symbol>_<unit>_<body style>. Unit 0 holds
+            # pins common to all units. Only the normal body style is used.
+            name_parts = item[1].rsplit("_", 2)
+            unit, style = name_parts[1:] if len(name_parts) == 3 else ("0", "1")
+            if style not in ("0", "1"):
+                continue
+            for pin in item[2:]:
+                if isinstance(pin, list) and pin and pin[0] == "pin":
+                    pins.append(
+                        (
+                            sexp_value(pin, "number"),
+                            sexp_value(pin, "name"),
+                            KICAD_SYM_PIN_FUNCS.get(pin[1], "U"),
+                            unit,
+                        )
+                    )
+        elif item[0] == "pin":
+            pins.append(
+                (
+                    sexp_value(item, "number"),
+                    sexp_value(item, "name"),
+                    KICAD_SYM_PIN_FUNCS.get(item[1], "U"),
+                    "0",
+                )
+            )
+    return tuple(pins)
+
+
+class KicadSymLibrary(object):
+    """A KiCad 6+ (.kicad_sym) symbol library that only parses the symbols asked for.
+
+    When the library is opened, the file is memory-mapped and scanned for the
+    byte offsets of its top-level symbols. A symbol is parsed the first time
+    its pins are requested, and symbols that extend another symbol get the
+    pins of that symbol.
+    """
+
+    def __init__(self, lib_file):
+        self.lib_file = lib_file
+        self.offsets = {}  # Symbol name => (start, end) byte offsets in the file.
+        self.forms = {}  # Symbol name => parsed symbol, if the whole file had to be parsed.
+        self.symbols = {}  # Symbol name => pins, for the symbols parsed so far.
+
+        with open(lib_file, "rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if not size:
+                return  # Can't memory-map an empty file.
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                starts = [(m.start(), m.group(1)) for m in _kicad_sym_start_re.finditer(mm)]
+                unindented = not starts and mm.find(b"(symbol") >= 0
+            finally:
+                mm.close()
+
+        if unindented:
+            # The file wasn't formatted by KiCad, so parse all of it.
+            with io.open(lib_file, "r", encoding="utf-8") as fp:
+                for _, form in iter_sexp_forms(fp, ("kicad_symbol_lib", "symbol")):
+                    self.forms.setdefault(form[1], form)
+            return
+
+        # Each symbol extends to the start of the next one (or the end of the file).
+        ends = [start for start, _ in starts[1:]] + [size]
+        for (start, name), end in zip(starts, ends):
+            name = _sexp_escape_re.sub(r"\1", name.decode("utf-8"))
+            self.offsets.setdefault(name, (start, end))
+
+    def __contains__(self, name):
+        return name in self.offsets or name in self.forms
+
+    def form(self, name):
+        """Return the parsed S-expression for a symbol, or None if it isn't in the library."""
+        if name in self.forms:
+            return self.forms[name]
+        if name not in self.offsets:
+            return None
+        start, end = self.offsets[name]
+        with open(self.lib_file, "rb") as fp:
+            fp.seek(start)
+            text = fp.read(end - start).decode("utf-8")
+        for _, form in iter_sexp_forms(io.StringIO(text), ("symbol",)):
+            return form
+        return None
+
+    def get(self, name, default=None, extended=()):
+        """Return the pins of a symbol, or default if the symbol isn't in the library."""
+        if name in self.symbols:
+            return self.symbols[name]
+        form = self.form(name)
+        if form is None:
+            return default
+        parent = sexp_value(form, "extends")
+        if parent and parent not in extended:
+            # Derived symbols have the pins of the symbol they extend.
+            pins = self.get(parent, (), extended + (name,))
+        else:
+            pins = get_kicad_sym_pins(form)
+        self.symbols[name] = pins
+        return pins
+
+
+class LibraryCache(object):
+    """Cache of parsed symbol libraries keyed by file path and modification time.
+
+    The most recently used libraries are kept in memory, along with the symbols
+    read from other libraries by worker processes (see add()). If a cache directory
+    is given, parsed libraries are also saved there as JSON (never pickled, since
+    the directory is inside the project and may come from someone else) so they
+    don't have to be parsed again after a restart.
+    """
+
+    def __init__(self, max_libs=LIB_CACHE_SIZE, cache_dir=None):
+        self.max_libs = max_libs
+        self.cache_dir = cache_dir
+        self.libs = OrderedDict()  # Library path => (modification time, symbols, all symbols?).
+        self.lock = threading.Lock()  # Libraries may be loaded from several threads.
+
+    def symbols(self, lib_file):
+        """Return the symbol pins of a library, reading the library only if needed.
+
+        The result maps symbol names to pins: a dict for a legacy library, or a
+        KicadSymLibrary that parses symbols as they're looked up for a .kicad_sym file.
+        """
+        lib_file = os.path.abspath(lib_file)
+        mtime = os.path.getmtime(lib_file)
+
+        with self.lock:
+            lib_mtime, symbols, complete = self.libs.get(lib_file, (None, None, False))
+        if lib_mtime != mtime or not complete:  # Library file is new, has changed or was only partly read.
+            if lib_file.endswith(".kicad_sym"):
+                # Indexing these is fast, so they aren't saved in the cache directory.
+                symbols = KicadSymLibrary(lib_file)
+            else:
+                symbols = self.load(lib_file, mtime)
+                if symbols is None:
+                    symbols = parse_legacy_lib(lib_file)
+                    self.save(lib_file, mtime, symbols)
+
+        self.store(lib_file, mtime, symbols, True)
+        return symbols
+
+    def add(self, lib_file, mtime, symbols):
+        """Keep some of the symbols of a library that were read elsewhere (e.g., by a worker process).
+
+        Args:
+            lib_file: Library file the symbols came from.
+            mtime: Modification time of the library file when it was read.
+            symbols: Dict of symbol name => pins (None for symbols that aren't in the library).
+        """
+        lib_file = os.path.abspath(lib_file)
+        with self.lock:
+            lib_mtime, _, complete = self.libs.get(lib_file, (None, None, False))
+        if complete and lib_mtime == mtime:
+            return  # The whole library is already here.
+        self.store(lib_file, mtime, symbols, False)
+
+    def store(self, lib_file, mtime, symbols, complete):
+        """Make a library the most recently used one and drop the least recently used ones."""
+        with self.lock:
+            self.libs.pop(lib_file, None)
+            self.libs[lib_file] = mtime, symbols, complete
+            while len(self.libs) > self.max_libs:
+                self.libs.popitem(last=False)
+
+    def pins(self, lib_file, name):
+        """Return the pins of a symbol in a library, or None if the symbol isn't there."""
+        lib_file = os.path.abspath(lib_file)
+        with self.lock:
+            lib_mtime, symbols, complete = self.libs.get(lib_file, (None, None, False))
+        if not complete and symbols is not None and name in symbols:
+            # The symbol was read along with some others, so the whole library isn't needed.
+            if lib_mtime == os.path.getmtime(lib_file):
+                return symbols[name]
+        return self.symbols(lib_file).get(name)
+
+    def cache_file(self, lib_file):
+        """Return the path of the file where a parsed library is saved."""
+        digest = hashlib.sha1(lib_file.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".json")
+
+    def load(self, lib_file, mtime):
+        """Return a parsed library saved in the cache directory, or None if it's missing or out of date."""
+        if not self.cache_dir:
+            return None
+        try:
+            with io.open(self.cache_file(lib_file), "r", encoding="utf-8") as fp:
+                saved = json.load(fp)
+            if (saved["file"], saved["mtime"]) != (lib_file, mtime):
+                return None
+            # Pins are stored as lists, so turn them back into (num, name, func, unit) tuples.
+            symbols = {}
+            for name, pins in saved["symbols"].items():
+                symbols[name] = tuple(
+                    (str(num), str(pin_name), str(func), str(unit))
+                    for num, pin_name, func, unit in pins
+                )
+        except Exception:
+            return None  # No usable saved library.
+        return symbols
+
+    def save(self, lib_file, mtime, symbols):
+        """Save a parsed library in the cache directory."""
+        if not self.cache_dir:
+            return
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            tmp_file = self.cache_file(lib_file) + ".tmp"
+            with open(tmp_file, "w") as fp:
+                json.dump({"file": lib_file, "mtime": mtime, "symbols": symbols}, fp)
+            replace_file(tmp_file, self.cache_file(lib_file))
+        except (IOError, OSError):
+            pass  # The saved copy is only an optimization, so do without it.
+
+
+def get_pin_funcs(parts, lib_cache):
+    """Return a dict of (part ref, pin num) => pin function for the parts from get_parts_from_netlist()."""
+    pin_funcs = {}
+    for ref, part in parts.items():
+        if part is None or not part.lib_file or not os.path.isfile(part.lib_file):
+            continue  # No library info for this part.
+        for pin in lib_cache.pins(part.lib_file, part.part) or ():
+            pin_funcs[(ref, pin[PIN_NUM])] = pin[PIN_FUNC]
+    return pin_funcs
+
+
+def pin_unit(unit):
+    """Return the unit of a pin as a number, with 0 for the pins shared by all the units.
+
+    Libraries store units as strings. A unit that isn't a number is treated as
+    shared so its pins are never swapped with the pins of a unit.
+    """
+    try:
+        return int(unit)
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_pin_info(parts, lib_cache, refs=None):
+    """Return a dict of (part ref, pin num) => (pin name, pin function, unit) for the parts from get_parts_from_netlist().
+
+    Units are numbers (see pin_unit()). Only the pins of the parts with the
+    given references are returned if refs is given.
+    """
+    pin_info = {}
+    for ref in parts if refs is None else set(refs):
+        part = parts.get(ref)
+        if part is None or not part.lib_file or not os.path.isfile(part.lib_file):
+            continue  # No library info for this part.
+        for pin in lib_cache.pins(part.lib_file, part.part) or ():
+            pin_info[(ref, pin[PIN_NUM])] = (pin[PIN_NAME], pin[PIN_FUNC], pin_unit(pin[PIN_UNIT]))
+    return pin_info
+
+
+def get_lib_symbols(parts):
+    """Return a dict of library file => set of the symbol names the parts use from it."""
+    lib_symbols = {}
+    for part in parts.values():
+        if part is not None and part.lib_file and os.path.isfile(part.lib_file):
+            lib_symbols.setdefault(part.lib_file, set()).add(part.part)
+    return lib_symbols
+
+
+def read_symbol_pins(lib_file, names, cache_dir=None):
+    """Return the modification time of a library and a dict of symbol name => pins for the named symbols in it.
+
+    This runs in a worker process, so only the pins of the symbols that are
+    needed are sent back instead of the whole parsed library.
+    """
+    mtime = os.path.getmtime(os.path.abspath(lib_file))
+    symbols = LibraryCache(max_libs=1, cache_dir=cache_dir).symbols(lib_file)
+    return mtime, {name: symbols.get(name) for name in names}
+
+
+def can_use_processes():
+    """Return True if worker processes can be started to read libraries.
+
+    Inside KiCad, sys.executable is usually the KiCad program rather than a
+    Python interpreter, so starting a worker would start another KiCad. Worker
+    processes are only used when WireIt's modules run under a regular Python
+    (e.g., from a script or the benchmarks); in PCBNEW the libraries are read by threads.
+    """
+    if ProcessPoolExecutor is None or multiprocessing is None:
+        return False
+    if not hasattr(multiprocessing, "get_context"):
+        return False  # Can't avoid forking the (multi-threaded) GUI process.
+    exe = os.path.basename(sys.executable or "").lower()
+    return exe.startswith("python")
+
+
+def read_libs_in_processes(lib_symbols, lib_cache, max_workers=None, max_in_flight=None):
+    """Read the symbols used from each library in a pool of worker processes.
+
+    The symbols are also added to the library cache so looking up their pins
+    later (e.g., for a pin swap) doesn't read the libraries again.
+
+    Args:
+        lib_symbols: Dict of library file => symbol names (see get_lib_symbols()).
+        lib_cache: LibraryCache for the symbols. The workers save parsed legacy
+            libraries in its cache directory.
+        max_workers: Number of worker processes (defaults to the number of CPUs).
+        max_in_flight: Most libraries waiting in or coming back from the pool at once.
+            This bounds the memory used by queued jobs and unclaimed results.
+
+    Returns:
+        Dict of library file => {symbol name: pins}.
+    """
+    max_workers = max_workers or multiprocessing.cpu_count()
+    max_in_flight = max_in_flight or 2 * max_workers
+    tables = {}
+    pending = {}  # Future => library file.
+    todo = list(lib_symbols.items())
+    # Spawn the workers instead of forking a process that's running other threads.
+    executor = ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        while todo or pending:
+            while todo and len(pending) < max_in_flight:
+                lib_file, names = todo.pop()
+                future = executor.submit(read_symbol_pins, lib_file, names, lib_cache.cache_dir)
+                pending[future] = lib_file
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                lib_file = pending.pop(future)
+                mtime, tables[lib_file] = future.result()
+                lib_cache.add(lib_file, mtime, tables[lib_file])
+    finally:
+        executor.shutdown(wait=False)
+    return tables
+
+
+def load_pin_funcs(netlist_file, brd_file, lib_cache, executor=None, processes=True):
+    """Return the pin functions of the parts in a netlist.
+
+    The libraries used by the parts are read by a pool of worker processes if
+    there are enough of them and processes can be started. Otherwise, they're
+    read by the threads of an executor if one is given (starting as soon as the
+    netlist shows they're used), or one after another.
+    """
+    use_processes = processes and can_use_processes()
+    lib_futures = []
+
+    def read_lib(lib_file):
+        if os.path.isfile(lib_file):
+            lib_futures.append(executor.submit(lib_cache.symbols, lib_file))
+
+    read_early = executor is not None and not use_processes
+    parts = get_parts_from_netlist(netlist_file, brd_file, read_lib if read_early else None)
+    lib_symbols = get_lib_symbols(parts)
+
+    if use_processes and len(lib_symbols) >= MIN_LIBS_FOR_PROCESSES:
+        try:
+            tables = read_libs_in_processes(lib_symbols, lib_cache)
+        except Exception:
+            pass  # Worker processes didn't work here, so fall back to threads.
+        else:
+            pin_funcs = {}
+            for ref, part in parts.items():
+                if part is None or not part.lib_file:
+                    continue  # No library info for this part.
+                for pin in tables.get(part.lib_file, {}).get(part.part) or ():
+                    pin_funcs[(ref, pin[PIN_NUM])] = pin[PIN_FUNC]
+            return pin_funcs
+
+    if executor is not None:
+        if not read_early:
+            for lib_file in lib_symbols:
+                read_lib(lib_file)
+        # Wait for the libraries to be read before looking up the pins.
+        for future in wait(lib_futures)[0]:
+            future.result()  # Raise any error from reading a library.
+    return get_pin_funcs(parts, lib_cache)
+
+
+class DaemonThreadPool(object):
+    """Pool of daemon threads that run jobs and return their results as futures.
+
+    The threads of a ThreadPoolExecutor are joined when Python exits, so a long
+    job would keep PCBNEW from closing. These threads are simply dropped.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.jobs = queue.Queue()  # (future, function, args) to run, or None to stop a thread.
+        self.threads = []
+
+    def submit(self, func, *args):
+        """Run func(*args) in one of the threads and return a future for its result."""
+        future = Future()
+        self.jobs.put((future, func, args))
+        if len(self.threads) < self.max_workers:
+            thread = threading.Thread(target=self.work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        return future
+
+    def work(self):
+        """Run jobs until told to stop."""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            future, func, args = job
+            if not future.set_running_or_notify_cancel():
+                continue  # The job was cancelled while waiting.
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self):
+        """Cancel the jobs that haven't started and stop the threads once they finish their current job."""
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job[0].cancel()
+        for _ in self.threads:
+            self.jobs.put(None)
+        self.threads = []
+
+
+class BackgroundLoader(object):
+    """Load the pin functions of the parts in a netlist in worker threads.
+
+    The netlist is parsed in one thread while the libraries it uses are read
+    in a pool of others as soon as they're found (or afterwards in worker processes,
+    see load_pin_funcs()). The result can be passed to a deliver() function when
+    it's ready (e.g., one that uses wx.CallAfter() to get it into the GUI thread),
+    or it can be waited for with result(). If loading fails, the next start() or
+    result() tries again.
+    """
+
+    def __init__(self, lib_cache, max_workers=4, processes=True):
+        self.lib_cache = lib_cache
+        self.max_workers = max_workers  # Number of threads reading libraries.
+        self.processes = processes  # Read many libraries with worker processes if possible.
+        self.executor = None  # Runs the netlist jobs one at a time.
+        self.lib_executor = None  # Reads the libraries used by a netlist.
+        self.source = None  # (netlist file name, modification time) being loaded.
+        self.future = None
+        self.lock = threading.Lock()  # The jobs forget failed loads from their own threads.
+
+    def start(self, netlist_file, brd_file, deliver=None):
+        """Start loading the pin functions of a netlist unless they're already being loaded.
+
+        deliver(source, pin_funcs) is called from a worker thread when the
+        pin functions are ready, where source is (netlist file name, modification time).
+        Returns False if threads aren't available.
+        """
+        if Future is None:
+            return False
+        source = (netlist_file, os.path.getmtime(netlist_file))
+        with self.lock:
+            if source == self.source:
+                return True
+            if self.executor is None:
+                self.executor = DaemonThreadPool(max_workers=1)
+                self.lib_executor = DaemonThreadPool(max_workers=self.max_workers)
+            self.source = source
+            future = self.future = self.executor.submit(
+                load_pin_funcs,
+                netlist_file,
+                brd_file,
+                self.lib_cache,
+                self.lib_executor,
+                self.processes,
+            )
+
+        def done(future):
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.forget(future)
+            elif deliver is not None:
+                deliver(source, future.result())
+
+        future.add_done_callback(done)
+        return True
+
+    def forget(self, future):
+        """Drop a load that failed or was cancelled so it's started again the next time."""
+        with self.lock:
+            if future is self.future:
+                self.source = None
+                self.future = None
+
+    def result(self, source):
+        """Wait for and return the pin functions loaded from source, or None if they weren't being loaded.
+
+        A failed load is forgotten so the next call (or start()) loads the pin
+        functions again. Its error is raised if this call was waiting for it.
+        """
+        with self.lock:
+            future = self.future if source == self.source else None
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except BaseException:
+            self.forget(future)
+            raise
+
+    def shutdown(self):
+        """Stop loading and let the threads go (e.g., when PCBNEW is closing)."""
+        with self.lock:
+            future, self.future, self.source = self.future, None, None
+            executors = (self.executor, self.lib_executor)
+            self.executor = self.lib_executor = None
+        if future is not None:
+            future.cancel()
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown()
@@ -0,0 +1,1923 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Wire It operations that change the nets on a board without needing the GUI."""
+
+import pcbnew
+
+import abc
+import os.path
+import re
+import csv
+import json
+from array import array
+from bisect import bisect_left
+
+try:
+    from . import WireIt_erc as erc
+    from . import WireIt_dump as dump
+    from . import WireIt_lib as lib
+    from . import WireIt_perf as perf
+    from . import WireIt_swap as swap_opt
+except (ImportError, ValueError):
+    # WireIt_ops.py was installed as a top-level module, not as part of a package.
+    import WireIt_erc as erc
+    import WireIt_dump as dump
+    import WireIt_lib as lib
+    import WireIt_perf as perf
+    import WireIt_swap as swap_opt
+
+# Support KiCad 7 while maintaining compatibility with previous versions.
+if hasattr(pcbnew, "PCB_VIA"):
+    VIA = pcbnew.PCB_VIA
+    TRACK = pcbnew.PCB_TRACK
+else:
+    VIA = pcbnew.VIA
+    TRACK = pcbnew.TRACK
+
+# Pads were called D_PAD before KiCad 6.
+if hasattr(pcbnew, "PAD"):
+    PAD = pcbnew.PAD
+else:
+    PAD = pcbnew.D_PAD
+
+
+def item_key(thing):
+    """Return a key that identifies a board item regardless of which SWIG proxy refers to it."""
+    return int(thing.this)
+
+
+def pad_ref(pad):
+    """Return the reference of the part a pad belongs to."""
+    parent = pad.GetParent()
+    if type(parent) == getattr(pcbnew, "BOARD_ITEM_CONTAINER", None):  # KiCad 8
+        parent = pcbnew.Cast_to_FOOTPRINT(parent)
+    return parent.GetReference()
+
+
+def count_items(seq):
+    """Return the number of items in a board container."""
+    try:
+        return len(seq)
+    except TypeError:
+        # Older KiCad containers (e.g. DLIST) don't support len().
+        return sum(1 for _ in seq)
+
+
+def board_signature(brd):
+    """Return a cheap fingerprint of the board that changes when items are added or removed."""
+    time_stamp = brd.GetTimeStamp() if hasattr(brd, "GetTimeStamp") else None
+    return (
+        item_key(brd),
+        time_stamp,
+        brd.GetPadCount(),
+        count_items(brd.GetTracks()),
+        brd.GetAreaCount(),
+    )
+
+
+# Base class for abstract classes that works in both Python 2 and 3.
+ABC = abc.ABCMeta("ABC", (object,), {})
+
+
+class BoardCache(ABC):
+    """Base class for board data that WireIt builds once and then keeps up to date as it changes nets.
+
+    The cache is discarded and rebuilt when the board's fingerprint shows it
+    was changed by something other than WireIt.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    @abc.abstractmethod
+    def build(self, brd):
+        """Fill the cache from the board."""
+
+    def clear(self):
+        """Discard the contents of the cache."""
+        self.signature = None  # Fingerprint of the board when the cache was built.
+
+    def check(self, brd, signature=None):
+        """Discard the cache if the board has changed since it was built.
+
+        The board's current signature can be passed in if it's already known so
+        it isn't found again for each cache.
+        """
+        if self.signature is not None:
+            if signature is None:
+                signature = board_signature(brd)
+            if self.signature != signature:
+                self.clear()
+
+    def ensure(self, brd):
+        """Make sure the cache holds current data for the board."""
+        self.check(brd)
+        if self.signature is None:
+            with perf.profiler.phase("build " + type(self).__name__):
+                self.build(brd)
+            self.signature = board_signature(brd)
+
+    def move(self, thing, old_code, new_code):
+        """Record that WireIt moved an item from one net to another."""
+        pass
+
+    def stamp(self, brd, signature=None):
+        """Accept the current state of the board (or the given signature of it) after WireIt has updated the cache itself."""
+        if self.signature is not None:
+            self.signature = board_signature(brd) if signature is None else signature
+
+
+class NetIndex(BoardCache):
+    """Index from net code to the pads, tracks and zones attached to that net."""
+
+    def clear(self):
+        BoardCache.clear(self)
+        self.nets = {}  # Net code => {item key: item}.
+
+    def build(self, brd):
+        """Build the index with a single pass over the board's pads, tracks and zones."""
+        self.nets = {}
+        for things in (brd.GetPads(), brd.GetTracks(), brd.Zones()):
+            for thing in things:
+                self.nets.setdefault(thing.GetNetCode(), {})[item_key(thing)] = thing
+        perf.profiler.count("items indexed", sum(len(things) for things in self.nets.values()))
+
+    def items_on(self, brd, net_code):
+        """Return the items attached to a net, rebuilding the index if it proves to be stale."""
+        self.ensure(brd)
+        things = list(self.nets.get(net_code, {}).values())
+        if any(thing.GetNetCode() != net_code for thing in things):
+            # Something outside WireIt changed the nets, so start over.
+            self.clear()
+            self.ensure(brd)
+            things = list(self.nets.get(net_code, {}).values())
+        return things
+
+    def find_items(self, brd, keys, net_codes):
+        """Return the items with the given keys on the given nets, or None if any of them isn't there."""
+        for _ in range(2):
+            self.ensure(brd)
+            things = [self.nets.get(code, {}).get(key) for key, code in zip(keys, net_codes)]
+            if all(
+                thing is not None and thing.GetNetCode() == code
+                for thing, code in zip(things, net_codes)
+            ):
+                return things
+            # Something outside WireIt may have changed the nets, so look again with a fresh index.
+            self.clear()
+        return None
+
+    def move(self, thing, old_code, new_code):
+        """Record that an item moved from one net to another."""
+        if self.signature is None:
+            return  # No index to update.
+        key = item_key(thing)
+        self.nets.get(old_code, {}).pop(key, None)
+        self.nets.setdefault(new_code, {})[key] = thing
+
+
+def board_nets(brd):
+    """Return (net code, NETINFO_ITEM) pairs for all the nets defined on the board."""
+    if hasattr(brd, "GetNetsByNetcode"):
+        nets = brd.GetNetsByNetcode()
+    else:
+        nets = brd.GetNetInfo().NetsByNetcode()
+    return nets.items()
+
+
+class NetRegistry(BoardCache):
+    """Lookup of the board's nets by name or code.
+
+    It's built from the nets defined on the board, not from the items attached
+    to them, so nets with no pads (or with nothing at all) are included.
+    Nets created by WireIt are added as they're made. Like the other caches,
+    it's rebuilt if the board changed outside WireIt, and a net that's found is
+    also checked to still have the name or code it was found by.
+    """
+
+    def clear(self):
+        BoardCache.clear(self)
+        self.by_code = {}  # Net code => NETINFO_ITEM.
+        self.by_name = {}  # Net name => NETINFO_ITEM.
+        self.names = {}  # Net code => net name.
+
+    def check(self, brd, signature=None):
+        """Discard the registry if the board has changed or nets were added or removed."""
+        BoardCache.check(self, brd, signature)
+        if self.signature is not None and self.net_count_changed(brd):
+            self.clear()
+
+    def net_count_changed(self, brd):
+        """Return True if nets were added to or removed from the board outside WireIt."""
+        return hasattr(brd, "GetNetCount") and brd.GetNetCount() != len(self.by_code)
+
+    def build(self, brd):
+        """Register every net on the board."""
+        self.clear()
+        for code, net in board_nets(brd):
+            self.by_code[code] = net
+            self.names[code] = name = net.GetNetname()
+            self.by_name[name] = net
+
+    def add(self, net):
+        """Register a net that WireIt just added to the board."""
+        if self.signature is None:
+            return  # No registry to update.
+        code, name = net.GetNetCode(), net.GetNetname()
+        self.by_code[code] = net
+        self.names[code] = name
+        self.by_name[name] = net
+
+    def find(self, brd, net):
+        """Return the NETINFO_ITEM for a net name or code, or None if there's no such net."""
+        self.ensure(brd)
+        by_code = isinstance(net, int)
+        found = (self.by_code if by_code else self.by_name).get(net)
+        if found is not None and (found.GetNetCode() if by_code else found.GetNetname()) != net:
+            # The net was renamed or renumbered outside WireIt, so start over.
+            self.clear()
+            self.ensure(brd)
+            found = (self.by_code if by_code else self.by_name).get(net)
+        return found
+
+    def net_names(self, brd):
+        """Return a dict of net code => net name for all the nets, checking the board only once."""
+        self.ensure(brd)
+        return self.names
+
+    def all_names(self, brd):
+        """Return the names of all the nets except the no-connect net."""
+        no_connect = 0  # PCBNEW ID for the no-connect net.
+        return [name for code, name in self.net_names(brd).items() if code != no_connect]
+
+
+class NetlistSnapshot(BoardCache):
+    """Compact netlist of the board's pads that WireIt patches as it changes nets.
+
+    Each pad has a position in the snapshot. The (ref, pad name) keys share
+    interned reference strings and the net codes are kept in an array.
+    """
+
+    def __init__(self):
+        # Contents of the snapshot before it was discarded because the board
+        # changed outside WireIt. The changes are found when it's rebuilt.
+        self.previous = None
+        BoardCache.__init__(self)
+
+    def clear(self):
+        BoardCache.clear(self)
+        self.keys = []  # (part ref, pad name) for each pad.
+        self.net_codes = array("i")  # Net code for each pad.
+        self.positions = {}  # Pad item key => position in the snapshot.
+        self.net_names = {}  # Net code => net name, filled as needed.
+
+    def check(self, brd, signature=None):
+        """Discard the snapshot if the board has changed, but keep its contents for the journal."""
+        if self.signature is None:
+            return
+        if signature is None:
+            signature = board_signature(brd)
+        if self.signature != signature:
+            previous = (self.signature[0], self.keys, self.net_codes, self.net_names)
+            self.clear()
+            self.previous = previous
+
+    def build(self, brd):
+        """Record the part ref, pad name and net code of every pad on the board."""
+        previous, self.previous = self.previous, None
+        self.clear()
+        self.add_pads(brd)
+        if previous is not None and journal.active:
+            if previous[0] == item_key(brd):
+                journal.reconcile(brd, previous[1:], self)
+            else:
+                journal.begin(brd)  # A different board was loaded, so start over.
+
+    def add_pads(self, brd):
+        """Add all the board's pads to the snapshot."""
+        refs = {}  # Used to intern the part references.
+        if hasattr(brd, "GetFootprints"):
+            # Get each reference once per footprint instead of once per pad.
+            for footprint in brd.GetFootprints():
+                ref = footprint.GetReference()
+                ref = refs.setdefault(ref, ref)
+                for pad in footprint.Pads():
+                    self.add_pad(pad, ref)
+        else:  # KiCad 5 and earlier.
+            for pad in brd.GetPads():
+                ref = pad_ref(pad)
+                ref = refs.setdefault(ref, ref)
+                self.add_pad(pad, ref)
+        perf.profiler.count("pads scanned", len(self.keys))
+
+    def add_pad(self, pad, ref):
+        """Add a pad to the end of the snapshot."""
+        self.positions[item_key(pad)] = len(self.keys)
+        self.keys.append((ref, pad.GetPadName()))
+        self.net_codes.append(pad.GetNetCode())
+
+    def move(self, thing, old_code, new_code):
+        """Record that a pad moved from one net to another."""
+        if self.signature is None:
+            return  # No snapshot to update.
+        position = self.positions.get(item_key(thing))
+        if position is not None:  # Tracks, vias and zones aren't in the snapshot.
+            self.net_codes[position] = new_code
+
+    def net_name(self, brd, net_code):
+        """Return the name of a net, looking it up on the board only the first time."""
+        try:
+            return self.net_names[net_code]
+        except KeyError:
+            # Copy the names of all the nets at once instead of checking the board for each one.
+            self.net_names.update(net_registry.net_names(brd))
+            return self.net_names.setdefault(net_code, "")
+
+    def netlist(self, brd):
+        """Return a dict with part ref & pad num as the key and attached net name & code as the value."""
+        self.ensure(brd)
+        names = {code: self.net_name(brd, code) for code in set(self.net_codes)}
+        return {
+            key: (names[code], code) for key, code in zip(self.keys, self.net_codes)
+        }
+
+
+# Maximum number of matching net names returned by a search.
+MAX_NET_NAME_MATCHES = 200
+
+
+class NetNameIndex(BoardCache):
+    """Sorted net names that support incremental prefix and fuzzy searches.
+
+    Names that start with the search text come first, then names that
+    contain it, then names that contain its characters in order. Case is
+    ignored. When the search text is extended one character at a time (as
+    it is while typing), only the previous fuzzy matches are searched again.
+    """
+
+    def clear(self):
+        BoardCache.clear(self)
+        self.names = []  # Net names sorted while ignoring case.
+        self.folded = []  # Lower-case version of each name, in the same order.
+        self.last_query = None  # Previous search text and...
+        self.last_fuzzy = []  # ...positions of the names that fuzzily matched it.
+
+    def build(self, brd):
+        """Index the names of the nets on the board."""
+        self.load(get_net_names(brd))
+
+    def load(self, names):
+        """Index a list of net names."""
+        self.clear()
+        for name in sorted(set(names), key=lambda n: (n.lower(), n)):
+            self.names.append(name)
+            self.folded.append(name.lower())
+
+    def add(self, name):
+        """Add the name of a newly created net to the index."""
+        if self.signature is None:
+            return  # No index to update.
+        folded = name.lower()
+        position = bisect_left(self.folded, folded)
+        while position < len(self.folded) and self.folded[position] == folded:
+            if self.names[position] == name:
+                return  # Name is already indexed.
+            position += 1
+        self.names.insert(position, name)
+        self.folded.insert(position, folded)
+        self.last_query = None  # Positions of previous matches are no longer valid.
+
+    def search(self, query, limit=MAX_NET_NAME_MATCHES):
+        """Return up to limit net names that match the search text, best matches first."""
+        query = query.lower()
+        if not query:
+            return self.names[:limit]
+
+        # Names starting with the search text are found by bisecting the sorted names.
+        matches = []
+        prefixed = set()
+        position = bisect_left(self.folded, query)
+        while position < len(self.folded) and self.folded[position].startswith(query):
+            if len(matches) >= limit:
+                return matches
+            matches.append(self.names[position])
+            prefixed.add(position)
+            position += 1
+
+        # Find the names containing the characters of the search text in order,
+        # searching only the previous matches if the search text was extended.
+        if self.last_query is not None and query.startswith(self.last_query):
+            candidates = self.last_fuzzy
+        else:
+            candidates = range(len(self.folded))
+        fuzzy_re = re.compile(".*?".join(re.escape(c) for c in query))
+        fuzzy = [p for p in candidates if fuzzy_re.search(self.folded[p])]
+        self.last_query, self.last_fuzzy = query, fuzzy
+
+        # Names containing the search text outrank the other fuzzy matches.
+        fuzzy = [p for p in fuzzy if p not in prefixed]
+        contained = [p for p in fuzzy if query in self.folded[p]]
+        scattered = [p for p in fuzzy if query not in self.folded[p]]
+        for p in contained + scattered:
+            if len(matches) >= limit:
+                break
+            matches.append(self.names[p])
+        return matches
+
+
+class PinFuncCounts(BoardCache):
+    """Running count of the pin functions of the pads on each net.
+
+    The pin functions of the pads are given by set_pin_funcs(). After that,
+    the counts are patched as pads move between nets so the pin functions of
+    a net created by merging others can be found by adding up their counts.
+    """
+
+    def __init__(self):
+        self.pin_funcs = {}  # (part ref, pad name) => pin function.
+        BoardCache.__init__(self)
+
+    def clear(self):
+        BoardCache.clear(self)
+        self.counts = {}  # Net code => list with the number of pins of each function.
+
+    def set_pin_funcs(self, pin_funcs):
+        """Set the pin function of each (part ref, pad name) and discard the old counts."""
+        self.pin_funcs = pin_funcs
+        self.clear()
+
+    def func_index(self, position):
+        """Return the index of the pin function of the pad at a position in the netlist snapshot."""
+        func = self.pin_funcs.get(netlist_snapshot.keys[position])
+        return erc.PIN_FUNC_INDEX.get(func)
+
+    def build(self, brd):
+        """Count the pin functions on each net from the netlist snapshot."""
+        netlist_snapshot.ensure(brd)
+        self.counts = {}
+        num_funcs = len(erc.PIN_FUNCS)
+        for position, code in enumerate(netlist_snapshot.net_codes):
+            index = self.func_index(position)
+            if index is not None:
+                counts = self.counts.get(code)
+                if counts is None:
+                    counts = self.counts[code] = [0] * num_funcs
+                counts[index] += 1
+
+    def move(self, thing, old_code, new_code):
+        """Move the pin function of a pad from one net's counts to another's."""
+        if self.signature is None:
+            return  # No counts to update.
+        position = netlist_snapshot.positions.get(item_key(thing))
+        if position is None:
+            return  # Tracks, vias and zones don't have pin functions.
+        index = self.func_index(position)
+        if index is not None:
+            self.counts[old_code][index] -= 1
+            self.counts.setdefault(new_code, [0] * len(erc.PIN_FUNCS))[index] += 1
+
+    def net_counts(self, brd, net_code):
+        """Return the pin function counts of a net."""
+        self.ensure(brd)
+        return self.counts.get(net_code, [0] * len(erc.PIN_FUNCS))
+
+
+# Average number of pads and vias in each cell of the spatial index.
+ITEMS_PER_GRID_CELL = 4
+
+
+def item_position(thing):
+    """Return the (x, y) position of a board item."""
+    position = thing.GetPosition()
+    return position.x, position.y
+
+
+def ring_cells(col, row, ring):
+    """Return the cells in the square ring a given number of cells around a cell."""
+    if ring == 0:
+        return [(col, row)]
+    cells = []
+    for c in range(col - ring, col + ring + 1):
+        cells.append((c, row - ring))
+        cells.append((c, row + ring))
+    for r in range(row - ring + 1, row + ring):
+        cells.append((col - ring, r))
+        cells.append((col + ring, r))
+    return cells
+
+
+class SpatialIndex(BoardCache):
+    """Uniform grid of the positions of the board's pads and vias.
+
+    The size of the cells is chosen so each one holds a few items on average,
+    so finding the items in a region or near a point only looks at the items
+    in the cells that overlap it instead of every item on the board. Moving
+    items changes the board's time stamp, which discards the grid. For KiCad
+    versions without a time stamp, the positions of the items that are found
+    are checked and the grid is rebuilt if any of them moved.
+    """
+
+    def clear(self):
+        BoardCache.clear(self)
+        self.items = []  # Pads and vias.
+        self.xs = array("d")  # Position of each item.
+        self.ys = array("d")
+        self.cell_size = 1.0
+        self.cells = {}  # (column, row) => positions of the items in that cell.
+        self.extent = (0, 0, 0, 0)  # First column & row and last column & row with items.
+
+    def build(self, brd):
+        """Index the positions of the board's pads and vias."""
+        self.clear()
+        for pad in brd.GetPads():
+            self.add(pad)
+        for track in brd.GetTracks():
+            if type(track) is VIA:
+                self.add(track)
+        perf.profiler.count("items indexed", len(self.items))
+        if not self.items:
+            return
+
+        # Size the cells so that, on average, each holds a few items.
+        width = max(self.xs) - min(self.xs)
+        height = max(self.ys) - min(self.ys)
+        area = max(width, 1.0) * max(height, 1.0)
+        self.cell_size = max((area * ITEMS_PER_GRID_CELL / len(self.items)) ** 0.5, 1.0)
+        for index, (x, y) in enumerate(zip(self.xs, self.ys)):
+            self.cells.setdefault(self.cell(x, y), []).append(index)
+        col0, row0 = self.cell(min(self.xs), min(self.ys))
+        col1, row1 = self.cell(max(self.xs), max(self.ys))
+        self.extent = (col0, row0, col1, row1)
+
+    def add(self, thing):
+        """Add the position of an item to the index before the grid is made."""
+        x, y = item_position(thing)
+        self.items.append(thing)
+        self.xs.append(x)
+        self.ys.append(y)
+
+    def cell(self, x, y):
+        """Return the (column, row) of the cell holding a position."""
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def indices_in_cells(self, col0, row0, col1, row1):
+        """Return the positions of the items in a block of cells."""
+        indices = []
+        if (col1 - col0 + 1) * (row1 - row0 + 1) > len(self.cells):
+            # The block is bigger than the occupied part of the grid, so look
+            # at the occupied cells instead of every cell in the block.
+            for (col, row), cell in self.cells.items():
+                if col0 <= col <= col1 and row0 <= row <= row1:
+                    indices.extend(cell)
+        else:
+            for col in range(col0, col1 + 1):
+                for row in range(row0, row1 + 1):
+                    indices.extend(self.cells.get((col, row), ()))
+        return indices
+
+    def is_current(self, indices):
+        """Return True if the items at the given positions haven't moved since they were indexed."""
+        for index in indices:
+            if item_position(self.items[index]) != (self.xs[index], self.ys[index]):
+                return False
+        return True
+
+    def search(self, brd, find):
+        """Run a search of the index, rebuilding it and searching again if it proves to be stale.
+
+        find() returns a list of lists of item positions in the index, and the
+        lists of the items at those positions are returned.
+        """
+        self.ensure(brd)
+        found = find()
+        if not all(self.is_current(indices) for indices in found):
+            # Something outside WireIt moved the items, so start over.
+            self.clear()
+            self.ensure(brd)
+            found = find()
+        return [[self.items[index] for index in indices] for indices in found]
+
+    def region_indices(self, x0, y0, x1, y1):
+        """Return the positions of the items inside a rectangle."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        col0, row0 = self.cell(x0, y0)
+        col1, row1 = self.cell(x1, y1)
+        xs, ys = self.xs, self.ys
+        return [
+            i
+            for i in self.indices_in_cells(col0, row0, col1, row1)
+            if x0 <= xs[i] <= x1 and y0 <= ys[i] <= y1
+        ]
+
+    def near_indices(self, x, y, radius):
+        """Return the positions of the items within a distance of a point, closest first."""
+        col0, row0 = self.cell(x - radius, y - radius)
+        col1, row1 = self.cell(x + radius, y + radius)
+        xs, ys = self.xs, self.ys
+        r2 = radius * radius
+        found = []
+        for i in self.indices_in_cells(col0, row0, col1, row1):
+            d2 = (xs[i] - x) ** 2 + (ys[i] - y) ** 2
+            if d2 <= r2:
+                found.append((d2, i))
+        return [i for d2, i in sorted(found)]
+
+    def nearest_indices(self, x, y, max_distance=None, accept=None):
+        """Return a list with the position of the item closest to a point, or an empty list."""
+        if not self.items:
+            return []
+        col, row = self.cell(x, y)
+        # Search rings of cells around the point until the closest item
+        # found so far is nearer than any item in the next ring could be.
+        col0, row0, col1, row1 = self.extent
+        max_ring = max(abs(col - col0), abs(col - col1), abs(row - row0), abs(row - row1))
+        if max_distance is not None:
+            max_ring = min(max_ring, int(max_distance // self.cell_size) + 1)
+        xs, ys = self.xs, self.ys
+        best, best_d2 = None, None
+        for ring in range(max_ring + 1):
+            if best is not None and best_d2 <= ((ring - 1) * self.cell_size) ** 2:
+                break
+            for cell in ring_cells(col, row, ring):
+                for i in self.cells.get(cell, ()):
+                    d2 = (xs[i] - x) ** 2 + (ys[i] - y) ** 2
+                    if best_d2 is not None and d2 >= best_d2:
+                        continue
+                    if max_distance is not None and d2 > max_distance * max_distance:
+                        continue
+                    if accept is None or accept(self.items[i]):
+                        best, best_d2 = i, d2
+        return [] if best is None else [best]
+
+    def in_region(self, brd, x0, y0, x1, y1):
+        """Return the pads and vias inside a rectangle."""
+        return self.search(brd, lambda: [self.region_indices(x0, y0, x1, y1)])[0]
+
+    def near(self, brd, points, radius):
+        """Return a list of the pads and vias within a distance of each point, closest first."""
+        return self.search(brd, lambda: [self.near_indices(x, y, radius) for x, y in points])
+
+    def nearest(self, brd, points, max_distance=None, accept=None):
+        """Return the pad or via closest to each point, or None where there isn't one.
+
+        Args:
+            brd: The board.
+            points: List of (x, y) positions.
+            max_distance: Only items within this distance of a point are considered.
+            accept: Function that returns True for the items that can be returned.
+        """
+        found = self.search(
+            brd,
+            lambda: [self.nearest_indices(x, y, max_distance, accept) for x, y in points],
+        )
+        return [things[0] if things else None for things in found]
+
+
+class ChangeJournal(object):
+    """Record of the net changes to each pad since the journal was started.
+
+    WireIt adds a record each time it moves a pad to another net. Pads added,
+    removed or moved to other nets outside WireIt are found when the netlist
+    snapshot is rebuilt. The records can also be appended to a log file as
+    they're made.
+
+    The changes can be tracked from a baseline saved next to the board file
+    instead of from when the journal was started, so changes made before
+    PCBNEW was restarted are included. The baseline is only compared with the
+    pads when the changes are first asked for.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.keep_log = False
+        self.keep_baseline = False
+        self.log = None
+        self.baseline = None
+        self.clear()
+
+    def clear(self):
+        """Discard the records."""
+        # (part ref, pad name, old net code, old net name, new net code, new net name)
+        # for each change in the order they were made. The old net is None for
+        # an added pad and the new net is None for a removed pad.
+        self.records = []
+        # Records of the changes between the baseline and the start of the journal,
+        # or None if they haven't been found yet.
+        self.prior = []
+        self.start_keys = []  # Pad keys and net codes when the journal started.
+        self.start_codes = array("i")
+
+    def start(self, brd, keep_log=False, keep_baseline=False):
+        """Start recording changes to the board.
+
+        Args:
+            brd: The board.
+            keep_log: Append the records to a <board>.wireit-log file as they're made.
+            keep_baseline: Track the changes from the baseline in a <board>.wireit-baseline
+                file, saving the current nets as the baseline if there isn't one.
+        """
+        self.stop()
+        self.keep_log, self.keep_baseline = keep_log, keep_baseline
+        netlist_snapshot.previous = None  # Earlier changes aren't part of this journal.
+        netlist_snapshot.ensure(brd)  # Changes outside WireIt are found from this.
+        self.begin(brd)
+
+    def begin(self, brd, new_baseline=False):
+        """Start a new set of records from the netlist snapshot of the board.
+
+        The current nets are saved as the baseline if new_baseline is True or
+        there's no baseline for the board yet.
+        """
+        self.stop()
+        self.clear()
+        self.start_keys = netlist_snapshot.keys
+        self.start_codes = array("i", netlist_snapshot.net_codes)
+        self.baseline = None
+        board_file = brd.GetFileName()
+        if board_file:  # A new board that hasn't been saved has no place for the files.
+            board_file = os.path.abspath(board_file)
+            base_name = os.path.splitext(board_file)[0]
+            if self.keep_log:
+                self.log = open(base_name + ".wireit-log", "a")
+            if self.keep_baseline:
+                self.baseline = dump.Baseline(base_name + ".wireit-baseline")
+                if not new_baseline and self.baseline.matches(board_file, self.start_keys):
+                    self.prior = None  # Compare with the baseline when the changes are needed.
+                else:
+                    self.save_baseline(brd, board_file)
+        self.active = True
+
+    def save_baseline(self, brd, board_file):
+        """Save the nets at the start of the journal as the baseline."""
+        try:
+            self.baseline.save(
+                board_file,
+                self.start_keys,
+                self.start_codes,
+                lambda code: netlist_snapshot.net_name(brd, code),
+            )
+        except (IOError, OSError):
+            self.baseline = None  # Track the changes from the start of the journal instead.
+
+    def stop(self):
+        """Stop recording changes and close the log file."""
+        self.active = False
+        if self.log:
+            self.log.close()
+            self.log = None
+
+    def record(self, ref, pad, old_code, old_name, new_code, new_name):
+        """Add a record of a pad moving from one net to another."""
+        record = (ref, pad, old_code, old_name, new_code, new_name)
+        self.records.append(record)
+        if self.log:
+            self.log.write(json.dumps(record) + "\n")
+            self.log.flush()
+
+    def record_move(self, brd, pad, old_code, new_code):
+        """Add a record of WireIt moving a pad from one net to another."""
+        position = netlist_snapshot.positions.get(item_key(pad))
+        if position is not None:
+            ref, pad_name = netlist_snapshot.keys[position]
+        else:
+            ref, pad_name = pad_ref(pad), pad.GetPadName()
+        self.record(
+            ref,
+            pad_name,
+            old_code,
+            netlist_snapshot.net_name(brd, old_code),
+            new_code,
+            netlist_snapshot.net_name(brd, new_code),
+        )
+
+    def reconcile(self, brd, previous, snapshot):
+        """Record the pads added, removed or moved between nets outside WireIt.
+
+        previous holds the (keys, net codes, net names) of the snapshot before the
+        board changed, and snapshot has just been rebuilt from the board.
+        """
+        old_keys, old_codes, old_names = previous
+
+        def old_name(code):
+            try:
+                return old_names[code]
+            except KeyError:
+                return snapshot.net_name(brd, code)
+
+        old = dict(zip(old_keys, old_codes))
+        for key, code in zip(snapshot.keys, snapshot.net_codes):
+            old_code = old.pop(key, None)
+            if old_code is None:
+                self.record(key[0], key[1], None, None, code, snapshot.net_name(brd, code))
+            elif old_code != code:
+                self.record(
+                    key[0],
+                    key[1],
+                    old_code,
+                    old_name(old_code),
+                    code,
+                    snapshot.net_name(brd, code),
+                )
+        for key, old_code in old.items():
+            self.record(key[0], key[1], old_code, old_name(old_code), None, None)
+
+    def changes(self, brd):
+        """Return the net changes to each pad as a list of records sorted by part ref and pad name.
+
+        Only the first net and the last net of each pad are kept, so a pad moved
+        from net A to B and then back to A doesn't appear at all. Nets are
+        compared by name because KiCad renumbers them when a board is loaded.
+        """
+        if self.prior is None:
+            self.prior = self.baseline.diff(
+                self.start_keys,
+                self.start_codes,
+                lambda code: netlist_snapshot.net_name(brd, code),
+            )
+        first, last = {}, {}
+        for records in (self.prior, self.records):
+            for record in records:
+                key = record[:2]
+                if key not in first:
+                    first[key] = record[2:4]
+                last[key] = record[4:6]
+        changes = []
+        for key in sorted(last):
+            if first[key][1] != last[key][1]:
+                changes.append(key + first[key] + last[key])
+        return changes
+
+
+net_index = NetIndex()
+net_registry = NetRegistry()
+netlist_snapshot = NetlistSnapshot()
+net_name_index = NetNameIndex()
+pin_func_counts = PinFuncCounts()
+spatial_index = SpatialIndex()
+journal = ChangeJournal()
+
+# Caches that WireIt keeps up to date as it changes nets.
+board_caches = [
+    net_index,
+    net_registry,
+    netlist_snapshot,
+    net_name_index,
+    pin_func_counts,
+    spatial_index,
+]
+
+
+def get_netlist(brd=None):
+    """Create a dict with part ref & pad num as the key and attached net as the value."""
+    return netlist_snapshot.netlist(brd or pcbnew.GetBoard())
+
+
+def get_net_names(brd=None):
+    """Create a list of all the net names in the PCB, including nets with no pads."""
+    return net_registry.all_names(brd or pcbnew.GetBoard())
+
+
+def find_net(brd, net):
+    """Return the NETINFO_ITEM for a net name or code, or None if the board has no such net."""
+    return net_registry.find(brd, net)
+
+
+def get_net_name(brd, net_code):
+    """Return the name of the net with the given code, or an empty string if there's no such net."""
+    net = net_registry.find(brd, net_code)
+    return net.GetNetname() if net else ""
+
+
+def get_netlist_changes(brd=None):
+    """Return the changes to the pads' nets recorded by the journal (see ChangeJournal.changes())."""
+    brd = brd or pcbnew.GetBoard()
+    netlist_snapshot.ensure(brd)  # Find any changes made outside WireIt.
+    return journal.changes(brd)
+
+
+def get_netlist_file_changes(netlist_file, brd=None):
+    """Return the differences between the nets of the board's pads and the nets in a netlist file.
+
+    The differences are returned like get_netlist_changes() with the netlist's
+    net as the old net and the board's net as the new one. Pads in the netlist
+    that aren't on the board have no new net, and connected pads on the board
+    that aren't in the netlist have no old net.
+    """
+    brd = brd or pcbnew.GetBoard()
+    nodes = lib.get_netlist_nodes(netlist_file)
+    netlist_snapshot.ensure(brd)
+    names = {code: netlist_snapshot.net_name(brd, code) for code in set(netlist_snapshot.net_codes)}
+    no_connect = 0  # PCBNEW ID for the no-connect net.
+
+    changes = []
+    matched = {}  # Nodes already matched to a pad, in case other pads have the same name.
+    for key, code in zip(netlist_snapshot.keys, netlist_snapshot.net_codes):
+        node = nodes.pop(key, None)
+        if node is None:
+            node = matched.get(key)
+        else:
+            matched[key] = node
+        if node is None:
+            if code != no_connect:
+                changes.append(key + (None, None, code, names[code]))
+        elif node[1] != names[code]:
+            changes.append(key + node + (code, names[code]))
+    for key, node in nodes.items():
+        changes.append(key + node + (None, None))
+    changes.sort(key=lambda change: change[:2])
+    return changes
+
+
+def reset_netlist_changes(brd=None):
+    """Forget the recorded changes and make the current nets the baseline for future changes."""
+    brd = brd or pcbnew.GetBoard()
+    netlist_snapshot.ensure(brd)
+    journal.begin(brd, new_baseline=True)
+
+
+def get_net_name_index(brd=None):
+    """Return the searchable index of the net names in the PCB."""
+    brd = brd or pcbnew.GetBoard()
+    net_name_index.ensure(brd)
+    return net_name_index
+
+
+def get_pin_func_counts(brd=None, net_codes=None):
+    """Return a dict of net code => list with the number of pins of each function on the net.
+
+    The pin functions of the pads must first be set with pin_func_counts.set_pin_funcs().
+    All the nets on the board are returned if no net codes are given.
+    """
+    brd = brd or pcbnew.GetBoard()
+    pin_func_counts.ensure(brd)
+    if net_codes is None:
+        net_codes = list(pin_func_counts.counts.keys())
+    return {code: list(pin_func_counts.net_counts(brd, code)) for code in net_codes}
+
+
+class Selection(object):
+    """Snapshot of the selected pads, vias, tracks and zones and the nets they're on."""
+
+    def __init__(self, brd):
+        self.pads = []  # Selected pads.
+        self.vias = []  # Selected vias.
+        self.tracks = []  # Selected tracks, including vias.
+        self.zones = []  # Selected zones.
+        net_codes = set()
+
+        # Make a single pass over the board items, querying each one only once.
+        pads, tracks, zones = brd.GetPads(), brd.GetTracks(), brd.Zones()
+        for pad in pads:
+            if pad.IsSelected():
+                self.pads.append(pad)
+                net_codes.add(pad.GetNetCode())
+        for track in tracks:
+            if track.IsSelected():
+                self.tracks.append(track)
+                if type(track) is VIA:
+                    self.vias.append(track)
+                net_codes.add(track.GetNetCode())
+        for zone in zones:
+            if zone.IsSelected():
+                self.zones.append(zone)
+                net_codes.add(zone.GetNetCode())
+
+        self.net_codes = list(net_codes)  # Nets attached to the selected items.
+
+        if perf.profiler.current is not None:
+            perf.profiler.count(
+                "items scanned", count_items(pads) + count_items(tracks) + count_items(zones)
+            )
+            perf.profiler.count("items selected", len(self.items))
+
+    @property
+    def items(self):
+        """All the selected pads, tracks, vias and zones."""
+        return self.pads + self.tracks + self.zones
+
+    @property
+    def connectables(self):
+        """Selected items that can be attached to or removed from nets: pads and vias."""
+        return self.pads + self.vias
+
+
+# Set this to True to rebuild the connectivity of the entire board after every
+# WireIt operation instead of updating only the items that changed (for checking).
+FULL_CONNECTIVITY_REBUILD = False
+
+
+class NetEditor(object):
+    """Change the nets of board items and then refresh only the affected connectivity."""
+
+    def __init__(self, brd, record=True):
+        self.brd = brd
+        self.cnct = brd.GetConnectivity()
+        self.changed = {}  # Item key => item for every item whose net was changed.
+        self.dirty_nets = set()  # Codes of the nets that gained or lost items.
+        self.nets_created = False  # True if a new net was added to the board.
+        self.record = record  # Add the changes to the undo history when they're flushed.
+        self.deltas = {}  # Item key => [original net code, latest net code].
+        signature = board_signature(brd)
+        for cache in board_caches:
+            cache.check(brd, signature)
+
+    def find_or_create_net(self, net_name):
+        """Return the net with the given name, creating it if it doesn't exist."""
+        net = net_registry.find(self.brd, net_name)
+        if net is None:
+            net = pcbnew.NETINFO_ITEM(self.brd, net_name)
+            signature = board_signature(self.brd)
+            self.brd.Add(net)
+            # Adding a net doesn't change any pads, tracks or zones, so keep the
+            # caches that were current instead of letting them be rebuilt.
+            new_signature = board_signature(self.brd)
+            for cache in board_caches:
+                if cache.signature == signature:
+                    cache.stamp(self.brd, new_signature)
+            self.nets_created = True
+            net_registry.add(net)
+            net_name_index.add(net_name)
+        return net
+
+    def set_net(self, thing, net):
+        """Move an item to a net given as a NETINFO_ITEM or a net code."""
+        old_code = thing.GetNetCode()
+        if hasattr(self.cnct, "MarkItemNetAsDirty"):
+            # Let the connectivity know the item is leaving its current net.
+            self.cnct.MarkItemNetAsDirty(thing)
+        if isinstance(net, pcbnew.NETINFO_ITEM):
+            thing.SetNet(net)
+        else:
+            thing.SetNetCode(net)
+        new_code = thing.GetNetCode()
+        for cache in board_caches:
+            cache.move(thing, old_code, new_code)
+        key = item_key(thing)
+        delta = self.deltas.get(key)
+        if delta is None:
+            self.deltas[key] = [old_code, new_code]
+        else:
+            delta[1] = new_code
+        self.changed[key] = thing
+        self.dirty_nets.update((old_code, new_code))
+
+    def flush(self):
+        """Update the connectivity and ratsnest for the items whose nets were changed."""
+        if not self.changed and not self.nets_created:
+            return  # Nothing changed.
+        profiler = perf.profiler
+        profiler.count("items moved", len(self.changed))
+        profiler.count("nets changed", len(self.dirty_nets))
+        if FULL_CONNECTIVITY_REBUILD:
+            with profiler.phase("rebuild connectivity"):
+                self.brd.BuildListOfNets()
+                self.brd.BuildConnectivity()
+        else:
+            if self.nets_created:
+                # New nets have to be added to the board's net list.
+                with profiler.phase("build net list"):
+                    self.brd.BuildListOfNets()
+            with profiler.phase("update connectivity"):
+                for thing in self.changed.values():
+                    if hasattr(self.cnct, "Update"):
+                        self.cnct.Update(thing)
+                    else:
+                        self.cnct.Remove(thing)
+                        self.cnct.Add(thing)
+            with profiler.phase("recalculate ratsnest"):
+                self.cnct.RecalculateRatsnest()
+        signature = board_signature(self.brd)
+        for cache in board_caches:
+            cache.stamp(self.brd, signature)
+        if journal.active:
+            # The moves are journaled once the caches are current again, so looking
+            # up the names of the nets doesn't rebuild anything.
+            for key, (old_code, new_code) in self.deltas.items():
+                thing = self.changed[key]
+                if old_code != new_code and isinstance(thing, PAD):
+                    journal.record_move(self.brd, thing, old_code, new_code)
+        if self.record and self.deltas:
+            undo_history.push(self.brd, self.deltas)
+        self.changed = {}
+        self.dirty_nets = set()
+        self.nets_created = False
+        self.deltas = {}
+
+
+# Number of WireIt operations that can be undone, and the most item net changes
+# kept for undoing them. The oldest operations are forgotten first.
+UNDO_DEPTH = 20
+MAX_UNDO_CHANGES = 1000000
+
+# Array type for storing item keys (the addresses of the C++ objects).
+try:
+    array("Q")
+    KEY_TYPECODE = "Q"
+except ValueError:
+    KEY_TYPECODE = "L"  # Python 2 has no "Q" arrays.
+
+
+class UndoHistory(object):
+    """Net changes made by WireIt operations that can be undone and redone.
+
+    Each operation (a whole Batch) is stored as three arrays holding the keys of
+    the items it changed and their net codes before and after. Undoing or
+    redoing an operation finds the items through the net index and moves only
+    them, so it takes about as long as the original change. The history is
+    discarded when a different board is edited.
+    """
+
+    def __init__(self, depth=UNDO_DEPTH, max_changes=MAX_UNDO_CHANGES):
+        self.depth = depth
+        self.max_changes = max_changes
+        self.clear()
+
+    def clear(self):
+        """Forget all the operations."""
+        self.board = None  # Key of the board the operations were made on.
+        self.undo_stack = []  # (item keys, old net codes, new net codes) for each operation.
+        self.redo_stack = []  # Operations that were undone, most recent last.
+
+    def push(self, brd, deltas):
+        """Add an operation given as a dict of item key => (old net code, new net code)."""
+        if self.board != item_key(brd):
+            self.clear()
+            self.board = item_key(brd)
+        keys, old_codes, new_codes = array(KEY_TYPECODE), array("i"), array("i")
+        for key, (old_code, new_code) in deltas.items():
+            if old_code != new_code:
+                keys.append(key)
+                old_codes.append(old_code)
+                new_codes.append(new_code)
+        if not keys:
+            return  # Every item ended up back on its original net.
+        self.undo_stack.append((keys, old_codes, new_codes))
+        self.redo_stack = []  # A new operation can't be followed by the undone ones.
+        self.trim()
+
+    def trim(self):
+        """Forget the oldest operations until the history fits its limits."""
+        changes = sum(len(keys) for keys, _, _ in self.undo_stack)
+        while self.undo_stack and (
+            len(self.undo_stack) > self.depth or changes > self.max_changes
+        ):
+            changes -= len(self.undo_stack.pop(0)[0])
+
+    def can_undo(self, brd):
+        """Return True if there's an operation on the board to undo."""
+        return bool(self.undo_stack) and self.board == item_key(brd)
+
+    def can_redo(self, brd):
+        """Return True if there's an undone operation on the board to redo."""
+        return bool(self.redo_stack) and self.board == item_key(brd)
+
+    def undo(self, brd, refresh=False):
+        """Undo the latest operation and return the number of items moved back to their nets."""
+        if not self.can_undo(brd):
+            return 0
+        return self.replay(brd, self.undo_stack, self.redo_stack, 2, 1, refresh)
+
+    def redo(self, brd, refresh=False):
+        """Redo the latest undone operation and return the number of items moved."""
+        if not self.can_redo(brd):
+            return 0
+        return self.replay(brd, self.redo_stack, self.undo_stack, 1, 2, refresh)
+
+    def replay(self, brd, source, target, current, wanted, refresh):
+        """Move the items of the latest operation in source from one set of net codes to the other.
+
+        The operation is moved to target afterwards. current and wanted are the
+        positions in the operation of the net codes the items are on and the
+        ones they're moved to.
+        """
+        operation = source[-1]
+        keys, codes, new_codes = operation[0], operation[current], operation[wanted]
+        editor = NetEditor(brd, record=False)
+        things = net_index.find_items(brd, keys, codes)
+        if things is None:
+            # Items were removed or moved to other nets outside WireIt.
+            source.pop()
+            raise ValueError(
+                "The board was changed outside WireIt, so the operation can't be {}.".format(
+                    "undone" if source is self.undo_stack else "redone"
+                )
+            )
+        for thing, code in zip(things, new_codes):
+            editor.set_net(thing, code)
+        editor.flush()
+        if refresh:
+            with perf.profiler.phase("refresh display"):
+                pcbnew.Refresh()
+        target.append(source.pop())
+        perf.profiler.count("items moved", len(keys))
+        return len(keys)
+
+
+undo_history = UndoHistory()
+
+
+def get_stuff_on_nets(*nets):
+    """Get all the pads, tracks, zones attached to a net."""
+    return stuff_on_nets(pcbnew.GetBoard(), *nets)
+
+
+def stuff_on_nets(brd, *nets):
+    """Get all the pads, tracks, zones on the board attached to the nets."""
+    stuff = []
+    for net in nets:
+        if not isinstance(net, (int, pcbnew.NETINFO_ITEM)):
+            # Look up the net by its name.
+            net = net_registry.find(brd, net)
+            if net is None:
+                continue
+        if isinstance(net, pcbnew.NETINFO_ITEM):
+            net = net.GetNetCode()
+        stuff.extend(net_index.items_on(brd, net))
+    return stuff
+
+
+# Ways that Wire It can change the nets of the items passed to it.
+WIRE_ATTACH = "attach"  # All items unconnected: attach them to a named net.
+WIRE_RENAME = "rename"  # All items on one net: rename that net.
+WIRE_EXTEND = "extend"  # Items on one net or unconnected: attach the unconnected ones to the net.
+WIRE_MERGE = "merge"  # Items on two or more nets: merge the nets into a named net.
+
+
+def wire_mode(net_codes):
+    """Return how Wire It will change the nets of items attached to the given nets."""
+    no_connect = 0  # PCBNEW ID for the no-connect net.
+    net_codes = set(net_codes)
+    if len(net_codes) == 1 and no_connect in net_codes:
+        return WIRE_ATTACH
+    if len(net_codes) == 1:
+        return WIRE_RENAME
+    if len(net_codes) == 2 and no_connect in net_codes:
+        return WIRE_EXTEND
+    return WIRE_MERGE
+
+
+def is_connectable(thing):
+    """Return True if the item can be attached to or removed from a net: a pad or a via."""
+    return isinstance(thing, PAD) or type(thing) is VIA
+
+
+def net_code(net):
+    """Return the code for a net given as a NETINFO_ITEM or a net code."""
+    if isinstance(net, pcbnew.NETINFO_ITEM):
+        return net.GetNetCode()
+    return net
+
+
+class Batch(object):
+    """Queue the net changes of Wire It, Cut It and Swap It operations and apply them in one pass.
+
+    Use it as a context manager:
+
+        with Batch(GetBoard()) as batch:
+            batch.swap(pad_a, pad_b)
+            batch.cut([pad_c])
+
+    Changes made to the same item are combined so only its final net is applied,
+    and changes that return an item to its original net are dropped. The board
+    connectivity and ratsnest are updated (and the display refreshed if refresh
+    is True) once when the batch ends.
+    If the batch ends with an exception, the queued changes are discarded.
+    """
+
+    def __init__(self, brd, refresh=False):
+        self.brd = brd
+        self.refresh = refresh  # Refresh the display when the changes are applied.
+        self.editor = NetEditor(brd)
+        self.pending = {}  # Item key => (item, new net) for each queued change.
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.pending = {}
+
+    def net_of(self, thing):
+        """Return the net an item will be on once the queued changes are applied."""
+        change = self.pending.get(item_key(thing))
+        if change:
+            return change[1]
+        return thing.GetNet()
+
+    def net_code_of(self, thing):
+        """Return the code of the net an item will be on once the queued changes are applied."""
+        return net_code(self.net_of(thing))
+
+    def set_net(self, thing, net):
+        """Queue moving an item to a net given as a NETINFO_ITEM or a net code."""
+        key = item_key(thing)
+        if net_code(net) == thing.GetNetCode():
+            # The item goes back to where it started, so cancel any queued change.
+            self.pending.pop(key, None)
+        else:
+            self.pending[key] = (thing, net)
+
+    def items_on(self, *net_codes):
+        """Return the pads, tracks and zones that will be on the nets once the queued changes are applied."""
+        net_codes = set(net_codes)
+        stuff = []
+        for code in net_codes:
+            for thing in net_index.items_on(self.brd, code):
+                if item_key(thing) not in self.pending:
+                    stuff.append(thing)
+        stuff.extend(
+            thing
+            for thing, net in self.pending.values()
+            if net_code(net) in net_codes
+        )
+        return stuff
+
+    def wire(self, items, net_name=None):
+        """Connect pads and vias to each other or to the net of the other items.
+
+        The net_name is needed unless the unconnected pads and vias are just being
+        added to the single net the other items are already on (see wire_mode()).
+        """
+        no_connect = 0  # PCBNEW ID for the no-connect net.
+        net_codes = list(set(self.net_code_of(thing) for thing in items))
+        mode = wire_mode(net_codes)
+
+        if mode == WIRE_EXTEND:
+            # Attach the unconnected pads and vias to the net the others are on.
+            net_codes.remove(no_connect)
+            net = net_registry.find(self.brd, net_codes[0])
+            if net is None:
+                # The registry may have missed a net added outside WireIt, so ask the board.
+                net = self.brd.FindNet(net_codes[0])
+            if net is None:
+                raise ValueError("The board has no net with code {}.".format(net_codes[0]))
+            for thing in items:
+                if is_connectable(thing) and self.net_code_of(thing) == no_connect:
+                    self.set_net(thing, net)
+            return net
+
+        if not net_name:
+            raise ValueError("A net name is needed to {} nets.".format(mode))
+        net = self.editor.find_or_create_net(net_name)
+
+        if mode == WIRE_ATTACH:
+            # Attach all the pads and vias to the net.
+            for thing in items:
+                if is_connectable(thing):
+                    self.set_net(thing, net)
+            return net
+
+        # Move *ALL* the pads, tracks, zones on the nets to the named net.
+        # Only the selected items are taken from the no-connect net, not
+        # every unconnected item on the board.
+        if no_connect in net_codes:
+            net_codes.remove(no_connect)
+            for thing in items:
+                if is_connectable(thing) and self.net_code_of(thing) == no_connect:
+                    self.set_net(thing, net)
+        for thing in self.items_on(*net_codes):
+            self.set_net(thing, net)
+        return net
+
+    def attach(self, items, net):
+        """Attach pads and vias to a net given as a name, NETINFO_ITEM or net code.
+
+        Unlike wire(), the nets the items are already on are left as they are
+        and only the items themselves are moved. A net with a new name is created.
+        """
+        if not isinstance(net, (int, pcbnew.NETINFO_ITEM)):
+            net = self.editor.find_or_create_net(net)
+        for thing in items:
+            if is_connectable(thing):
+                self.set_net(thing, net)
+        return net
+
+    def cut(self, items):
+        """Disconnect pads and vias from their nets."""
+        no_connect = 0  # PCBNEW ID for the no-connect net.
+        for thing in items:
+            if is_connectable(thing):
+                self.set_net(thing, no_connect)
+
+    def swap(self, pad0, pad1):
+        """Swap the nets attached to two pads."""
+        pad0_net = self.net_of(pad0)
+        self.set_net(pad0, self.net_of(pad1))
+        self.set_net(pad1, pad0_net)
+
+    def permute(self, moves):
+        """Move the nets between pads given as a list of (pad, pad whose net it gets) pairs.
+
+        The pads getting nets must be the same as the pads giving them up so
+        no net is lost or duplicated.
+        """
+        moves = list(moves)
+        if set(item_key(pad) for pad, _ in moves) != set(item_key(src) for _, src in moves):
+            raise ValueError("The pads getting nets aren't the same as the pads giving them up.")
+        # Find all the nets before changing any of them.
+        nets = [self.net_of(src) for _, src in moves]
+        for (pad, _), net in zip(moves, nets):
+            self.set_net(pad, net)
+
+    def commit(self):
+        """Apply all the queued changes and update the board once."""
+        with perf.profiler.phase("set nets"):
+            for thing, net in self.pending.values():
+                self.editor.set_net(thing, net)
+        self.pending = {}
+        self.editor.flush()
+        if self.refresh:
+            with perf.profiler.phase("refresh display"):
+                pcbnew.Refresh()
+
+
+def wire(brd, items, net_name=None, refresh=False):
+    """Connect pads and vias to a net and return the net (see Batch.wire())."""
+    with Batch(brd, refresh) as batch:
+        return batch.wire(items, net_name)
+
+
+def predict_wire_pin_func_counts(brd, items, net_name=None):
+    """Return the pin function counts of the net that wire() would leave the items on.
+
+    The counts of the nets being merged are added together along with the pin
+    functions of the unconnected pads being attached, so nothing changes on the board.
+
+    Returns:
+        (counts of the resulting net, list with the counts of each existing net merged into it)
+    """
+    no_connect = 0  # PCBNEW ID for the no-connect net.
+    pin_func_counts.ensure(brd)
+    net_codes = set(thing.GetNetCode() for thing in items)
+    if wire_mode(list(net_codes)) != WIRE_EXTEND and net_name:
+        # Wiring to the name of an existing net also merges with that net.
+        net = net_registry.find(brd, net_name)
+        if net:
+            net_codes.add(net.GetNetCode())
+
+    total = [0] * len(erc.PIN_FUNCS)
+    merged = [pin_func_counts.net_counts(brd, code) for code in net_codes - {no_connect}]
+    for counts in merged:
+        for index, count in enumerate(counts):
+            total[index] += count
+    for thing in items:
+        if is_connectable(thing) and thing.GetNetCode() == no_connect:
+            position = netlist_snapshot.positions.get(item_key(thing))
+            if position is not None:
+                index = pin_func_counts.func_index(position)
+                if index is not None:
+                    total[index] += 1
+    return total, merged
+
+
+def get_connectables_in_region(brd, x0, y0, x1, y1, net_code=None):
+    """Return the pads and vias inside a rectangle, only those on a net if its code is given."""
+    found = spatial_index.in_region(brd, x0, y0, x1, y1)
+    if net_code is not None:
+        found = [thing for thing in found if thing.GetNetCode() == net_code]
+    return found
+
+
+def get_connectables_near(brd, x, y, radius, net_code=None):
+    """Return the pads and vias within a distance of a point, closest first.
+
+    Only the ones on a net are returned if its code is given.
+    """
+    found = spatial_index.near(brd, [(x, y)], radius)[0]
+    if net_code is not None:
+        found = [thing for thing in found if thing.GetNetCode() == net_code]
+    return found
+
+
+def get_nearest_connectable(brd, x, y, max_distance=None, net_code=None):
+    """Return the pad or via closest to a point (only one on a net if its code is given), or None."""
+    accept = None
+    if net_code is not None:
+        accept = lambda thing: thing.GetNetCode() == net_code
+    return spatial_index.nearest(brd, [(x, y)], max_distance, accept)[0]
+
+
+def wire_region(brd, x0, y0, x1, y1, net, refresh=False):
+    """Attach every unconnected pad and via inside a rectangle to a net and return the items attached.
+
+    The net can be given as a name, NETINFO_ITEM or net code, and a net with a
+    new name is created. Coordinates are in PCBNEW's internal units.
+    """
+    no_connect = 0  # PCBNEW ID for the no-connect net.
+    items = get_connectables_in_region(brd, x0, y0, x1, y1, no_connect)
+    with Batch(brd, refresh) as batch:
+        batch.attach(items, net)
+    return items
+
+
+def wire_near(brd, points, radius, net, nearest_only=False, refresh=False):
+    """Attach the unconnected pads and vias near a set of points to a net and return the items attached.
+
+    Args:
+        brd: The board.
+        points: List of (x, y) positions in PCBNEW's internal units.
+        radius: Items within this distance of a point are attached.
+        net: Name, NETINFO_ITEM or code of the net. A net with a new name is created.
+        nearest_only: Only attach the unconnected item closest to each point.
+        refresh: Refresh the display afterwards.
+    """
+    no_connect = 0  # PCBNEW ID for the no-connect net.
+    points = list(points)
+    if nearest_only:
+        unconnected = lambda thing: thing.GetNetCode() == no_connect
+        found = [spatial_index.nearest(brd, points, radius, unconnected)]
+    else:
+        found = spatial_index.near(brd, points, radius)
+    items = {}
+    for things in found:
+        for thing in things:
+            if thing is not None and thing.GetNetCode() == no_connect:
+                items[item_key(thing)] = thing
+    items = list(items.values())
+    with Batch(brd, refresh) as batch:
+        batch.attach(items, net)
+    return items
+
+
+def wire_track_ends(brd, tracks, radius, refresh=False):
+    """Attach the unconnected pads and vias near the ends of tracks to the nets of the tracks.
+
+    Returns the items that were attached.
+    """
+    no_connect = 0  # PCBNEW ID for the no-connect net.
+    points, codes = [], []
+    for track in tracks:
+        code = track.GetNetCode()
+        if code == no_connect:
+            continue  # There's no net to attach anything to.
+        for end in (track.GetStart(), track.GetEnd()):
+            points.append((end.x, end.y))
+            codes.append(code)
+    attached = {}
+    with Batch(brd, refresh) as batch:
+        for code, things in zip(codes, spatial_index.near(brd, points, radius)):
+            for thing in things:
+                key = item_key(thing)
+                if key not in attached and thing.GetNetCode() == no_connect:
+                    attached[key] = thing
+                    batch.set_net(thing, code)
+    return list(attached.values())
+
+
+def cut(brd, items, refresh=False):
+    """Disconnect pads and vias from their nets."""
+    with Batch(brd, refresh) as batch:
+        batch.cut(items)
+
+
+def swap(brd, pad0, pad1, refresh=False):
+    """Swap the nets attached to two pads."""
+    with Batch(brd, refresh) as batch:
+        batch.swap(pad0, pad1)
+
+
+def swap_pairs(brd, pairs, refresh=False):
+    """Swap the nets of each pair of pads in turn and update the board once at the end."""
+    with Batch(brd, refresh) as batch:
+        for pad0, pad1 in pairs:
+            batch.swap(pad0, pad1)
+
+
+def permute(brd, moves, refresh=False):
+    """Move the nets between pads given as (pad, pad whose net it gets) pairs (see Batch.permute())."""
+    with Batch(brd, refresh) as batch:
+        batch.permute(moves)
+
+
+def undo(brd, refresh=False):
+    """Undo the latest WireIt operation on the board and return the number of items changed (see UndoHistory)."""
+    return undo_history.undo(brd, refresh)
+
+
+def redo(brd, refresh=False):
+    """Redo the latest undone WireIt operation on the board and return the number of items changed."""
+    return undo_history.redo(brd, refresh)
+
+
+def pad_order(key):
+    """Sort key for (part ref, pad name) that puts pad 2 before pad 10."""
+    return [int(s) if s.isdigit() else s for s in re.split(r"(\d+)", key[1])]
+
+
+def swap_moves(pairs):
+    """Return the moves of nets made by swapping pairs of pad keys in turn.
+
+    The pairs are ((ref, pad), (ref, pad)) and each move is a (pad key, key
+    of the pad whose net it gets). Pads that end up with their own nets are left out.
+    """
+    source = {}
+    for key0, key1 in pairs:
+        source[key0], source[key1] = source.get(key1, key1), source.get(key0, key0)
+    return sorted(
+        ((key, src) for key, src in source.items() if key != src),
+        key=lambda move: (move[0][0], pad_order(move[0])),
+    )
+
+
+def get_pads_by_key(brd, keys):
+    """Return a dict of (part ref, pad name) => pad for the pads with the given keys."""
+    keys = set(keys)
+    refs = set(ref for ref, _ in keys)
+    pads = {}
+    duplicates = set()
+    if hasattr(brd, "GetFootprints"):
+        # Only look at the pads of the parts that are needed.
+        footprints = ((fp.GetReference(), fp) for fp in brd.GetFootprints())
+        for ref, footprint in footprints:
+            if ref in refs:
+                for pad in footprint.Pads():
+                    key = (ref, pad.GetPadName())
+                    if key in keys:
+                        if key in pads:
+                            duplicates.add(key)
+                        pads[key] = pad
+    else:  # KiCad 5 and earlier.
+        for pad in brd.GetPads():
+            key = (pad_ref(pad), pad.GetPadName())
+            if key in keys:
+                if key in pads:
+                    duplicates.add(key)
+                pads[key] = pad
+    missing = keys - set(pads)
+    if missing:
+        raise ValueError(
+            "These pads aren't on the board: "
+            + ", ".join("{}/{}".format(*key) for key in sorted(missing))
+        )
+    if duplicates:
+        raise ValueError(
+            "These names are used by more than one pad: "
+            + ", ".join("{}/{}".format(*key) for key in sorted(duplicates))
+        )
+    return pads
+
+
+def read_swap_file(swap_file):
+    """Read a CSV file of pads to swap and return a list of ((ref, pad), (ref, pad)) pairs.
+
+    Each line holds the part references and pad names of two pads whose nets
+    are swapped (e.g., U1,3,U1,5). The swaps are made in order, so any
+    permutation of the nets can be given as a series of swaps. Blank lines,
+    lines starting with # and a header line starting with "ref" are skipped.
+    """
+    pairs = []
+    with open(swap_file, "r") as fp:
+        for line_num, row in enumerate(csv.reader(fp), 1):
+            row = [cell.strip() for cell in row]
+            if not any(row) or row[0].startswith("#"):
+                continue
+            if not pairs and row[0].lower() in ("ref", "reference"):
+                continue  # Header.
+            if len(row) != 4 or not all(row):
+                raise ValueError(
+                    "Line {} of {} should have four fields: ref,pad,ref,pad".format(
+                        line_num, swap_file
+                    )
+                )
+            pairs.append(((row[0], row[1]), (row[2], row[3])))
+    return pairs
+
+
+def pin_desc(key, info):
+    """Return a description of a pin like "U1/3 (IN+, input, unit 1)" for error messages."""
+    if info is None:
+        return "{}/{}".format(*key)
+    name, func, unit = info
+    return "{}/{} ({}, {}, unit {})".format(
+        key[0], key[1], name, erc.PIN_FUNC_NAMES.get(func, func), unit
+    )
+
+
+def check_swaps(moves, pin_info):
+    """Return a list of the reasons some moves of nets between pads may be wrong.
+
+    Args:
+        moves: List of (pad key, key of the pad whose net it gets) from swap_moves().
+        pin_info: Dict of (ref, pad) => (pin name, pin function, unit) from WireIt_lib.get_pin_info().
+            Units are numbers with 0 for the pins shared by all the units.
+
+    A net can move between pins of the same unit with the same function, or
+    between pins with the same name and function in two units of a part if
+    all the pins of the units are swapped.
+    """
+    problems = []
+    unit_sources = {}  # (part ref, unit) => units its pins get their nets from.
+    checked = set()  # Pairs of pads already checked, so a swap isn't reported twice.
+    for key, src in moves:
+        info, src_info = pin_info.get(key), pin_info.get(src)
+        pair = frozenset((key, src))
+        if info and src_info and info[2] != src_info[2]:
+            unit_sources.setdefault((key[0], info[2]), set()).add(src_info[2])
+        if pair in checked:
+            continue
+        checked.add(pair)
+        if key[0] != src[0]:
+            problems.append(
+                "{} and {} are on different parts.".format(
+                    pin_desc(src, src_info), pin_desc(key, info)
+                )
+            )
+        elif info is None or src_info is None:
+            problems.append(
+                "There's no library information for {}.".format(
+                    pin_desc(key, info) if info is None else pin_desc(src, src_info)
+                )
+            )
+        elif info[1] != src_info[1]:
+            problems.append(
+                "{} and {} have different pin functions.".format(
+                    pin_desc(src, src_info), pin_desc(key, info)
+                )
+            )
+        elif info[2] != src_info[2] and info[0] != src_info[0]:
+            problems.append(
+                "{} and {} are in different units and have different names.".format(
+                    pin_desc(src, src_info), pin_desc(key, info)
+                )
+            )
+
+    # Nets can only be moved between units if the units are swapped as a whole.
+    moved = set(key for key, _ in moves)
+    shared = set()  # Parts whose shared pins were reported as swapped.
+    for (ref, unit), src_units in sorted(unit_sources.items()):
+        if unit == 0 or 0 in src_units:
+            if ref not in shared:
+                shared.add(ref)
+                problems.append(
+                    "The pins shared by all the units of {} can't be swapped "
+                    "with the pins of a unit.".format(ref)
+                )
+        elif len(src_units) > 1:
+            problems.append(
+                "Unit {} of {} gets nets from more than one unit ({}).".format(
+                    unit, ref, ", ".join(str(u) for u in sorted(src_units))
+                )
+            )
+        else:
+            unmoved = sorted(
+                (
+                    key
+                    for key, info in pin_info.items()
+                    if key[0] == ref and info[2] == unit and key not in moved
+                ),
+                key=pad_order,
+            )
+            if unmoved:
+                problems.append(
+                    "Only part of unit {} of {} is swapped. These pins keep their nets: {}".format(
+                        unit, ref, ", ".join(pad for _, pad in unmoved)
+                    )
+                )
+    return problems
+
+
+def unit_swap_pairs(keys, pin_info):
+    """Pair up the pads of two units of a part so swapping each pair swaps the units.
+
+    Args:
+        keys: (ref, pad) of the pads of the two units.
+        pin_info: Dict of (ref, pad) => (pin name, pin function, unit) from WireIt_lib.get_pin_info().
+
+    Pins are paired by name or, if the names of the units' pins don't match,
+    in order of pad name. A ValueError is raised if the pads aren't all in
+    two units of the same part with the same number of pins.
+    """
+    units = {}
+    for key in keys:
+        info = pin_info.get(key)
+        if info is None:
+            raise ValueError("There's no library information for {}/{}.".format(*key))
+        units.setdefault((key[0], info[2]), []).append(key)
+    if len(units) != 2:
+        raise ValueError(
+            "The pads are in {} units instead of two units of the same part.".format(len(units))
+        )
+    (unit0, keys0), (unit1, keys1) = sorted(units.items())
+    if unit0[0] != unit1[0] or 0 in (unit0[1], unit1[1]):
+        raise ValueError("The pads must be in two units of the same part.")
+    if len(keys0) != len(keys1):
+        raise ValueError(
+            "Unit {} of {} has {} pads selected but unit {} has {}.".format(
+                unit0[1], unit0[0], len(keys0), unit1[1], len(keys1)
+            )
+        )
+    names0 = dict((pin_info[key][0], key) for key in keys0)
+    names1 = dict((pin_info[key][0], key) for key in keys1)
+    if len(names0) == len(keys0) and set(names0) == set(names1):
+        return [(names0[name], names1[name]) for name in sorted(names0)]
+    return list(zip(sorted(keys0, key=pad_order), sorted(keys1, key=pad_order)))
+
+
+def rotation_pairs(keys):
+    """Return the pairs of pad keys to swap in turn so each pad gets the net of the next one.
+
+    The pads are taken in order of part reference and pad name, and the last
+    one gets the net of the first, so rotating two pads just swaps them.
+    """
+    keys = sorted(keys, key=lambda key: (key[0], pad_order(key)))
+    return list(zip(keys, keys[1:]))
+
+
+def swappable_groups(pads, pin_info):
+    """Split pads into groups whose nets can be exchanged among themselves.
+
+    Pads are grouped by part, unit and pin function using pin_info, a dict of
+    (ref, pad) => (pin name, pin function, unit) from WireIt_lib.get_pin_info().
+    Pads with no pin information are only grouped by part, so nets never
+    move between parts. Groups with only one pad are left out.
+    """
+    groups = {}
+    for pad in pads:
+        key = (pad_ref(pad), pad.GetPadName())
+        info = pin_info.get(key)
+        group_key = (key[0],) + (info[1:] if info else (None, None))
+        groups.setdefault(group_key, []).append(pad)
+    return [group for _, group in sorted(groups.items(), key=lambda g: str(g[0])) if len(group) > 1]
+
+
+def net_anchor_points(brd, net_code, skip):
+    """Return the positions of the pads, vias and track ends of a net that an airwire could go to.
+
+    Items whose keys are in skip are left out.
+    """
+    no_connect = 0  # PCBNEW ID for the no-connect net.
+    if net_code == no_connect:
+        return []
+    points = []
+    for thing in net_index.items_on(brd, net_code):
+        if item_key(thing) in skip:
+            continue
+        if isinstance(thing, PAD) or type(thing) is VIA:
+            points.append(item_position(thing))
+        elif isinstance(thing, TRACK):
+            for end in (thing.GetStart(), thing.GetEnd()):
+                points.append((end.x, end.y))
+    return points
+
+
+def plan_pin_swaps(brd, groups, crossing_cost=None):
+    """Find the nets for groups of swappable pads that give the shortest airwires with the fewest crossings.
+
+    Args:
+        brd: The board.
+        groups: Lists of pads whose nets can be exchanged among themselves (see swappable_groups()).
+        crossing_cost: Length added for each pair of crossing airwires (see
+            WireIt_swap.optimize_assignment()).
+
+    Returns:
+        (moves, before, after) where moves is a list of (pad, pad whose net it
+        gets) for permute(), and before and after are the (total airwire length,
+        crossings) of the groups with their current and new nets. Airwires are
+        measured to the closest pad, via or track end of their nets that isn't
+        in a group.
+    """
+    skip = set(item_key(pad) for group in groups for pad in group)
+    anchors = {}  # Net code => anchor points of the net.
+    moves = []
+    before, after = [0.0, 0], [0.0, 0]
+    for group in groups:
+        pins = [item_position(pad) for pad in group]
+        net_points = []
+        for pad in group:
+            code = pad.GetNetCode()
+            if code not in anchors:
+                anchors[code] = net_anchor_points(brd, code, skip)
+            net_points.append(anchors[code])
+        assignment, group_before, group_after = swap_opt.optimize_assignment(
+            pins, net_points, crossing_cost
+        )
+        moves.extend((group[i], group[k]) for i, k in enumerate(assignment) if i != k)
+        for totals, group_totals in ((before, group_before), (after, group_after)):
+            totals[0] += group_totals[0]
+            totals[1] += group_totals[1]
+    return moves, tuple(before), tuple(after)
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Optional timing of the phases of WireIt operations to find out where the time goes.
+
+Nothing is measured until the profiler is enabled. After that, each operation
+records how long its phases took, how many board items it went through and,
+if asked for, how many calls it made into the pcbnew SWIG wrappers. The
+records of the latest operations are kept for a summary and appended to a
+rolling log file.
+"""
+
+import pcbnew
+
+import functools
+import json
+import logging
+import logging.handlers
+import time
+import types
+from collections import Counter, deque
+
+try:
+    perf_counter = time.perf_counter
+except AttributeError:
+    # Python 2.
+    perf_counter = time.time
+
+# Number of operations kept for the summary.
+HISTORY_LENGTH = 50
+
+# Size of the log file before it's rolled over, and how many old log files are kept.
+MAX_LOG_BYTES = 1000000
+LOG_BACKUP_COUNT = 2
+
+# pcbnew classes whose methods are counted (not all of them exist in every KiCad version).
+# Methods inherited from their base classes in pcbnew are counted too.
+SWIG_CLASS_NAMES = (
+    "BOARD",
+    "CONNECTIVITY_DATA",
+    "NETINFO_ITEM",
+    "FOOTPRINT",
+    "MODULE",
+    "PAD",
+    "D_PAD",
+    "PCB_TRACK",
+    "TRACK",
+    "PCB_VIA",
+    "VIA",
+    "ZONE",
+    "ZONE_CONTAINER",
+)
+
+
+class NullContext(object):
+    """Context manager that does nothing, used for everything while the profiler is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+NULL_CONTEXT = NullContext()
+
+
+class OperationStats(object):
+    """Timings and counts recorded for one WireIt operation."""
+
+    def __init__(self, name):
+        self.name = name
+        self.time = time.time()  # When the operation started.
+        self.seconds = 0.0  # How long the whole operation took.
+        self.phases = []  # [depth, phase name, seconds] in the order the phases started.
+        self.counts = Counter()  # Counts of the items scanned, moved, etc.
+        self.swig_calls = Counter()  # "Class.Method" => number of calls.
+        self.error = None  # Exception that ended the operation.
+
+    def as_dict(self):
+        """Return the stats as a dict that can be written as JSON."""
+        return {
+            "operation": self.name,
+            "time": self.time,
+            "seconds": self.seconds,
+            "phases": [list(phase) for phase in self.phases],
+            "counts": dict(self.counts),
+            "swig_calls": dict(self.swig_calls),
+            "error": self.error,
+        }
+
+    def describe(self, max_calls=10):
+        """Return a few lines of text describing the stats."""
+        lines = [
+            "{} took {:.1f} ms{}".format(
+                self.name,
+                self.seconds * 1000,
+                " (failed: {})".format(self.error) if self.error else "",
+            )
+        ]
+        for depth, name, seconds in self.phases:
+            lines.append("{}{}: {:.1f} ms".format("    " * (depth + 1), name, seconds * 1000))
+        for name, count in sorted(self.counts.items()):
+            lines.append("    {}: {}".format(name, count))
+        if self.swig_calls:
+            lines.append(
+                "    pcbnew calls: {}, most frequent:".format(sum(self.swig_calls.values()))
+            )
+            for name, count in self.swig_calls.most_common(max_calls):
+                lines.append("        {}: {}".format(name, count))
+        return lines
+
+
+class PhaseTimer(object):
+    """Context manager that times a phase of the operation being profiled."""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        # Add the phase now so it's listed before the phases inside it.
+        self.phase = [self.profiler.depth, self.name, 0.0]
+        self.profiler.current.phases.append(self.phase)
+        self.profiler.depth += 1
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.phase[2] = perf_counter() - self.start
+        self.profiler.depth = self.phase[0]
+        return False
+
+
+class OperationTimer(object):
+    """Context manager that profiles a whole operation."""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.stats = OperationStats(self.name)
+        self.profiler.current = self.stats
+        self.profiler.depth = 0
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stats.seconds = perf_counter() - self.start
+        if exc_type is not None:
+            self.stats.error = "{}: {}".format(exc_type.__name__, exc_value)
+        self.profiler.current = None
+        self.profiler.finish(self.stats)
+        return False
+
+
+class Profiler(object):
+    """Collects the stats of WireIt operations while it's enabled.
+
+    Operations and their phases are marked with context managers:
+
+        with profiler.operation("Wire It"):
+            with profiler.phase("scan selection"):
+                ...
+            profiler.count("pads moved", len(pads))
+
+    While the profiler is off, these return a shared do-nothing context
+    manager and counts are ignored, so the instrumentation costs next to
+    nothing. Operations started inside another operation are timed as a
+    phase of it.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.current = None  # Stats of the operation being profiled.
+        self.depth = 0  # Nesting depth of the phase being timed.
+        self.history = deque(maxlen=HISTORY_LENGTH)
+        self.logger = None
+        self.patched = []  # (class, method name, original method) replaced to count calls.
+
+    def enable(self, log_file=None, count_swig_calls=False):
+        """Start profiling the operations.
+
+        Args:
+            log_file: Append the stats of each operation as a line of JSON to this file.
+                It's rolled over when it gets too big.
+            count_swig_calls: Count the calls to the methods of the pcbnew classes.
+                This slows the operations down, so the timings are less accurate.
+        """
+        self.disable()
+        if log_file:
+            handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUP_COUNT
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger = logging.getLogger("WireIt.perf")
+            self.logger.propagate = False
+            self.logger.setLevel(logging.INFO)
+            self.logger.addHandler(handler)
+        if count_swig_calls:
+            self.count_swig_calls()
+        self.enabled = True
+
+    def disable(self):
+        """Stop profiling, close the log file and stop counting pcbnew calls."""
+        self.enabled = False
+        if self.logger:
+            for handler in list(self.logger.handlers):
+                self.logger.removeHandler(handler)
+                handler.close()
+            self.logger = None
+        for cls, name, method in self.patched:
+            setattr(cls, name, method)
+        self.patched = []
+
+    def count_swig_calls(self):
+        """Replace the methods of the pcbnew classes with ones that count their calls."""
+        done = set()
+        for class_name in SWIG_CLASS_NAMES:
+            cls = getattr(pcbnew, class_name, None)
+            if cls is None:
+                continue
+            for base in cls.__mro__:
+                if base in done or base.__module__ != pcbnew.__name__:
+                    continue  # Already counted, or not a pcbnew class (e.g., object).
+                done.add(base)
+                for name, method in list(vars(base).items()):
+                    if name.startswith("_") or not isinstance(method, types.FunctionType):
+                        continue
+                    setattr(base, name, self.counted(base.__name__ + "." + name, method))
+                    self.patched.append((base, name, method))
+
+    def counted(self, call_name, method):
+        """Return a wrapper for a method that counts its calls during an operation."""
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            stats = self.current
+            if stats is not None:
+                stats.swig_calls[call_name] += 1
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    def operation(self, name):
+        """Return a context manager that profiles an operation."""
+        if not self.enabled:
+            return NULL_CONTEXT
+        if self.current is not None:
+            return PhaseTimer(self, name)
+        return OperationTimer(self, name)
+
+    def phase(self, name):
+        """Return a context manager that times a phase of the operation being profiled."""
+        if self.current is None:
+            return NULL_CONTEXT
+        return PhaseTimer(self, name)
+
+    def count(self, name, n=1):
+        """Add to a count kept for the operation being profiled."""
+        if self.current is not None:
+            self.current.counts[name] += n
+
+    def finish(self, stats):
+        """Keep the stats of a finished operation and write them to the log."""
+        self.history.append(stats)
+        if self.logger:
+            self.logger.info(json.dumps(stats.as_dict(), sort_keys=True))
+
+    def summary(self, last=5):
+        """Return a text description of the last few operations, most recent first."""
+        if not self.history:
+            return "No WireIt operations have been profiled yet."
+        lines = []
+        for stats in list(self.history)[-last:][::-1]:
+            lines.extend(stats.describe())
+            lines.append("")
+        return "\n".join(lines).rstrip()
+
+
+def profiled(name):
+    """Decorator that profiles each call of a function as an operation."""
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiler.operation(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+profiler = Profiler()
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""Find the assignment of nets to a group of swappable pins that gives the shortest airwires.
+
+Each pin's airwire is taken to run to the closest point its net has to
+connect to outside the group. The assignment with the shortest total length
+is found with the Hungarian method, and then pairs of pins whose airwires
+cross are swapped if that lowers the length plus a cost for each crossing.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Use the slower pure-Python Hungarian method and crossing checks.
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# Most passes made over the crossing airwires looking for swaps that improve them.
+MAX_CROSSING_PASSES = 10
+
+# Number of airwires checked against all the others at a time when finding crossings with NumPy.
+CROSSING_BLOCK_SIZE = 512
+
+INFINITY = float("inf")
+
+
+def nearest_points(pins, net_points):
+    """Find the closest point of each net to each pin.
+
+    Args:
+        pins: List of (x, y) positions of the pins.
+        net_points: List with the (x, y) points each net has to connect to.
+
+    Returns:
+        (costs, ends) where costs[i][k] is the distance from pin i to the
+        closest point of net k and ends[i][k] is that point. A net with no
+        points costs nothing and has no end.
+    """
+    costs = [[0.0] * len(net_points) for _ in pins]
+    ends = [[None] * len(net_points) for _ in pins]
+    if np is not None and pins:
+        xy = np.array(pins, dtype=float)
+        for k, points in enumerate(net_points):
+            if not points:
+                continue
+            pts = np.array(points, dtype=float)
+            d2 = (xy[:, 0, None] - pts[None, :, 0]) ** 2 + (xy[:, 1, None] - pts[None, :, 1]) ** 2
+            closest = d2.argmin(axis=1)
+            dist = np.sqrt(d2[np.arange(len(pins)), closest]).tolist()
+            for i, c in enumerate(closest.tolist()):
+                costs[i][k] = dist[i]
+                ends[i][k] = points[c]
+        return costs, ends
+
+    for k, points in enumerate(net_points):
+        if not points:
+            continue
+        for i, (x, y) in enumerate(pins):
+            d2, point = min(((px - x) ** 2 + (py - y) ** 2, (px, py)) for px, py in points)
+            costs[i][k] = d2 ** 0.5
+            ends[i][k] = point
+    return costs, ends
+
+
+def hungarian(costs):
+    """Return the column assigned to each row of a square cost matrix so the total cost is least.
+
+    This is the O(n^3) Hungarian method with potentials. The potentials start
+    from the row and column minimums and the rows are first matched greedily
+    to columns where their reduced cost is zero, so only the remaining rows
+    need augmenting paths. The scans over the columns are done by NumPy if
+    it's available.
+    """
+    if np is not None:
+        return hungarian_np(np.array(costs, dtype=float))
+
+    n = len(costs)
+    # Row and column potentials, with a dummy column 0 used to start each augmenting path.
+    v = [0.0] + [min(costs[i][j] for i in range(n)) for j in range(n)]
+    u = [0.0] + [min(costs[i][j] - v[j + 1] for j in range(n)) for i in range(n)]
+    row_of = [0] * (n + 1)  # Row assigned to each column (0 for none).
+    matched = [False] * (n + 1)
+    for i in range(1, n + 1):
+        for j in range(1, n + 1):
+            if row_of[j] == 0 and costs[i - 1][j - 1] - u[i] - v[j] <= 0:
+                row_of[j] = i
+                matched[i] = True
+                break
+
+    way = [0] * (n + 1)  # Previous column on the augmenting path.
+    for i in range(1, n + 1):
+        if matched[i]:
+            continue
+        row_of[0] = i
+        j0 = 0
+        min_slack = [INFINITY] * (n + 1)
+        used = [False] * (n + 1)
+        while True:
+            used[j0] = True
+            i0 = row_of[j0]
+            row = costs[i0 - 1]
+            ui0 = u[i0]
+            delta, j1 = INFINITY, 0
+            for j in range(1, n + 1):
+                if not used[j]:
+                    slack = row[j - 1] - ui0 - v[j]
+                    if slack < min_slack[j]:
+                        min_slack[j] = slack
+                        way[j] = j0
+                    if min_slack[j] < delta:
+                        delta, j1 = min_slack[j], j
+            for j in range(n + 1):
+                if used[j]:
+                    u[row_of[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            j0 = j1
+            if row_of[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            row_of[j0] = row_of[j1]
+            j0 = j1
+
+    assignment = [0] * n
+    for j in range(1, n + 1):
+        assignment[row_of[j] - 1] = j - 1
+    return assignment
+
+
+def hungarian_np(costs):
+    """The Hungarian method of hungarian() with the scans over the columns done by NumPy."""
+    n = costs.shape[0]
+    padded = np.zeros((n + 1, n + 1))
+    padded[1:, 1:] = costs
+    v = np.zeros(n + 1)
+    v[1:] = costs.min(axis=0)
+    u = np.zeros(n + 1)
+    u[1:] = (costs - v[None, 1:]).min(axis=1)
+    row_of = np.zeros(n + 1, dtype=int)
+    matched = np.zeros(n + 1, dtype=bool)
+    tight = padded - u[:, None] - v[None, :] <= 0
+    for i in range(1, n + 1):
+        for j in np.nonzero(tight[i, 1:])[0] + 1:
+            if row_of[j] == 0:
+                row_of[j] = i
+                matched[i] = True
+                break
+
+    way = np.zeros(n + 1, dtype=int)
+    for i in range(1, n + 1):
+        if matched[i]:
+            continue
+        row_of[0] = i
+        j0 = 0
+        min_slack = np.full(n + 1, INFINITY)
+        free = np.ones(n + 1, dtype=bool)  # Columns not yet on the augmenting path tree.
+        while True:
+            free[j0] = False
+            i0 = row_of[j0]
+            slack = padded[i0] - (u[i0] + v)
+            better = slack < min_slack
+            better &= free
+            min_slack[better] = slack[better]
+            way[better] = j0
+            candidates = np.where(free, min_slack, INFINITY)
+            j1 = int(candidates.argmin())
+            delta = candidates[j1]
+            used = ~free
+            u[row_of[used]] += delta
+            v[used] -= delta
+            min_slack -= delta
+            j0 = j1
+            if row_of[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            row_of[j0] = row_of[j1]
+            j0 = j1
+
+    assignment = [0] * n
+    for j in range(1, n + 1):
+        assignment[row_of[j] - 1] = j - 1
+    return assignment
+
+
+def least_cost_assignment(costs):
+    """Return the column assigned to each row of a square cost matrix so the total cost is least."""
+    if not costs:
+        return []
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(np.array(costs, dtype=float))
+        assignment = [0] * len(costs)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            assignment[row] = col
+        return assignment
+    return hungarian(costs)
+
+
+def segments_cross(s, t):
+    """Return True if two line segments given as (x0, y0, x1, y1) cross each other.
+
+    Segments that only touch, or that are missing (None), don't cross.
+    """
+    if s is None or t is None:
+        return False
+    ax, ay, bx, by = s
+    cx, cy, dx, dy = t
+    d1 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    d2 = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+    if d1 * d2 >= 0:
+        return False
+    d3 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+    d4 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+    return d3 * d4 < 0
+
+
+def crossing_pairs(segments):
+    """Return the (i, j) pairs of segments with i < j that cross each other."""
+    n = len(segments)
+    if np is None or n < 2:
+        return [
+            (i, j)
+            for i in range(n)
+            for j in range(i + 1, n)
+            if segments_cross(segments[i], segments[j])
+        ]
+
+    nan = float("nan")
+    seg = np.array([s if s is not None else (nan, nan, nan, nan) for s in segments], dtype=float)
+    ax, ay, bx, by = seg.T
+    pairs = []
+    # Check a block of segments against all the others at a time to limit the memory used.
+    for start in range(0, n, CROSSING_BLOCK_SIZE):
+        rows = slice(start, min(start + CROSSING_BLOCK_SIZE, n))
+        ex, ey = (bx[rows] - ax[rows])[:, None], (by[rows] - ay[rows])[:, None]
+        x0, y0 = ax[rows][:, None], ay[rows][:, None]
+        # Other segments whose ends are on opposite sides of the line through each segment in the block.
+        d1 = ex * (ay[None, :] - y0) - ey * (ax[None, :] - x0)
+        d2 = ex * (by[None, :] - y0) - ey * (bx[None, :] - x0)
+        straddles = d1 * d2 < 0
+        for i, j in zip(*np.nonzero(straddles)):
+            i = int(i) + start
+            j = int(j)
+            if i < j and segments_cross(segments[j], segments[i]):
+                pairs.append((i, j))
+    return pairs
+
+
+def count_crossings(segment, segments, skip=()):
+    """Return the number of segments (other than those at the positions in skip) that a segment crosses."""
+    if segment is None:
+        return 0
+    return sum(
+        1
+        for k, other in enumerate(segments)
+        if k not in skip and segments_cross(segment, other)
+    )
+
+
+def optimize_assignment(pins, net_points, crossing_cost=None, max_passes=MAX_CROSSING_PASSES):
+    """Find which pin each pin of a swappable group should take its net from to get the shortest airwires.
+
+    Args:
+        pins: List of (x, y) positions of the pins.
+        net_points: For each pin, the list of (x, y) points its current net has
+            to connect to outside the group.
+        crossing_cost: Length added to the total for each pair of crossing airwires.
+            The average airwire length is used if it's None, and 0 skips
+            looking for crossings.
+        max_passes: Most passes made over the crossing airwires.
+
+    Returns:
+        (assignment, before, after) where pin i gets the net of pin assignment[i],
+        and before and after are the (total airwire length, crossings) of the
+        current and new assignments.
+    """
+    n = len(pins)
+    costs, ends = nearest_points(pins, net_points)
+
+    def airwire(i, k):
+        end = ends[i][k]
+        return None if end is None else (pins[i][0], pins[i][1], end[0], end[1])
+
+    def totals(assignment):
+        airwires = [airwire(i, k) for i, k in enumerate(assignment)]
+        length = sum(costs[i][k] for i, k in enumerate(assignment))
+        return length, len(crossing_pairs(airwires))
+
+    current = list(range(n))
+    before = totals(current)
+    assignment = least_cost_assignment(costs)
+
+    if crossing_cost is None:
+        lengths = [costs[i][k] for i, k in enumerate(assignment) if ends[i][k] is not None]
+        crossing_cost = sum(lengths) / len(lengths) if lengths else 0.0
+
+    if crossing_cost > 0:
+        # Swap the nets of pairs of pins with crossing airwires if that lowers
+        # the total length plus the cost of the crossings.
+        airwires = [airwire(i, k) for i, k in enumerate(assignment)]
+        for _ in range(max_passes):
+            improved = False
+            for i, j in crossing_pairs(airwires):
+                if not segments_cross(airwires[i], airwires[j]):
+                    continue  # One of them was already changed on this pass.
+                ki, kj = assignment[i], assignment[j]
+                new_i, new_j = airwire(i, kj), airwire(j, ki)
+                skip = (i, j)
+                old_cost = costs[i][ki] + costs[j][kj] + crossing_cost * (
+                    count_crossings(airwires[i], airwires, skip)
+                    + count_crossings(airwires[j], airwires, skip)
+                    + 1
+                )
+                new_cost = costs[i][kj] + costs[j][ki] + crossing_cost * (
+                    count_crossings(new_i, airwires, skip)
+                    + count_crossings(new_j, airwires, skip)
+                    + segments_cross(new_i, new_j)
+                )
+                if new_cost < old_cost * (1 - 1e-9):
+                    assignment[i], assignment[j] = kj, ki
+                    airwires[i], airwires[j] = new_i, new_j
+                    improved = True
+            if not improved:
+                break
+
+    after = totals(assignment)
+    if (after[0] + crossing_cost * after[1]) >= (before[0] + crossing_cost * before[1]):
+        # Nothing better than the current nets was found, so keep them.
+        return current, before, before
+    return assignment, before, after
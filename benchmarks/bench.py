@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""Time WireIt's operations on synthetic boards.
+
+Run a benchmark and save the results:
+
+    python benchmarks/bench.py --footprints 5000 --pads 100000 --output before.json
+
+Compare two sets of results, exiting with an error if anything got slower:
+
+    python benchmarks/bench.py --compare before.json after.json
+
+The boards are built with the stand-in pcbnew module in this directory, so
+KiCad doesn't have to be installed.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# The stand-in pcbnew has to be found before any real one.
+sys.path[:0] = [BENCH_DIR, REPO_DIR]
+
+import pcbnew
+import WireIt_ops as ops
+import WireIt_dump as dump
+
+
+def clear_caches():
+    """Discard WireIt's board caches so the next operation has to scan the board."""
+    for cache in ops.board_caches:
+        cache.clear()
+
+
+def time_it(func, repeat, setup=None):
+    """Return the run times of a function, calling setup() (untimed) before each run."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter() if hasattr(time, "perf_counter") else time.time()
+        func()
+        stop = time.perf_counter() if hasattr(time, "perf_counter") else time.time()
+        times.append(stop - start)
+    return times
+
+
+def write_netlist_file(brd, netlist_file):
+    """Write a KiCad netlist file with the nets of the board's pads."""
+    nets = {}
+    for footprint in brd.GetFootprints():
+        for pad in footprint.Pads():
+            if pad.GetNetCode():
+                nets.setdefault(pad.GetNetCode(), []).append(
+                    (footprint.GetReference(), pad.GetPadName())
+                )
+    with open(netlist_file, "w") as fp:
+        fp.write('(export (version "E")\n  (nets\n')
+        for code, nodes in sorted(nets.items()):
+            fp.write(
+                '    (net (code "{}") (name "{}")\n'.format(code, brd.FindNet(code).GetNetname())
+            )
+            for ref, pad in nodes:
+                fp.write('      (node (ref "{}") (pin "{}"))\n'.format(ref, pad))
+            fp.write("    )\n")
+        fp.write("  )\n)\n")
+
+
+def run_benchmarks(args):
+    """Run each benchmark and return a dict of name => list of run times."""
+    work_dir = tempfile.mkdtemp(prefix="wireit_bench_")
+    try:
+        brd = pcbnew.make_board(
+            args.footprints,
+            args.pads,
+            args.tracks,
+            args.zones,
+            args.nets,
+            file_name=os.path.join(work_dir, "bench.kicad_pcb"),
+            seed=args.seed,
+        )
+        rng = random.Random(args.seed)
+        repeat = args.repeat
+        results = {}
+
+        def bench(name, func, setup=None):
+            results[name] = time_it(func, repeat, setup)
+
+        def random_codes(n):
+            return [rng.randint(1, args.nets) for _ in range(n)]
+
+        def unconnected_pads(n):
+            pads = [pad for pad in brd.GetPads() if pad.GetNetCode() == 0]
+            return rng.sample(pads, min(n, len(pads)))
+
+        # Board scans with empty caches, then with caches that are already built.
+        bench("get_netlist_cold", lambda: ops.get_netlist(brd), clear_caches)
+        bench("get_netlist_warm", lambda: ops.get_netlist(brd))
+        bench("get_net_names_cold", lambda: ops.get_net_names(brd), clear_caches)
+        bench("get_net_names_warm", lambda: ops.get_net_names(brd))
+        bench(
+            "get_stuff_on_nets_cold",
+            lambda: ops.get_stuff_on_nets(*random_codes(10)),
+            clear_caches,
+        )
+        bench("get_stuff_on_nets_warm", lambda: ops.get_stuff_on_nets(*random_codes(10)))
+        bench("selection_scan", lambda: ops.Selection(brd))
+
+        # Operations that change the nets. The caches stay built between runs,
+        # as they do while someone is using WireIt.
+        ops.journal.start(brd)
+        counter = iter(range(1 << 30))
+        bench(
+            "wire_attach",
+            lambda: ops.wire(brd, unconnected_pads(2), "/NEW{}".format(next(counter))),
+        )
+        bench(
+            "wire_merge",
+            lambda: ops.wire(
+                brd,
+                [ops.get_stuff_on_nets(code)[0] for code in set(random_codes(2))
+                 if ops.get_stuff_on_nets(code)],
+                "/MERGED{}".format(next(counter)),
+            ),
+        )
+        bench("cut", lambda: ops.cut(brd, rng.sample(brd.GetPads(), 10)))
+        bench("swap", lambda: ops.swap(brd, *rng.sample(brd.GetPads(), 2)))
+        bench("undo_redo", lambda: (ops.undo(brd), ops.redo(brd)))
+
+        def region():
+            x, y = rng.randrange(pcbnew.BOARD_SIZE), rng.randrange(pcbnew.BOARD_SIZE)
+            return x, y, x + pcbnew.BOARD_SIZE // 10, y + pcbnew.BOARD_SIZE // 10
+
+        bench("spatial_index_cold", lambda: ops.spatial_index.ensure(brd), clear_caches)
+        bench(
+            "wire_region",
+            lambda: ops.wire_region(brd, *region() + ("/STITCH{}".format(next(counter)),)),
+        )
+        bench(
+            "wire_nearest",
+            lambda: ops.wire_near(
+                brd,
+                [region()[:2] for _ in range(100)],
+                pcbnew.BOARD_SIZE // 100,
+                "/NEAR{}".format(next(counter)),
+                nearest_only=True,
+            ),
+        )
+        bench(
+            "plan_pin_swaps",
+            lambda: ops.plan_pin_swaps(
+                brd, ops.swappable_groups(rng.choice(brd.GetFootprints()).Pads(), {})
+            ),
+        )
+
+        # Dumping the changes made by the operations above.
+        dump_file = os.path.join(work_dir, "changes.jsonl")
+        bench("dump_journal", lambda: dump.write_changes(ops.get_netlist_changes(brd), dump_file))
+        baseline = dump.Baseline(os.path.join(work_dir, "bench.wireit-baseline"))
+        snapshot = ops.netlist_snapshot
+
+        def net_name(code):
+            return snapshot.net_name(brd, code)
+
+        bench(
+            "baseline_save",
+            lambda: baseline.save(brd.GetFileName(), snapshot.keys, snapshot.net_codes, net_name),
+        )
+        bench(
+            "baseline_diff",
+            lambda: dump.Baseline(baseline.file).diff(snapshot.keys, snapshot.net_codes, net_name),
+        )
+        netlist_file = os.path.join(work_dir, "bench.net")
+        write_netlist_file(brd, netlist_file)
+        bench(
+            "dump_netlist_file",
+            lambda: dump.write_changes(ops.get_netlist_file_changes(netlist_file, brd), dump_file),
+        )
+        return results
+    finally:
+        ops.journal.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def git_revision():
+    """Return the git revision of the code being measured, or None."""
+    try:
+        return (
+            subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR)
+            .decode("utf-8")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(times):
+    """Return the minimum and median of a list of run times."""
+    ordered = sorted(times)
+    return {"min": ordered[0], "median": ordered[len(ordered) // 2], "runs": times}
+
+
+def compare(base_file, new_file, threshold):
+    """Print the change in each benchmark's time and return True if none got slower than the threshold."""
+    with open(base_file) as fp:
+        base = json.load(fp)
+    with open(new_file) as fp:
+        new = json.load(fp)
+    if base["board"] != new["board"]:
+        print("Warning: the results are for different board sizes.")
+    ok = True
+    print("{:<26} {:>12} {:>12} {:>8}".format("benchmark", "base (ms)", "new (ms)", "ratio"))
+    for name, new_result in new["results"].items():
+        base_result = base["results"].get(name)
+        if base_result is None:
+            print("{:<26} {:>12} {:>12.3f}".format(name, "-", 1000 * new_result["min"]))
+            continue
+        ratio = new_result["min"] / max(base_result["min"], 1e-9)
+        flag = ""
+        if ratio > threshold:
+            flag = "  SLOWER"
+            ok = False
+        print(
+            "{:<26} {:>12.3f} {:>12.3f} {:>8.2f}{}".format(
+                name, 1000 * base_result["min"], 1000 * new_result["min"], ratio, flag
+            )
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--footprints", "-N", type=int, default=1000)
+    parser.add_argument("--pads", "-M", type=int, default=20000)
+    parser.add_argument("--tracks", "-T", type=int, default=20000)
+    parser.add_argument("--zones", "-Z", type=int, default=20)
+    parser.add_argument("--nets", "-K", type=int, default=3000)
+    parser.add_argument("--repeat", "-r", type=int, default=5, help="Runs of each benchmark.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for building the board.")
+    parser.add_argument("--output", "-o", help="Save the results to this JSON file.")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASE", "NEW"),
+        help="Compare two results files instead of running the benchmarks.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="Ratio of new to base time that counts as slower when comparing.",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(0 if compare(args.compare[0], args.compare[1], args.threshold) else 1)
+
+    results = {
+        name: summarize(times) for name, times in sorted(run_benchmarks(args).items())
+    }
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "board": {
+            "footprints": args.footprints,
+            "pads": args.pads,
+            "tracks": args.tracks,
+            "zones": args.zones,
+            "nets": args.nets,
+            "seed": args.seed,
+        },
+        "repeat": args.repeat,
+        "results": results,
+    }
+    for name, result in results.items():
+        print("{:<26} {:>10.3f} ms".format(name, 1000 * result["min"]))
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""Check and time the netlist reader on a large synthetic netlist.
+
+    python benchmarks/netlist_bench.py --comps 100000
+
+A netlist, symbol libraries and a sym-lib-table are written to a temporary
+project. The script checks that the streaming reader finds every component
+and net node, that reading the nodes one at a time doesn't hold the netlist
+in memory, and that the part information and pin functions come out right
+(including components with no libsource), with the libraries read in
+worker processes or not, and that the libraries are left in the cache. It exits with an error if any check fails.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None  # Python 2: the memory checks are skipped.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR]
+
+import WireIt_lib as lib
+
+# Every this many components has no libsource (e.g., a part added in PCBNEW).
+NO_LIBSOURCE_EVERY = 97
+
+# Letters for the pin functions given to the pins of the symbols.
+FUNCS = "IOBPW"
+
+
+def write_project(work_dir, comps, pins, libs, symbols, nets, seed):
+    """Write the libraries, sym-lib-table and netlist of a synthetic project.
+
+    Returns:
+        (board file, netlist file, expected counts) where the counts are a dict
+        with the number of components, components with no libsource and net nodes.
+    """
+    rng = random.Random(seed)
+
+    # Legacy libraries where pin n of every symbol has function FUNCS[n % len(FUNCS)].
+    with open(os.path.join(work_dir, "sym-lib-table"), "w") as tbl:
+        tbl.write("(sym_lib_table\n")
+        for l in range(libs):
+            lib_file = os.path.join(work_dir, "lib{}.lib".format(l))
+            with open(lib_file, "w") as fp:
+                fp.write("EESchema-LIBRARY Version 2.4\n")
+                for s in range(symbols):
+                    fp.write("DEF SYM{} U 0 40 Y Y 1 F N\nDRAW\n".format(s))
+                    for p in range(1, pins + 1):
+                        fp.write(
+                            "X P{0} {0} 0 0 150 R 50 50 1 1 {1}\n".format(p, FUNCS[p % len(FUNCS)])
+                        )
+                    fp.write("ENDDRAW\nENDDEF\n")
+            tbl.write('  (lib (name "lib{}")(type "Legacy")(uri "{}")(options "")(descr ""))\n'.format(
+                l, lib_file.replace("\\", "/")))
+        tbl.write(")\n")
+
+    counts = {"comps": comps, "no_libsource": 0, "nodes": 0}
+    net_nodes = [[] for _ in range(nets)]
+    netlist_file = os.path.join(work_dir, "bench.net")
+    with open(netlist_file, "w") as fp:
+        fp.write('(export (version "E")\n  (components\n')
+        for c in range(comps):
+            ref = "U{}".format(c + 1)
+            fp.write('    (comp (ref "{}")\n      (value "X")\n'.format(ref))
+            if c % NO_LIBSOURCE_EVERY == 0:
+                counts["no_libsource"] += 1
+            else:
+                fp.write(
+                    '      (libsource (lib "lib{}") (part "SYM{}") (description ""))\n'.format(
+                        rng.randrange(libs), rng.randrange(symbols)
+                    )
+                )
+            fp.write('      (tstamps "{:08X}"))\n'.format(c))
+            for p in range(1, pins + 1):
+                if rng.random() < 0.9:  # Leave some pins unconnected.
+                    net_nodes[rng.randrange(nets)].append((ref, p))
+        fp.write("  )\n  (nets\n")
+        for code, nodes in enumerate(net_nodes, 1):
+            fp.write('    (net (code "{}") (name "/NET{}")\n'.format(code, code))
+            for ref, p in nodes:
+                fp.write('      (node (ref "{}") (pin "{}"))\n'.format(ref, p))
+            fp.write("    )\n")
+            counts["nodes"] += len(nodes)
+        fp.write("  )\n)\n")
+
+    return os.path.join(work_dir, "bench.kicad_pcb"), netlist_file, counts
+
+
+def measure(func):
+    """Return (result, seconds, peak bytes allocated) for a call of func().
+
+    The function is run once for its time and once more for its memory use,
+    since tracing the allocations slows it down.
+    """
+    start = time.time()
+    result = func()
+    seconds = time.time() - start
+    peak = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--comps", "-C", type=int, default=100000)
+    parser.add_argument("--pins", "-P", type=int, default=8, help="Pins on each component.")
+    parser.add_argument("--libs", "-L", type=int, default=20)
+    parser.add_argument("--symbols", "-S", type=int, default=50, help="Symbols in each library.")
+    parser.add_argument("--nets", "-K", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--max-stream-mb",
+        type=float,
+        default=16.0,
+        help="Most memory streaming through the netlist may use.",
+    )
+    parser.add_argument(
+        "--max-bytes-per-comp",
+        type=float,
+        default=2000.0,
+        help="Most memory the part information may use for each component.",
+    )
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="wireit_netlist_bench_")
+    failures = []
+
+    def check(ok, msg):
+        print("{:<6} {}".format("ok" if ok else "FAIL", msg))
+        if not ok:
+            failures.append(msg)
+
+    try:
+        brd_file, netlist_file, expected = write_project(
+            work_dir, args.comps, args.pins, args.libs, args.symbols, args.nets, args.seed
+        )
+        print(
+            "netlist: {} components, {} nodes, {:.1f} MB".format(
+                expected["comps"], expected["nodes"], os.path.getsize(netlist_file) / 1e6
+            )
+        )
+
+        def count_records():
+            counts = {"comp": 0, "node": 0}
+            for record in lib.iter_netlist(netlist_file):
+                counts[record[0]] += 1
+            return counts
+
+        counts, seconds, peak = measure(count_records)
+        print("iter_netlist: {:.2f} s".format(seconds))
+        check(counts["comp"] == expected["comps"], "iter_netlist found {} components".format(counts["comp"]))
+        check(counts["node"] == expected["nodes"], "iter_netlist found {} nodes".format(counts["node"]))
+        if peak is not None:
+            check(
+                peak <= args.max_stream_mb * 1e6,
+                "iter_netlist peak memory {:.1f} MB".format(peak / 1e6),
+            )
+
+        parts, seconds, peak = measure(lambda: lib.get_parts_from_netlist(netlist_file, brd_file))
+        print("get_parts_from_netlist: {:.2f} s".format(seconds))
+        check(len(parts) == expected["comps"], "get_parts_from_netlist found {} parts".format(len(parts)))
+        no_libsource = sum(1 for part in parts.values() if part is None)
+        check(
+            no_libsource == expected["no_libsource"],
+            "{} parts have no libsource".format(no_libsource),
+        )
+        check(
+            all(part is None or part.lib_file for part in parts.values()),
+            "every part with a libsource has a library file",
+        )
+        if peak is not None:
+            check(
+                peak <= args.max_bytes_per_comp * expected["comps"],
+                "get_parts_from_netlist peak memory {:.0f} bytes per component".format(
+                    peak / float(expected["comps"])
+                ),
+            )
+
+        nodes, seconds, _ = measure(lambda: lib.get_netlist_nodes(netlist_file))
+        print("get_netlist_nodes: {:.2f} s".format(seconds))
+        check(len(nodes) == expected["nodes"], "get_netlist_nodes found {} nodes".format(len(nodes)))
+
+        # Pin n of every symbol has function FUNCS[n % len(FUNCS)], and components
+        # with no libsource are skipped whether the libraries are read in worker
+        # processes or not.
+        expected_pins = (expected["comps"] - expected["no_libsource"]) * args.pins
+        for processes in (False, True):
+            lib_cache = lib.LibraryCache()
+            start = time.time()
+            pin_funcs = lib.load_pin_funcs(netlist_file, brd_file, lib_cache, processes=processes)
+            print("load_pin_funcs (processes={}): {:.2f} s".format(processes, time.time() - start))
+            check(
+                len(pin_funcs) == expected_pins,
+                "load_pin_funcs (processes={}) found {} pins".format(processes, len(pin_funcs)),
+            )
+            check(
+                all(func == FUNCS[int(pin) % len(FUNCS)] for (_, pin), func in pin_funcs.items()),
+                "load_pin_funcs (processes={}) found the right pin functions".format(processes),
+            )
+
+            # The libraries stay in the cache, so looking up the pins again doesn't read them.
+            parse_legacy_lib = lib.parse_legacy_lib
+            parsed = []
+            lib.parse_legacy_lib = lambda lib_file: parsed.append(lib_file) or parse_legacy_lib(lib_file)
+            try:
+                lib.get_pin_funcs(parts, lib_cache)
+            finally:
+                lib.parse_legacy_lib = parse_legacy_lib
+            check(
+                not parsed,
+                "load_pin_funcs (processes={}) left the libraries in the cache".format(processes),
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""Stand-in for the parts of KiCad's pcbnew module that WireIt uses, for benchmarking.
+
+Boards are built with make_board() and become the board returned by GetBoard().
+The classes only do enough bookkeeping for WireIt's operations to work, so the
+timings show the cost of WireIt's own code (with the PCBNEW calls being cheap).
+"""
+
+import itertools
+import random
+
+_pointers = itertools.count(0x1000)
+
+
+# Size of the boards made by make_board(), in nanometers like KiCad's internal units.
+BOARD_SIZE = 100000000
+
+
+class VECTOR2I(object):
+    def __init__(self, x=0, y=0):
+        self.x = x
+        self.y = y
+
+
+class _Object(object):
+    """Base for board objects with a SWIG-like "this" pointer."""
+
+    def __init__(self):
+        self.this = next(_pointers)
+
+
+class NETINFO_ITEM(_Object):
+    def __init__(self, brd, name, code=-1):
+        _Object.__init__(self)
+        self.name = name
+        self.code = code
+
+    def GetNetCode(self):
+        return self.code
+
+    def GetNetname(self):
+        return self.name
+
+
+class _ConnectedItem(_Object):
+    def __init__(self, brd, net):
+        _Object.__init__(self)
+        self.brd = brd
+        self.net = net
+        self.selected = False
+        self.position = VECTOR2I()
+
+    def IsSelected(self):
+        return self.selected
+
+    def GetNet(self):
+        return self.net
+
+    def GetNetCode(self):
+        return self.net.code
+
+    def GetNetname(self):
+        return self.net.name
+
+    def GetPosition(self):
+        return VECTOR2I(self.position.x, self.position.y)
+
+    def SetPosition(self, position):
+        self.position = VECTOR2I(position.x, position.y)
+        self.brd.time_stamp += 1
+
+    def SetNet(self, net):
+        self.net = net
+        self.brd.time_stamp += 1
+
+    def SetNetCode(self, code):
+        self.SetNet(self.brd.nets_by_code[code])
+
+
+class FOOTPRINT(_Object):
+    def __init__(self, ref):
+        _Object.__init__(self)
+        self.ref = ref
+        self.pads = []
+
+    def GetReference(self):
+        return self.ref
+
+    def Pads(self):
+        return list(self.pads)
+
+
+class PAD(_ConnectedItem):
+    def __init__(self, brd, net, footprint, name):
+        _ConnectedItem.__init__(self, brd, net)
+        self.footprint = footprint
+        self.name = name
+        footprint.pads.append(self)
+
+    def GetParent(self):
+        return self.footprint
+
+    def GetPadName(self):
+        return self.name
+
+
+class PCB_TRACK(_ConnectedItem):
+    def __init__(self, brd, net):
+        _ConnectedItem.__init__(self, brd, net)
+        self.end = VECTOR2I()
+
+    def GetStart(self):
+        return self.GetPosition()
+
+    def GetEnd(self):
+        return VECTOR2I(self.end.x, self.end.y)
+
+
+class PCB_VIA(PCB_TRACK):
+    pass
+
+
+class ZONE(_ConnectedItem):
+    pass
+
+
+class CONNECTIVITY_DATA(object):
+    """Counts the connectivity updates instead of doing them."""
+
+    def __init__(self):
+        self.updates = 0
+        self.ratsnest_builds = 0
+
+    def MarkItemNetAsDirty(self, item):
+        pass
+
+    def Update(self, item):
+        self.updates += 1
+
+    def Add(self, item):
+        self.updates += 1
+
+    def Remove(self, item):
+        pass
+
+    def RecalculateRatsnest(self):
+        self.ratsnest_builds += 1
+
+
+class BOARD(_Object):
+    def __init__(self, file_name=""):
+        _Object.__init__(self)
+        self.file_name = file_name
+        self.time_stamp = 0
+        self.nets_by_code = {}
+        self.nets_by_name = {}
+        self.footprints = []
+        self.pads = []
+        self.tracks = []
+        self.zones = []
+        self.connectivity = CONNECTIVITY_DATA()
+        self.Add(NETINFO_ITEM(self, "", 0))  # The no-connect net.
+
+    def Add(self, item):
+        if isinstance(item, NETINFO_ITEM):
+            if item.code < 0:
+                item.code = max(self.nets_by_code) + 1
+            self.nets_by_code[item.code] = item
+            self.nets_by_name[item.name] = item
+        elif isinstance(item, FOOTPRINT):
+            self.footprints.append(item)
+            self.pads.extend(item.pads)
+        elif isinstance(item, ZONE):
+            self.zones.append(item)
+        else:
+            self.tracks.append(item)
+        self.time_stamp += 1
+
+    def FindNet(self, key):
+        if isinstance(key, int):
+            return self.nets_by_code.get(key)
+        return self.nets_by_name.get(key)
+
+    def GetNetsByNetcode(self):
+        return dict(self.nets_by_code)
+
+    def GetNetCount(self):
+        return len(self.nets_by_code)
+
+    def GetFileName(self):
+        return self.file_name
+
+    def GetTimeStamp(self):
+        return self.time_stamp
+
+    def GetFootprints(self):
+        return list(self.footprints)
+
+    def GetPads(self):
+        return list(self.pads)
+
+    def GetTracks(self):
+        return list(self.tracks)
+
+    def Zones(self):
+        return list(self.zones)
+
+    def GetPadCount(self):
+        return len(self.pads)
+
+    def GetAreaCount(self):
+        return len(self.zones)
+
+    def GetConnectivity(self):
+        return self.connectivity
+
+    def BuildListOfNets(self):
+        pass
+
+    def BuildConnectivity(self):
+        self.connectivity.ratsnest_builds += 1
+
+
+_board = None
+
+
+def GetBoard():
+    return _board
+
+
+def Refresh():
+    pass
+
+
+def make_board(footprints, pads, tracks, zones, nets, unconnected=0.1, file_name="", seed=0):
+    """Create a board and make it the one returned by GetBoard().
+
+    Args:
+        footprints: Number of footprints (N).
+        pads: Total number of pads (M), spread evenly over the footprints.
+        tracks: Number of tracks (T), a quarter of which are vias.
+        zones: Number of zones (Z).
+        nets: Number of nets (K) besides the no-connect net.
+        unconnected: Fraction of the pads that aren't on any net.
+        file_name: Path returned by the board's GetFileName().
+        seed: Seed for the random choice of nets.
+    """
+    global _board
+
+    rng = random.Random(seed)
+    brd = BOARD(file_name)
+    net_list = []
+    for i in range(nets):
+        net = NETINFO_ITEM(brd, "/NET{}".format(i))
+        brd.Add(net)
+        net_list.append(net)
+    no_connect = brd.nets_by_code[0]
+
+    def random_net():
+        if not net_list or rng.random() < unconnected:
+            return no_connect
+        return rng.choice(net_list)
+
+    pads_per_footprint, extra_pads = divmod(pads, max(footprints, 1))
+    for i in range(footprints):
+        footprint = FOOTPRINT("U{}".format(i))
+        x, y = rng.randrange(BOARD_SIZE), rng.randrange(BOARD_SIZE)
+        for j in range(pads_per_footprint + (1 if i < extra_pads else 0)):
+            pad = PAD(brd, random_net(), footprint, str(j + 1))
+            # Put the pads in rows of 20 on a 0.5 mm pitch.
+            pad.position = VECTOR2I(x + (j % 20) * 500000, y + (j // 20) * 500000)
+        brd.Add(footprint)
+    for i in range(tracks):
+        track_type = PCB_VIA if i % 4 == 0 else PCB_TRACK
+        track = track_type(brd, random_net())
+        track.position = VECTOR2I(rng.randrange(BOARD_SIZE), rng.randrange(BOARD_SIZE))
+        if track_type is PCB_VIA:
+            track.end = track.position
+        else:
+            track.end = VECTOR2I(
+                track.position.x + rng.randrange(-2000000, 2000000),
+                track.position.y + rng.randrange(-2000000, 2000000),
+            )
+        brd.Add(track)
+    for i in range(zones):
+        brd.Add(ZONE(brd, rng.choice(net_list) if net_list else no_connect))
+
+    _board = brd
+    return brd
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+# MIT license
+#
+# Copyright (C) by Dave Vandenbout.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""Check that WireIt's operations give the right results on the stand-in boards.
+
+    python benchmarks/test_ops.py
+
+The benchmarks only time the operations, so these checks make sure the undo
+history, the change journal and baseline, and the pin swap optimizer still do
+what they should. The tests can also be run with pytest from this directory.
+"""
+
+from __future__ import print_function
+
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import traceback
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# The stand-in pcbnew has to be found before any real one.
+sys.path[:0] = [BENCH_DIR, REPO_DIR]
+
+import pcbnew
+import WireIt_ops as ops
+import WireIt_dump as dump
+import WireIt_swap as swap_opt
+
+
+def make_board(work_dir=None, seed=0):
+    """Make a small board, with a file name in work_dir if given, and start the journal on it."""
+    file_name = os.path.join(work_dir, "test.kicad_pcb") if work_dir else ""
+    brd = pcbnew.make_board(20, 400, 200, 2, 60, file_name=file_name, seed=seed)
+    ops.journal.start(brd)
+    return brd
+
+
+def net_state(brd):
+    """Return the net code of every pad, track and zone on the board."""
+    things = list(brd.GetPads()) + list(brd.GetTracks()) + list(brd.Zones())
+    return [thing.GetNetCode() for thing in things]
+
+
+def pads_on_different_nets(brd):
+    """Return two connected pads that are on different nets."""
+    pads = [pad for pad in brd.GetPads() if pad.GetNetCode()]
+    first = pads[0]
+    return first, next(pad for pad in pads if pad.GetNetCode() != first.GetNetCode())
+
+
+def test_undo_redo():
+    brd = make_board()
+    start = net_state(brd)
+    pad0, pad1 = pads_on_different_nets(brd)
+    ops.wire(brd, [pad0, pad1], "/MERGED")
+    merged = net_state(brd)
+    ops.cut(brd, random.Random(0).sample(brd.GetPads(), 10))
+    cut = net_state(brd)
+
+    assert ops.undo(brd) > 0 and net_state(brd) == merged
+    assert ops.undo(brd) > 0 and net_state(brd) == start
+    assert ops.undo(brd) == 0  # Nothing left to undo.
+    assert ops.redo(brd) > 0 and net_state(brd) == merged
+    assert ops.redo(brd) > 0 and net_state(brd) == cut
+    assert ops.redo(brd) == 0  # Nothing left to redo.
+
+    # A new operation can't be followed by the ones that were undone.
+    ops.undo(brd)
+    assert ops.undo_history.can_redo(brd)
+    ops.swap(brd, *pads_on_different_nets(brd))
+    assert not ops.undo_history.can_redo(brd)
+
+
+def test_undo_after_outside_change():
+    brd = make_board()
+    pad0, pad1 = pads_on_different_nets(brd)
+    ops.swap(brd, pad0, pad1)
+    pad0.SetNetCode(0)  # Changed outside WireIt.
+    brd.time_stamp += 1
+    try:
+        ops.undo(brd)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Undoing over a change made outside WireIt should fail.")
+    assert not ops.undo_history.can_undo(brd)
+
+
+def test_undo_history_limits():
+    brd = make_board()
+    history = ops.UndoHistory(depth=3, max_changes=10)
+    for i in range(5):
+        history.push(brd, {i: (0, 1)})
+    assert len(history.undo_stack) == 3
+    history.push(brd, {key: (0, 1) for key in range(9)})
+    assert sum(len(keys) for keys, _, _ in history.undo_stack) <= 10
+    history.push(brd, {0: (1, 1)})  # Nothing actually changed.
+    assert len(history.undo_stack[-1][0]) == 9
+
+
+def test_journal_round_trip():
+    work_dir = tempfile.mkdtemp(prefix="wireit_test_")
+    try:
+        brd = make_board()
+        pad0, pad1 = pads_on_different_nets(brd)
+        names = (pad0.GetNetname(), pad1.GetNetname())
+        ops.swap(brd, pad0, pad1)
+        changes = ops.get_netlist_changes(brd)
+        assert sorted((change[3], change[5]) for change in changes) == sorted(
+            [names, names[::-1]]
+        )
+
+        # Swapping back leaves nothing to report.
+        ops.swap(brd, pad0, pad1)
+        assert ops.get_netlist_changes(brd) == []
+        ops.swap(brd, pad0, pad1)
+
+        # Added and removed pads have no old or new net.
+        changes.append(("NEW1", "1", None, None, 3, "/NET3"))
+        changes.append(("OLD1", "2", 4, "/NET4", None, None))
+        for fmt in ("JSON Lines", "CSV", "S-Expression"):
+            dump_file = os.path.join(work_dir, "changes")
+            dump.write_changes(changes, dump_file, fmt)
+            assert sorted(dump.read_changes(dump_file, fmt)) == sorted(changes), fmt
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_baseline_round_trip():
+    work_dir = tempfile.mkdtemp(prefix="wireit_test_")
+    try:
+        brd = make_board(work_dir)
+        ops.journal.start(brd, keep_baseline=True)
+        baseline_file = os.path.splitext(brd.GetFileName())[0] + ".wireit-baseline"
+        assert os.path.isfile(baseline_file)
+        pad0, pad1 = pads_on_different_nets(brd)
+        ops.swap(brd, pad0, pad1)
+        changes = ops.get_netlist_changes(brd)
+        assert len(changes) == 2
+
+        # The changes are still found from the baseline after a restart.
+        ops.journal.stop()
+        for cache in ops.board_caches:
+            cache.clear()
+        ops.journal.start(brd, keep_baseline=True)
+        assert ops.get_netlist_changes(brd) == changes
+
+        # The baseline is only used for a board with the same pads.
+        snapshot = ops.netlist_snapshot
+        baseline = dump.Baseline(baseline_file)
+        assert baseline.matches(brd.GetFileName(), snapshot.keys)
+        assert not baseline.matches(brd.GetFileName(), snapshot.keys[1:])
+        assert not baseline.matches(brd.GetFileName() + ".other", snapshot.keys)
+
+        # Making the current wiring the baseline leaves nothing to report.
+        ops.reset_netlist_changes(brd)
+        assert ops.get_netlist_changes(brd) == []
+        assert dump.Baseline(baseline_file).diff(
+            snapshot.keys, snapshot.net_codes, lambda code: snapshot.net_name(brd, code)
+        ) == []
+    finally:
+        ops.journal.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def brute_force_assignment(costs):
+    """Return the lowest total cost of any assignment by trying them all."""
+    n = len(costs)
+    return min(sum(costs[i][k] for i, k in enumerate(p)) for p in itertools.permutations(range(n)))
+
+
+def test_least_cost_assignment():
+    rng = random.Random(0)
+    solvers = [swap_opt.hungarian]
+    if swap_opt.np is not None:
+        solvers.append(lambda costs: swap_opt.hungarian_np(swap_opt.np.array(costs, dtype=float)))
+    for _ in range(50):
+        n = rng.randint(1, 6)
+        costs = [[rng.randint(0, 20) for _ in range(n)] for _ in range(n)]
+        best = brute_force_assignment(costs)
+        for solve in solvers:
+            assignment = solve(costs)
+            assert sorted(assignment) == list(range(n))
+            assert sum(costs[i][k] for i, k in enumerate(assignment)) == best
+
+
+def test_optimize_assignment():
+    # Each pin's net is on the far side of the other pin, so their airwires cross.
+    pins = [(0, 0), (10, 0)]
+    net_points = [[(10, 10)], [(0, 10)]]
+    assignment, before, after = swap_opt.optimize_assignment(pins, net_points)
+    assert assignment == [1, 0]
+    assert before[1] == 1 and after == (20.0, 0)
+
+    # Nothing changes when the nets are already the best ones.
+    assignment, before, after = swap_opt.optimize_assignment(pins, net_points[::-1])
+    assert assignment == [0, 1] and before == after
+
+
+def test_plan_pin_swaps():
+    brd = make_board(seed=3)
+    footprint = brd.GetFootprints()[0]
+    pads = list(footprint.Pads())
+    groups = ops.swappable_groups(pads, {})
+    moves, before, after = ops.plan_pin_swaps(brd, groups)
+    assert after[0] <= before[0] + 1e-6
+    nets = sorted(pad.GetNetCode() for pad in pads)
+    ops.permute(brd, moves)
+    assert sorted(pad.GetNetCode() for pad in pads) == nets  # Nets move within the part.
+    moves, before, after = ops.plan_pin_swaps(brd, groups)
+    assert not moves  # The swapped nets are already the best ones.
+
+
+def test_rotation_pairs():
+    keys = [("U1", "10"), ("U1", "2"), ("U1", "3")]
+    moves = ops.swap_moves(ops.rotation_pairs(keys))
+    # Each pad gets the net of the next one in pad order, and the last gets the first's.
+    assert sorted(moves) == [
+        (("U1", "10"), ("U1", "2")),
+        (("U1", "2"), ("U1", "3")),
+        (("U1", "3"), ("U1", "10")),
+    ]
+    assert ops.swap_moves(ops.rotation_pairs(keys[:2])) == ops.swap_moves([keys[:2]])
+
+
+def main():
+    failures = 0
+    tests = [(name, func) for name, func in sorted(globals().items()) if name.startswith("test_")]
+    for name, test in tests:
+        try:
+            test()
+        except Exception:
+            failures += 1
+            print("FAIL   {}".format(name))
+            traceback.print_exc()
+        else:
+            print("ok     {}".format(name))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()